@@ -34,12 +34,17 @@ import shutil
 import json
 import datetime  # used to write the log file
 import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
 
 from core.fslibs.Logger import FarseerLogger
 from core.fslibs import FarseerCube as fcube
 from core.fslibs import FarseerSeries as fss
 from core.fslibs import Comparisons as fsc
+from core.fslibs import restraint_functions
+from core.fslibs.PeaklistCache import PeaklistCache
+from core.fslibs.FitCache import FitCache
 from core.fslibs.WetHandler import WetHandler as fsw
+from core.utils import get_default_config_path
 
 class FarseerNMR:
     """
@@ -80,6 +85,10 @@ class FarseerNMR:
         self.farseer_series_SD_dict = {}
         self.comparisons_dict = {}
         self.comparisons_SD_dict = {}
+        # worker processes of the fits, started when first needed
+        self.fit_executor = None
+        # persistent cache of fit results, opened when first needed
+        self.fit_cache = None
         
         # methods should be performed on initiation
         self._starts_logger()
@@ -91,11 +100,34 @@ class FarseerNMR:
         weither the config was given as a path of a json file or a 
         dictionary.
         """
+        self._completes_config_with_defaults()
         self._update_spectra_dir()
         self._update_output_dir()
         self._config_user_variables()
         return None
     
+    def _completes_config_with_defaults(self):
+        """
+        Adds to the config (fsuv) the settings missing in it, for example
+        when reading config files created by previous versions,
+        using the values in the default config file.
+        """
+        
+        with open(get_default_config_path(), 'r') as default_file:
+            defaults = json.load(default_file)
+        
+        for section, settings in defaults.items():
+            
+            if not(section in self.fsuv):
+                self.fsuv[section] = settings
+            
+            elif isinstance(settings, dict) \
+                    and isinstance(self.fsuv[section], dict):
+                for key, value in settings.items():
+                    self.fsuv[section].setdefault(key, value)
+        
+        return None
+    
     def _update_output_dir(self):
         """
         Updates output path in fsuv dictionary.
@@ -733,12 +765,30 @@ Settings.'.\
             has_sidechains or self.fsuv["general_settings"]["has_sidechains"]
         fasta_start = fasta_start or self.fsuv["fasta_settings"]["FASTAstart"]
         apply_fasta = apply_fasta or self.fsuv["fasta_settings"]["applyFASTA"]
+        performance = self.fsuv["performance_settings"]
+        
+        if performance["parallel_loading"]:
+            load_workers = performance["loading_workers"]
+        
+        else:
+            load_workers = 1
+        
+        if performance["use_cache"]:
+            cache = PeaklistCache(os.path.join(
+                self.fsuv["general_settings"]["output_path"],
+                performance["cache_folder"]
+                ))
+        
+        else:
+            cache = None
         
         self.pkls = fcube.FarseerCube(
             peaklist_folder_path,
             has_sidechains,
             FASTAstart=fasta_start,
-            applyFASTA=apply_fasta
+            applyFASTA=apply_fasta,
+            load_workers=load_workers,
+            cache=cache
             )
         
         self.logger.debug("Peaklist dataset created correctly")
@@ -1021,6 +1071,16 @@ no series set was created along an axis. Nothing will be calculated.'
         
         return None
     
+    def _enabled_restraints(self):
+        """
+        Creates the restraint calculations activated by the user,
+        see core.fslibs.restraint_functions.enabled_restraints().
+        
+        Returns:
+            List of RestraintBase instances in calculation order.
+        """
+        return restraint_functions.enabled_restraints(self.fsuv)
+    
     def perform_calcs(self, farseer_series):
         """
         Calculates the NMR parameters according to the user specifications.
@@ -1029,65 +1089,46 @@ no series set was created along an axis. Nothing will be calculated.'
             farseer_series (FarseerSeries class): a FarseerSeries class
                 object containing all the experiments along a series
                 previously selected from the Farseer-NMR Cube.
+        """
+        restraints = self._enabled_restraints()
         
-        Depends on:
-        fsuv["PosF1_settings"]["calcs_PosF1_delta"]
-        fsuv["PosF2_settings"]["calcs_PosF2_delta"]
-        fsuv.calcs_CSP
-        fsuv["Height_ratio_settings"]["calcs_Height_ratio"]
-        fsuv["Volume_ratio_settings"]["calcs_Volume_ratio"]
-        fsuv.calccol_name_PosF1_delta
-        fsuv.calccol_name_PosF2_delta
-        fsuv.calccol_name_CSP
-        fsuv.calccol_name_Height_ratio
-        fsuv.calccol_name_Volume_ratio
-        """
-        
-        # if the user wants to calculate combined Chemical Shift Perturbations
-        if self.fsuv["csp_settings"]["calcs_CSP"]:
-            # calculate differences in chemical shift for each dimension
-            farseer_series.calc_cs_diffs(
-                self.fsuv["PosF1_settings"]["calccol_name_PosF1_delta"],
-                'Position F1'
-                )
-            farseer_series.calc_cs_diffs(
-                self.fsuv["PosF2_settings"]["calccol_name_PosF2_delta"],
-                'Position F2'
-                )
-            # Calculates CSPs
-            farseer_series.calc_csp(
-                calccol=self.fsuv["csp_settings"]["calccol_name_CSP"],
-                pos1=self.fsuv["PosF1_settings"]["calccol_name_PosF1_delta"],
-                pos2=self.fsuv["PosF2_settings"]["calccol_name_PosF2_delta"]
-                )
+        if restraints:
+            farseer_series.calc_restraints(restraints)
         
-        # if the user only wants to calculate perturbation in single dimensions
-        else:
-            if self.fsuv["PosF1_settings"]["calcs_PosF1_delta"]:
-                farseer_series.calc_cs_diffs(
-                    self.fsuv["PosF1_settings"]["calccol_name_PosF1_delta"],
-                    'Position F1'
-                    )
-            if self.fsuv["PosF2_settings"]["calcs_PosF2_delta"]:
-                farseer_series.calc_cs_diffs(
-                    self.fsuv["PosF2_settings"]["calccol_name_PosF2_delta"],
-                    'Position F2'
-                    )
+        return None
+    
+    def perform_calcs_batch(self, series_list):
+        """
+        Calculates the NMR parameters for several series at once,
+        see perform_calcs().
         
-        # Calculates Ratios
-        if self.fsuv["Height_ratio_settings"]["calcs_Height_ratio"]:
-            farseer_series.calc_ratio(
-                self.fsuv["Height_ratio_settings"]["calccol_name_Height_ratio"],
-                'Height'
-                )
+        Series are grouped by shape and the restraints of each group
+        are calculated as single array operations.
         
-        if self.fsuv["Volume_ratio_settings"]["calcs_Volume_ratio"]:
-            farseer_series.calc_ratio(
-                self.fsuv["Volume_ratio_settings"]["calccol_name_Volume_ratio"],
-                'Volume'
-                )
+        Parameters:
+            series_list (list): FarseerSeries, normally all the series
+                along an axis of the Farseer-NMR Cube.
+        """
+        restraints = self._enabled_restraints()
+        
+        if not(restraints):
+            return None
+        
+        batches = {}
         
-        ### ADD ADDITIONAL CALCULATION HERE ###
+        for series in series_list:
+            batches.setdefault(
+                (len(series.items), len(series.major_axis)),
+                []
+                ).append(series)
+        
+        for batch in batches.values():
+            fss.SeriesBatch(batch).calc_restraints(restraints)
+        
+        self.logger.info(
+            '**Calculated restraints** for {} series in {} batches'.\
+                format(len(series_list), len(batches))
+            )
         
         return None
     
@@ -1117,23 +1158,112 @@ data along the X axis. There is nothing to fit.')
         
         self._checks_fit_input(farseer_series)
         
-        for restraint in self.fsuv["restraint_settings"].index:
-            if self.fsuv["restraint_settings"].loc[restraint, 'calcs_restraint_flg']:
-                farseer_series.perform_fit(
-                    restraint,
-                    self.fsuv["revo_settings"]["titration_x_values"],
-                    self.fsuv["fitting_parameters"]["mininum_datapoints"],
-                    self.fsuv["fitting_parameters"]["fitting_function"]
-                    )
+        fit_cols = [
+            restraint for restraint in self.fsuv["restraint_settings"].index
+            if self.fsuv["restraint_settings"].loc[restraint, 'calcs_restraint_flg']
+            ]
+        fit_cols.extend(
+            obs for obs in self.fsuv["observables_settings"].index
+            if self.fsuv["observables_settings"].loc[obs, 'obs_flags']
+            )
+        executor = self._gets_fit_executor()
+        fit_cache = self._gets_fit_cache()
         
-        for obs in self.fsuv["observables_settings"].index:
-            if self.fsuv["observables_settings"].loc[obs, 'obs_flags']:
-                farseer_series.perform_fit(
-                    obs,
-                    self.fsuv["revo_settings"]["titration_x_values"],
-                    self.fsuv["fitting_parameters"]["mininum_datapoints"],
-                    self.fsuv["fitting_parameters"]["fitting_function"]
-                    )
+        if self.fsuv["fitting_parameters"]["global_fit"]:
+            shared_parameter = \
+                self.fsuv["fitting_parameters"]["shared_parameter"]
+        else:
+            shared_parameter = None
+        
+        # all the fits are submitted before collecting the results so that
+        # workers fit residues of all columns at once
+        fit_states = [
+            farseer_series.submit_fit(
+                col,
+                self.fsuv["revo_settings"]["titration_x_values"],
+                self.fsuv["fitting_parameters"]["mininum_datapoints"],
+                self.fsuv["fitting_parameters"]["fitting_function"],
+                batch_fitting=\
+                    self.fsuv["fitting_parameters"]["batch_fitting"],
+                executor=executor,
+                fit_cache=fit_cache,
+                shared_parameter=shared_parameter,
+                global_fit_groups=\
+                    self.fsuv["fitting_parameters"]["global_fit_groups"],
+                bootstrap_replicas=\
+                    self.fsuv["fitting_parameters"]["bootstrap_replicas"],
+                bootstrap_method=\
+                    self.fsuv["fitting_parameters"]["bootstrap_method"],
+                confidence_level=\
+                    self.fsuv["fitting_parameters"]["confidence_level"],
+                write_fit_report=\
+                    self.fsuv["fitting_parameters"]["write_fit_report"],
+                prescreen=self.fsuv["fitting_parameters"]["prescreen"],
+                prescreen_min_amplitude=\
+                    self.fsuv["fitting_parameters"]["prescreen_min_amplitude"]
+                )
+            for col in fit_cols
+            ]
+        
+        for fit_state in fit_states:
+            farseer_series.writes_fit(fit_state)
+        
+        return None
+    
+    def _gets_fit_executor(self):
+        """
+        Returns the process pool shared by all the fits, None if fits
+        run in the main process.
+        
+        Depends on:
+        fsuv["performance_settings"]["parallel_fitting"]
+        fsuv["performance_settings"]["fitting_workers"]
+        """
+        performance = self.fsuv["performance_settings"]
+        
+        if not(performance["parallel_fitting"]) \
+                or performance["fitting_workers"] <= 1:
+            return None
+        
+        if self.fit_executor is None:
+            self.fit_executor = ProcessPoolExecutor(
+                max_workers=performance["fitting_workers"]
+                )
+            self.logger.info(
+                '**Fitting with {} worker processes**'.\
+                    format(performance["fitting_workers"])
+                )
+        
+        return self.fit_executor
+    
+    def _gets_fit_cache(self):
+        """
+        Returns the persistent cache of fit results, None if disabled.
+        
+        Depends on:
+        fsuv["performance_settings"]["use_fit_cache"]
+        fsuv["performance_settings"]["cache_folder"]
+        """
+        performance = self.fsuv["performance_settings"]
+        
+        if not(performance["use_fit_cache"]):
+            return None
+        
+        if self.fit_cache is None:
+            self.fit_cache = FitCache(os.path.join(
+                self.fsuv["general_settings"]["output_path"],
+                performance["cache_folder"],
+                'fits'
+                ))
+        
+        return self.fit_cache
+    
+    def _shutdowns_fit_executor(self):
+        """Stops the worker processes of the fits, if any."""
+        
+        if self.fit_executor is not None:
+            self.fit_executor.shutdown()
+            self.fit_executor = None
         
         return None
     
@@ -1603,8 +1733,19 @@ Nothing to calculate here.')
                 )
             return
         
+        batch_calcs = \
+            self.fsuv["performance_settings"]["batch_calculations"]
+        
         # for each kind of titration (cond{1,2,3})
         for cond in sorted(series_dct.keys()):
+            # calculates restraints of all the series along the axis at once
+            if batch_calcs:
+                self.perform_calcs_batch([
+                    series_dct[cond][dim2_pt][dim1_pt]
+                    for dim2_pt in sorted(series_dct[cond].keys())
+                    for dim1_pt in sorted(series_dct[cond][dim2_pt].keys())
+                    ])
+            
             # for each point in the corresponding second dimension/condition
             for dim2_pt in sorted(series_dct[cond].keys()):
                 # for each point in the corresponding first dimension/condition
@@ -1619,7 +1760,8 @@ Nothing to calculate here.')
                             istitle=True)
                     # flags and checks are under each function.
                     # performs the calculations
-                    self.perform_calcs(series_dct[cond][dim2_pt][dim1_pt])
+                    if not(batch_calcs):
+                        self.perform_calcs(series_dct[cond][dim2_pt][dim1_pt])
                     # PERFORMS FITS
                     self.perform_fits(series_dct[cond][dim2_pt][dim1_pt])
                     # Analysis of PRE data - only in along_z
@@ -1785,26 +1927,21 @@ Nothing to calculate here.')
         
         return None
     
-    def run(self):
+    def preprocesses_pkls_dataset(self, analyses_sidechains=False):
         """
-        Runs the whole Farseer-NMR standard algorithm based on the
-        defined user variables.
+        Prepares the peaklists dataset and initiates the Farseer-NMR
+        Cube: corrects chemical shifts, expands missing residues,
+        identifies missing and unassigned residues and organizes the
+        peaklists columns, according to the user defined variables.
+        
+        Parameters:
+            - analyses_sidechains (opt, bool): whether sidechains
+                are also processed.
         """
         
-        general = self.fsuv["general_settings"]
         fitting = self.fsuv["fitting_settings"]
         cs = self.fsuv["cs_settings"]
         fasta = self.fsuv["fasta_settings"]
-        use_sidechains = general["use_sidechains"]
-        
-        # Initiates the run log
-        self.logger.info(self._log_state_stamp())
-        self._log_header()
-        
-        # Initiates Farseer
-        self.creates_pkls_dataset()
-        
-        analyses_sidechains = self.pkls.has_sidechains and use_sidechains
         
         # corrects chemical shifts
         if cs["perform_cs_correction"]:
@@ -1844,6 +1981,112 @@ Nothing to calculate here.')
         
         self.init_farseer_cube()
         
+        return None
+    
+    def _snapshot_settings(self):
+        """
+        The user settings that change the parsing and preprocessing of
+        the peaklists, a snapshot saved with other settings is outdated.
+        """
+        general = self.fsuv["general_settings"]
+        fitting = self.fsuv["fitting_settings"]
+        
+        return {
+            'has_sidechains': general["has_sidechains"],
+            'use_sidechains': general["use_sidechains"],
+            'fasta_settings': self.fsuv["fasta_settings"],
+            'cs_settings': self.fsuv["cs_settings"],
+            'expand_missing_yy': fitting["expand_missing_yy"],
+            'expand_missing_zz': fitting["expand_missing_zz"]
+            }
+    
+    def loads_pkls_snapshot(self, snapshot_path):
+        """
+        Creates the Farseer-NMR peaklist dataset (instance of
+        FarseerCube class) from a Farseer-NMR Cube snapshot, previously
+        saved with FarseerCube.save_snapshot().
+        
+        The snapshot is not loaded if the input files or the
+        preprocessing settings changed since it was saved.
+        
+        Parameters:
+            - snapshot_path (str): path to the snapshot folder.
+        
+        Assigns self.pkls, instance of FarseerCube
+        
+        Returns:
+            True if the snapshot was loaded, False if it is outdated.
+        """
+        
+        self.pkls = fcube.FarseerCube(
+            self.fsuv["general_settings"]["input_spectra_path"],
+            self.fsuv["general_settings"]["has_sidechains"],
+            FASTAstart=self.fsuv["fasta_settings"]["FASTAstart"],
+            applyFASTA=self.fsuv["fasta_settings"]["applyFASTA"]
+            )
+        
+        if not(
+                self.pkls.snapshot_is_current(
+                    snapshot_path,
+                    self._snapshot_settings()
+                    )
+                ):
+            self.logger.info(
+                'Farseer-NMR Cube snapshot {} is outdated: input files or \
+preprocessing settings changed. Rebuilding the Farseer-NMR Cube.'.\
+                    format(snapshot_path)
+                )
+            return False
+        
+        self.pkls.load_snapshot(snapshot_path)
+        self.logger.info(
+            'Farseer-NMR Cube loaded from snapshot {}'.format(snapshot_path)
+            )
+        
+        return True
+    
+    def run(self):
+        """
+        Runs the whole Farseer-NMR standard algorithm based on the
+        defined user variables.
+        """
+        
+        general = self.fsuv["general_settings"]
+        fitting = self.fsuv["fitting_settings"]
+        use_sidechains = general["use_sidechains"]
+        
+        # Initiates the run log
+        self.logger.info(self._log_state_stamp())
+        self._log_header()
+        
+        # Initiates Farseer
+        performance = self.fsuv["performance_settings"]
+        snapshot_path = os.path.join(
+            general["output_path"],
+            performance["snapshot_folder"]
+            )
+        snapshot_exists = \
+            os.path.exists(os.path.join(snapshot_path, 'farseer_cube.json'))
+        
+        if performance["start_from_snapshot"] and snapshot_exists:
+            from_snapshot = self.loads_pkls_snapshot(snapshot_path)
+        else:
+            from_snapshot = False
+        
+        if from_snapshot:
+            analyses_sidechains = self.pkls.has_sidechains and use_sidechains
+        
+        else:
+            self.creates_pkls_dataset()
+            analyses_sidechains = self.pkls.has_sidechains and use_sidechains
+            self.preprocesses_pkls_dataset(analyses_sidechains)
+            
+            if performance["save_snapshot"]:
+                self.pkls.save_snapshot(
+                    snapshot_path,
+                    self._snapshot_settings()
+                    )
+        
         # initiates a dictionary that contains all the series to be evaluated
         # along all the conditions.
         self.gen_series_dict(resonance_type='Backbone')
@@ -1877,6 +2120,7 @@ Nothing to calculate here.')
                     resonance_type='Sidechains'
                     )
         
+        self._shutdowns_fit_executor()
         self._log_tail()
         
         return None
@@ -22,10 +22,9 @@ along with Farseer-NMR. If not, see <http://www.gnu.org/licenses/>.
 """
 #import logging
 #import logging.config
-import numpy as np
-import pandas as pd
 import core.fslibs.Logger as Logger
 from core.fslibs.WetHandler import WetHandler as fsw
+from core.fslibs.DenseCube import DenseCube
 
 class Comparisons:
     """
@@ -43,8 +42,8 @@ class Comparisons:
         dimension (str): identifies the main dimension axis of the class
             where X = along_x, Y = along_y, Z = along_z
         
-        hyper_panel (5-dimension pandas.Panel): converted from dictionary     
-            stores all the main axis series.
+        hyper_panel (DenseCube): converted from dictionary, stores all
+            the main axis series.
         
         other_dim_keys (lst): ordered list containing the previous and next
             dimension names, same nomenclature as 'dimension'.
@@ -74,23 +73,10 @@ class Comparisons:
         self.logger = Logger.FarseerLogger(__name__).setup_log()
         self.logger.debug('logger initiated')
         
-        self.p5d = pd.core.panelnd.create_nd_panel_factory(
-            klass_name='Panel5D',
-            orders=['cool', 'labels', 'items', 'major_axis', 'minor_axis'],
-            slices={
-                'labels': 'labels',
-                'items': 'items',
-                'major_axis': 'major_axis',
-                'minor_axis': 'minor_axis'
-                    },
-            slicer=pd.Panel4D,
-            aliases={'major': 'index', 'minor': 'minor_axis'},
-            stat_axis=2
-            )
         # condition/dimension over which the calculations where
         # performed
         self.dimension = selfdim
-        self.hyper_panel = self.p5d(dimension_dict)
+        self.hyper_panel = DenseCube.from_series_dict(dimension_dict)
         # stores the dimension keys over which the comparisons
         # will be performed
         self.other_dim_keys = other_dim_keys
@@ -166,12 +152,15 @@ class Comparisons:
             )
         
         if len(self.hyper_panel.labels) > 1:
+            # series along labels for each cool and items pair
+            next_cube = self.hyper_panel.transpose(0,2,1,3,4)
+            
             for dp2 in self.hyper_panel.items:
                 self.all_next_dim.setdefault(dp2, {})
                 
                 for dp1 in self.hyper_panel.cool:
                     comparison = series_class(
-                        np.array(self.hyper_panel.loc[dp1,:,dp2,:,:]),
+                        next_cube.series_array(dp1, dp2),
                         items=self.hyper_panel.labels,
                         minor_axis=self.hyper_panel.minor_axis,
                         major_axis=self.hyper_panel.major_axis
@@ -221,12 +210,15 @@ class Comparisons:
             )
         
         if len(self.hyper_panel.cool) > 1:
+            # series along cool for each labels and items pair
+            prev_cube = self.hyper_panel.transpose(1,2,0,3,4)
+            
             for dp2 in self.hyper_panel.labels:
                 self.all_prev_dim.setdefault(dp2, {})
                 
                 for dp1 in self.hyper_panel.items:
                     comparison = series_class(
-                        np.array(self.hyper_panel.loc[:,dp2,dp1,:,:]),
+                        prev_cube.series_array(dp2, dp1),
                         items=self.hyper_panel.cool,
                         minor_axis=self.hyper_panel.minor_axis,
                         major_axis=self.hyper_panel.major_axis
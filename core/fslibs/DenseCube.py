@@ -0,0 +1,547 @@
+"""
+Copyright © 2017-2018 Farseer-NMR
+João M.C. Teixeira and Simon P. Skinner
+
+@ResearchGate https://goo.gl/z8dPJU
+@Twitter https://twitter.com/farseer_nmr
+
+This file is part of Farseer-NMR.
+
+Farseer-NMR is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Farseer-NMR is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Farseer-NMR. If not, see <http://www.gnu.org/licenses/>.
+"""
+import os
+import json
+import numpy as np
+import pandas as pd
+
+from core.utils import peak_status_vocabulary
+
+class DenseCube:
+    """
+    A dense label-indexed 5-dimension array.
+    
+    Replaces the pandas Panel5D as storage for the Farseer-NMR Cube.
+    Numeric columns (positions, heights, volumes, line widths, ResNo...)
+    are stored in a single contiguous float64 block, integer columns
+    are translated back to integers when decoded. The string columns
+    ('Peak Status', '1-letter', 'Assign F1'...) are dictionary
+    encoded: a companion int32 block stores, for each cell, the
+    position of its value in a vocabulary shared by the whole column,
+    -1 identifies NaN. Axes labels are translated to integer positions,
+    so that slicing the cube or transposing it only creates numpy views.
+    
+    The encoding is the storage format of the cube: .series_array()
+    decodes all the columns for the FarseerSeries, which keep only
+    'Peak Status' as codes (FarseerSeries.peak_status). Labels such as
+    'Assign F1' or '1-letter' are read as strings by the writers and
+    plots.
+    
+    Axes order follows the former Panel5D nomenclature:
+        
+        ['cool', 'labels', 'items', 'major_axis', 'minor_axis']
+    
+    Attributes:
+        values (np.ndarray): float64 array of shape
+            (cool, labels, items, major_axis, len(num_cols)).
+        
+        codes (np.ndarray): int32 array of shape
+            (cool, labels, items, major_axis, len(str_cols)).
+        
+        vocabularies (dict): {str_col: np.ndarray} the values of each
+            encoded column, indexed by code.
+        
+        cool, labels, items, major_axis, minor_axis (pd.Index): the
+            labels of each axis.
+        
+        num_cols (list): minor_axis columns stored in <values>.
+        
+        int_cols (list): <num_cols> holding integers.
+        
+        str_cols (list): minor_axis columns stored in <codes>.
+    """
+    
+    axes_names = ['cool', 'labels', 'items', 'major_axis', 'minor_axis']
+    # columns whose vocabulary starts with a fixed order, so that codes
+    # are the same for every cube
+    seeded_vocabularies = {'Peak Status': peak_status_vocabulary}
+    
+    def __init__(
+            self,
+            values,
+            codes,
+            vocabularies,
+            cool,
+            labels,
+            items,
+            major_axis,
+            minor_axis,
+            num_cols,
+            int_cols=None):
+        """
+        Parameters:
+            values (np.ndarray): the float64 block.
+            
+            codes (np.ndarray): the int32 block of encoded columns.
+            
+            vocabularies (dict): the vocabulary of each encoded column.
+            
+            cool, labels, items, major_axis, minor_axis (list-like):
+                axes labels.
+            
+            num_cols (list): columns of <minor_axis> stored in
+                <values>, the remaining are encoded in <codes>.
+            
+            int_cols (opt, list): columns of <num_cols> holding
+                integers, defaults to none.
+        """
+        self.values = values
+        self.codes = codes
+        self.vocabularies = vocabularies
+        self.cool = pd.Index(cool)
+        self.labels = pd.Index(labels)
+        self.items = pd.Index(items)
+        self.major_axis = pd.Index(major_axis)
+        self.minor_axis = pd.Index(minor_axis)
+        self.num_cols = list(num_cols)
+        self.int_cols = list(int_cols or [])
+        self.str_cols = [c for c in self.minor_axis if c not in num_cols]
+        # column label -> (block, position in block)
+        self._col_pos = {}
+        
+        for i, col in enumerate(self.num_cols):
+            self._col_pos[col] = ('values', i)
+        
+        for i, col in enumerate(self.str_cols):
+            self._col_pos[col] = ('codes', i)
+    
+    @property
+    def shape(self):
+        """The shape of the cube along the five axes."""
+        return (
+            len(self.cool),
+            len(self.labels),
+            len(self.items),
+            len(self.major_axis),
+            len(self.minor_axis)
+            )
+    
+    @staticmethod
+    def _numeric_kind(series):
+        """
+        Evaluates if a column can be stored in the float64 block.
+        
+        Parameters:
+            series (pd.Series): the column.
+        
+        Returns:
+            'i' if all the values of the column are integers or NaN,
+            'f' if they are integers, floats or NaN, None otherwise.
+        """
+        
+        if series.dtype.kind in 'iu':
+            return 'i'
+        
+        elif series.dtype.kind == 'f':
+            return 'f'
+        
+        elif series.dtype.kind == 'O':
+            inferred = pd.api.types.infer_dtype(series.values)
+            
+            if inferred == 'integer':
+                return 'i'
+            
+            elif inferred in ('floating', 'mixed-integer-float'):
+                return 'f'
+        
+        return None
+    
+    @classmethod
+    def _build_vocabulary(cls, col, frames):
+        """
+        Collects the unique non-NaN values of column <col> over all
+        the <frames>.
+        
+        Returns:
+            np.ndarray of objects, the vocabulary of the column.
+        """
+        vocabulary = list(cls.seeded_vocabularies.get(col, []))
+        seen = set(vocabulary)
+        
+        for df in frames:
+            if col not in df.columns:
+                continue
+            
+            for value in pd.unique(df[col].dropna().values):
+                if value not in seen:
+                    seen.add(value)
+                    vocabulary.append(value)
+        
+        vocabulary_arr = np.empty(len(vocabulary), dtype=object)
+        vocabulary_arr[:] = vocabulary
+        
+        return vocabulary_arr
+    
+    def encode(self, col, value):
+        """
+        Returns the integer code of <value> in the vocabulary of
+        column <col>, -1 if <value> is not in the vocabulary.
+        """
+        return int(pd.Index(self.vocabularies[col]).get_indexer([value])[0])
+    
+    def _decode(self, col, codes):
+        """Translates an array of codes of <col> to its values."""
+        # -1 codes fall on the NaN appended to the vocabulary
+        return np.append(self.vocabularies[col], np.nan)[codes]
+    
+    @staticmethod
+    def _to_integers(values):
+        """
+        Translates a float array of an integer column to an object
+        array of integers, NaN are kept.
+        """
+        integers = values.astype(object)
+        present = ~np.isnan(values)
+        integers[present] = values[present].astype(np.int64)
+        
+        return integers
+    
+    @classmethod
+    def from_nested_dict(cls, nested, cool=None, labels=None, items=None):
+        """
+        Creates a DenseCube from a three level nested dictionary
+        of pd.DataFrames: nested[cool][labels][items].
+        
+        Rows and columns of the different DataFrames are aligned on
+        their union, as in the pandas Panel5D. Cells not present in a
+        DataFrame are filled with NaN.
+        
+        Parameters:
+            nested (dict): the nested dictionary.
+            
+            cool, labels, items (opt, list): axes labels, defaults to
+                the sorted keys of <nested>.
+        
+        Returns:
+            The DenseCube.
+        """
+        if cool is None:
+            cool = sorted(nested)
+        
+        if labels is None:
+            labels = sorted(nested[cool[0]])
+        
+        if items is None:
+            items = sorted(nested[cool[0]][labels[0]])
+        
+        frames = [
+            nested[c][l][i]
+                for c in cool
+                    for l in labels
+                        for i in items
+            ]
+        
+        # union of columns keeping the original order
+        minor_axis = []
+        
+        for df in frames:
+            minor_axis.extend(c for c in df.columns if c not in minor_axis)
+        
+        # union of rows, as pandas does for the Panel5D
+        major_axis = frames[0].index
+        
+        for df in frames[1:]:
+            if not(major_axis.equals(df.index)):
+                major_axis = major_axis.union(df.index)
+        
+        kinds = {
+            col: set(
+                cls._numeric_kind(df[col])
+                    for df in frames if col in df.columns
+                )
+                for col in minor_axis
+            }
+        num_cols = [col for col in minor_axis if None not in kinds[col]]
+        int_cols = [col for col in num_cols if kinds[col] == {'i'}]
+        # only string columns are encoded
+        str_cols = [c for c in minor_axis if c not in num_cols]
+        vocabularies = {
+            col: cls._build_vocabulary(col, frames) for col in str_cols
+            }
+        vocabulary_idx = {
+            col: pd.Index(vocabularies[col]) for col in str_cols
+            }
+        
+        shape = (len(cool), len(labels), len(items), len(major_axis))
+        values = np.full(shape + (len(num_cols),), np.nan, dtype=np.float64)
+        codes = np.full(shape + (len(str_cols),), -1, dtype=np.int32)
+        
+        for n, df in enumerate(frames):
+            ci, li, ii = np.unravel_index(n, shape[:3])
+            rows = major_axis.get_indexer(df.index)
+            
+            num_here = [c for c in num_cols if c in df.columns]
+            num_pos = [num_cols.index(c) for c in num_here]
+            values[ci, li, ii][np.ix_(rows, num_pos)] = \
+                df.loc[:,num_here].values.astype(np.float64)
+            
+            for col in str_cols:
+                if col in df.columns:
+                    codes[ci, li, ii, rows, str_cols.index(col)] = \
+                        vocabulary_idx[col].get_indexer(df[col].values)
+        
+        return cls(
+            values,
+            codes,
+            vocabularies,
+            cool,
+            labels,
+            items,
+            major_axis,
+            minor_axis,
+            num_cols,
+            int_cols
+            )
+    
+    @classmethod
+    def from_series_dict(cls, series_dict):
+        """
+        Creates a DenseCube from a two level nested dictionary of
+        pd.Panel (FarseerSeries): series_dict[cool][labels].
+        
+        Panel items become the cube items.
+        """
+        cool = sorted(series_dict)
+        labels = sorted(series_dict[cool[0]])
+        items = []
+        
+        for c in cool:
+            for l in labels:
+                items.extend(
+                    i for i in series_dict[c][l].items if i not in items
+                    )
+        
+        nested = {
+            c: {
+                l: {
+                    i: series_dict[c][l].loc[i,:,:]
+                        for i in series_dict[c][l].items
+                    }
+                    for l in labels
+                }
+                for c in cool
+            }
+        
+        return cls.from_nested_dict(nested, cool, labels, items)
+    
+    def transpose(self, *axes):
+        """
+        Permutes the cool, labels and items axes of the cube.
+        
+        Does not copy data, the new DenseCube blocks are views of the
+        current blocks.
+        
+        Parameters:
+            axes (int): a permutation of (0, 1, 2, 3, 4) where the last
+                two axes (major_axis and minor_axis) are kept in place.
+        
+        Returns:
+            The transposed DenseCube.
+        """
+        
+        if sorted(axes) != [0, 1, 2, 3, 4] or tuple(axes[3:]) != (3, 4):
+            raise ValueError(
+                'DenseCube can only transpose cool, labels and items axes.'
+                )
+        
+        cubeaxes = [self.cool, self.labels, self.items]
+        
+        return DenseCube(
+            self.values.transpose(axes),
+            self.codes.transpose(axes),
+            self.vocabularies,
+            cubeaxes[axes[0]],
+            cubeaxes[axes[1]],
+            cubeaxes[axes[2]],
+            self.major_axis,
+            self.minor_axis,
+            self.num_cols,
+            self.int_cols
+            )
+    
+    def get_frame(self, c, l, i):
+        """
+        Returns the pd.DataFrame (major_axis x minor_axis) stored at
+        cube coordinates [c][l][i].
+        """
+        ci = self.cool.get_loc(c)
+        li = self.labels.get_loc(l)
+        ii = self.items.get_loc(i)
+        
+        data = {}
+        
+        for col in self.num_cols:
+            data[col] = self.values[ci, li, ii, :, self._col_pos[col][1]]
+            
+            if col in self.int_cols:
+                data[col] = self._to_integers(data[col])
+        
+        for col in self.str_cols:
+            data[col] = self._decode(
+                col,
+                self.codes[ci, li, ii, :, self._col_pos[col][1]]
+                )
+        
+        return pd.DataFrame(data, index=self.major_axis, columns=self.minor_axis)
+    
+    def column_view(self, c, l, col):
+        """
+        Returns a view (items x major_axis) of column <col> at cube
+        coordinates [c][l]. No data is copied, encoded columns return
+        their codes.
+        """
+        ci = self.cool.get_loc(c)
+        li = self.labels.get_loc(l)
+        block, pos = self._col_pos[col]
+        
+        return getattr(self, block)[ci, li, :, :, pos]
+    
+    def notnull_mask(self, c, l, col):
+        """
+        Returns a boolean mask (items x major_axis) flagging the rows
+        of each item at cube coordinates [c][l] where <col> is not NaN.
+        """
+        if self._col_pos[col][0] == 'codes':
+            return self.column_view(c, l, col) >= 0
+        
+        return pd.notnull(self.column_view(c, l, col))
+    
+    def series_array(self, c, l, rows=None):
+        """
+        Returns the object array (items x major_axis x minor_axis)
+        at cube coordinates [c][l], ready to initiate a pd.Panel.
+        
+        Parameters:
+            c, l (str): the cube coordinates.
+            
+            rows (opt, np.ndarray): boolean mask over major_axis,
+                only selected rows are returned. Defaults to all rows.
+        
+        Returns:
+            The object array, the only copy of the data made, with the
+            encoded columns translated back to their values.
+        """
+        ci = self.cool.get_loc(c)
+        li = self.labels.get_loc(l)
+        
+        if rows is None:
+            rows = slice(None)
+            nrows = len(self.major_axis)
+        
+        else:
+            nrows = int(np.count_nonzero(rows))
+        
+        arr = np.empty(
+            (len(self.items), nrows, len(self.minor_axis)),
+            dtype=object
+            )
+        num_pos = [self.minor_axis.get_loc(col) for col in self.num_cols]
+        arr[:,:,num_pos] = self.values[ci, li][:, rows]
+        
+        for col in self.int_cols:
+            arr[:,:,self.minor_axis.get_loc(col)] = self._to_integers(
+                self.values[ci, li, :, :, self._col_pos[col][1]][:, rows]
+                )
+        
+        for col in self.str_cols:
+            arr[:,:,self.minor_axis.get_loc(col)] = self._decode(
+                col,
+                self.codes[ci, li, :, :, self._col_pos[col][1]][:, rows]
+                )
+        
+        return arr
+    
+    @staticmethod
+    def _to_json_list(labels):
+        """Converts numpy scalars in <labels> to Python types."""
+        return [l.item() if isinstance(l, np.generic) else l for l in labels]
+    
+    def save(self, folder):
+        """
+        Saves the cube to <folder> as two .npy files, one for each
+        block, and a JSON manifest with axes labels and vocabularies.
+        
+        Parameters:
+            folder (str): the destination folder, created if missing.
+        """
+        
+        if not(os.path.exists(folder)):
+            os.makedirs(folder)
+        
+        np.save(os.path.join(folder, 'values.npy'), self.values)
+        np.save(os.path.join(folder, 'codes.npy'), self.codes)
+        
+        manifest = {
+            'num_cols': self._to_json_list(self.num_cols),
+            'int_cols': self._to_json_list(self.int_cols),
+            'vocabularies': {
+                col: self._to_json_list(vocabulary)
+                    for col, vocabulary in self.vocabularies.items()
+                }
+            }
+        
+        for axis in self.axes_names:
+            manifest[axis] = self._to_json_list(getattr(self, axis))
+        
+        with open(os.path.join(folder, 'manifest.json'), 'w') as fout:
+            json.dump(manifest, fout, indent=4)
+        
+        return None
+    
+    @classmethod
+    def load(cls, folder, mmap_mode='r'):
+        """
+        Loads a cube saved with .save().
+        
+        Parameters:
+            folder (str): the folder where the cube was saved.
+            
+            mmap_mode (opt, str): passed to np.load, defaults to 'r',
+                blocks are read-only memory-maps of the .npy files that
+                can be shared by several processes.
+        
+        Returns:
+            The DenseCube.
+        """
+        
+        with open(os.path.join(folder, 'manifest.json'), 'r') as fin:
+            manifest = json.load(fin)
+        
+        vocabularies = {}
+        
+        for col, vocabulary in manifest['vocabularies'].items():
+            vocabularies[col] = np.empty(len(vocabulary), dtype=object)
+            vocabularies[col][:] = vocabulary
+        
+        return cls(
+            np.load(os.path.join(folder, 'values.npy'), mmap_mode=mmap_mode),
+            np.load(os.path.join(folder, 'codes.npy'), mmap_mode=mmap_mode),
+            vocabularies,
+            manifest['cool'],
+            manifest['labels'],
+            manifest['items'],
+            manifest['major_axis'],
+            manifest['minor_axis'],
+            manifest['num_cols'],
+            manifest.get('int_cols')
+            )
@@ -23,14 +23,18 @@ along with Farseer-NMR. If not, see <http://www.gnu.org/licenses/>.
 #import logging
 #import logging.config
 import os
+import json
+import hashlib
 import numpy as np
 import pandas as pd
 import itertools as it
+from concurrent.futures import ThreadPoolExecutor
 
 import core.fslibs.Logger as Logger
 from core.utils import aal1tol3, aal3tol1
 from core.fslibs.WetHandler import WetHandler as fsw
 from core.fslibs.FastaHandler import FastaHandler
+from core.fslibs.DenseCube import DenseCube
 
 class FarseerCube:
     """
@@ -46,8 +50,8 @@ class FarseerCube:
     
     Formats all the peaklists to the same size.
     
-    Generates the Farseer-NMR Cube: a 5-dimension Panel containing the
-    whole data set.
+    Generates the Farseer-NMR Cube: a 5-dimension DenseCube containing
+    the whole data set.
     
     Parameters:
         paths (list): absolute paths of all the input peaklists
@@ -77,15 +81,33 @@ class FarseerCube:
         hasxx, hasyy, haszz (bool): True if there are more than one data
             point along that dimension. False otherwise (default).
         
-        p5d (pandas.Panel): a 5-dimension pandas.Panel.
+        cs_corrections (pd.DataFrame): F1 and F2 chemical shift
+            corrections of each (z, y, x) data point. Created in
+            .correct_shifts_backbone().
+        
+        peaklists_p5d, sidechains_p5d (DenseCube): the Farseer-NMR Cube
+            for backbone and sidechain resonances. Created in
+            .init_Farseer_cube().
     
         tmp_vars (dict): stored temporary variables for functions.
+        
+        load_workers (int): number of threads used to read input files.
+        
+        cache (PeaklistCache): cache of parsed peaklists, None if
+            not used.
+        
+        cache_keys (dict): {(z, y, x): str} cache key of each peaklist.
+        
+        cache_entries (dict): {(z, y, x): dict} peaklists already split
+            that were read from the cache.
     """
     def __init__(
             self, spectra_path,
             has_sidechains=False,
             applyFASTA=False,
-            FASTAstart=1):
+            FASTAstart=1,
+            load_workers=1,
+            cache=None):
         """
         Initiates the object,
         
@@ -99,6 +121,13 @@ class FarseerCube:
             information. Defaults to False.
         
         FASTAstart (int): The first residue in the FASTA file.
+        
+        load_workers (opt, int): number of threads used to read the
+            input files concurrently in .load_experiments().
+            Defaults to 1, files are read sequentially.
+        
+        cache (opt, PeaklistCache): cache of parsed peaklists. Peaklists
+            and FASTA files found in the cache are not parsed again.
         """
         self.logger = Logger.FarseerLogger(__name__).setup_log()
         #logging.config.dictConfig(fslogconf.farseer_log_config)
@@ -107,6 +136,7 @@ class FarseerCube:
         # Decomposing the 'spectra' path
         # self.paths will be used in load_experiments()
         # http://stackoverflow.com/questions/14798220/how-can-i-search-sub-folders-using-glob-glob-module-in-python
+        self.spectra_path = spectra_path
         self.paths = \
             sorted(
                 [os.path.join(dirpath, f) 
@@ -119,10 +149,17 @@ class FarseerCube:
         self.allfasta = {}
         # Initiates dictionary for helper variables
         self.tmp_vars = {}
+        # chemical shift corrections, see .correct_shifts_backbone()
+        self.cs_corrections = None
         # loads user input information into the instance
         self.has_sidechains = has_sidechains
         self.FASTAstart = FASTAstart
         self.applyFASTA = applyFASTA
+        self.load_workers = load_workers
+        self.cache = cache
+        self.cache_keys = {}
+        self.cache_entries = {}
+        self._cache_lookups = {}
         # lists that contain axes datapoint names
         self.zzcoords = None
         self.yycoords = None
@@ -133,6 +170,11 @@ class FarseerCube:
         self.haszz = False
         self.hasyy = False
         self.hasxx = False
+        # the Farseer-NMR Cube, see .init_Farseer_cube()
+        self.peaklists_p5d = None
+        self.sidechains_p5d = None
+        # number of residues in each FASTA file, see .load_snapshot()
+        self.fasta_lengths = None
         # writes to log
         self.logs('Initiates Farseer Set', istitle=True)
         input_log = \
@@ -145,22 +187,6 @@ FASTA starting residue: {}  """.\
                 self.FASTAstart
                 )
         self.logs(input_log)
-        # initiates panel 5D object to initiate Farseer-NMR Cube
-        # in .init_Farseer_cube()
-        self.p5d = pd.core.panelnd.create_nd_panel_factory(
-            klass_name='Panel5D',
-            orders=['cool', 'labels', 'items', 'major_axis', 'minor_axis'],
-            slices={
-                'labels': 'labels',
-                'items': 'items',
-                'major_axis': 'major_axis',
-                'minor_axis': 'minor_axis'
-                },
-            slicer=pd.Panel4D,
-            aliases={'major': 'index', 'minor': 'minor_axis'},
-            stat_axis=2
-            )
-        
     
     def _abort(self, wet):
         """
@@ -412,38 +438,58 @@ You should verify that your start Fasta residue number is correct.".\
         
         return None
     
-    def _check_res_duplicates(self, df, z, y, x):
+    def _check_res_duplicates(self, stacked):
         """
         Checks if there are duplicated residue entries in peaklists.
         
         Parameters:
-            - df (pd.DataFrame): the peaklist dataframe to investigate
+            - stacked (pd.DataFrame): the peaklists to investigate
+                concatenated by ._stack_peaklists().
         """
-        where_duplicates = df[z][y][x].loc[:,'ResNo'].duplicated(keep=False)
+        coords_resno = pd.MultiIndex.from_arrays([
+            stacked.index.get_level_values(0),
+            stacked.index.get_level_values(1),
+            stacked.index.get_level_values(2),
+            stacked.loc[:,'ResNo']
+            ])
+        where_duplicates = coords_resno.duplicated(keep=False)
         
         if where_duplicates.any():
+            # reports the first peaklist with repeated entries
+            z, y, x = stacked.index[where_duplicates][0][:3]
+            in_pkl = \
+                (stacked.index.get_level_values(0) == z) \
+                & (stacked.index.get_level_values(1) == y) \
+                & (stacked.index.get_level_values(2) == x)
+            lines = \
+                stacked.index[where_duplicates & in_pkl].get_level_values(3)
             msg = "The peaklist [{}][{}][{}] contains repeated residue entries \
 in lines: {}.".format(
                 z,
                 y,
                 x,
-                [2+int(i) for i in \
-                    where_duplicates.index[where_duplicates].tolist()]
+                [2+int(i) for i in lines.tolist()]
                 )
             self._abort(fsw(msg_title='ERROR', msg=msg, wet_num=24))
         
         return None
     
-    def _checks_misleading_chars(self, z, y, x):
+    def _checks_misleading_chars(self, z, y, x, peaklist=None):
         """
         Checks for the presence misleading characters in the DataFrame.
         This may come from entries of unassigned residues
         that were not removed.
+        
+        <peaklist> overrides the peaklist in self.allpeaklists, its index
+        must be the original line index.
         """
+        if peaklist is None:
+            peaklist = self.allpeaklists[z][y][x]
+        
         # for assignment cols
         ## empty
-        empty_cells_f1 = self.allpeaklists[z][y][x].loc[:,'Assign F1'].isnull()
-        empty_cells_f2 = self.allpeaklists[z][y][x].loc[:,'Assign F2'].isnull()
+        empty_cells_f1 = peaklist.loc[:,'Assign F1'].isnull()
+        empty_cells_f2 = peaklist.loc[:,'Assign F2'].isnull()
         
         if empty_cells_f1.values.any() or empty_cells_f2.values.any():
             rows_bool = empty_cells_f1 | empty_cells_f2
@@ -458,11 +504,11 @@ information in lines {}. Please review that peaklist.".format(
         
         ## misleading chars
         non_digit_f1 = \
-            self.allpeaklists[z][y][x].loc[:,'Assign F1'].\
+            peaklist.loc[:,'Assign F1'].\
                 str.strip().str.contains('\W', regex=True)
         
         non_digit_f2 = \
-            self.allpeaklists[z][y][x].loc[:,'Assign F2'].\
+            peaklist.loc[:,'Assign F2'].\
                 str.strip().str.contains('\W', regex=True)
         
         if  non_digit_f1.any() or non_digit_f2.any():
@@ -488,7 +534,7 @@ charaters in Assignment columns in line {}.".format(
             ]
         
         for col in cols:
-            non_digit = self.allpeaklists[z][y][x].loc[:,col].\
+            non_digit = peaklist.loc[:,col].\
                 astype(str).str.strip().str.contains(
                     '[\!\"\#\$\%\&\\\'\(\)\*\,\-\/\:\;\<\=\>\?\@\[\]\^\_\`\{\|\}\~]',
                     regex=True
@@ -521,6 +567,10 @@ charaters in line {} of column [{}].".format(
 
         for z in self.zzcoords:
             for y in self.yycoords:
+                if self.fasta_lengths is not None:
+                    l.append(self.fasta_lengths[z][y])
+                    continue
+                
                 key = list(self.allfasta[z][y].keys())[0]
                 l.append(self.allfasta[z][y][key].shape[0])
             
@@ -538,7 +588,7 @@ Please correct your .fasta files.'
         
         return None
     
-    def _compare_peaklists_length(self, dp1, dp2, axis, df_dict):
+    def _compare_peaklists_length(self, dp1, dp2, axis, pkl_lengths):
         """
         Verifies if all peaklists in a series have the same number of 
         residues before a FarseerSeries object is created.
@@ -550,16 +600,11 @@ Please correct your .fasta files.'
             
             - axis (str): the axis long which the series will be generated.
             
-            - df_dict (dict:pd.DataFrame): A dictionary containing
-                pd.DataFrames corresponding to peaklists.
+            - pkl_lengths (dict:int): A dictionary containing the number
+                of residues of each peaklist in the series.
         """
         
-        pkl_lengths = []
-        
-        for key, peaklist in df_dict.items():
-            pkl_lengths.append(peaklist.shape[0])
-        
-        if not(len(set(pkl_lengths))) == 1:
+        if not(len(set(pkl_lengths.values()))) == 1:
             msg = "Peaklists proposed for series [{}][{}] along {} axis have \
 different lengths.".\
                 format(dp2, dp1, axis[-1].upper())
@@ -673,6 +718,11 @@ different lengths.".\
         'Peak Status', assigns string 'measured' to identify the peaks
             present in this peaklist as experimentally measured.
         
+        All the peaklists of the Farseer-NMR Cube are concatenated
+        in a single pd.DataFrame (see ._stack_peaklists()) so that each
+        step is performed once for the whole dataset. Results are
+        scattered back to the nested dictionary at the end.
+        
         Procedure:
         
         1. Extracts residue information from 'Assigned F1' column,
@@ -692,8 +742,9 @@ different lengths.".\
             3.1 if peaklist is empty adds all dummy rows of type <missing>.
         
         4. Sorts the peaklist according to 'ResNo' just in case the
-        original .CSV file was not sorted. For correct sorting 'ResNo'
-        as to be set astype int and returned back to str.
+        original .CSV file was not sorted. 'ResNo' is kept as int from
+        here on, it is the canonical residue index used for reindexing,
+        sorting and joins.
 
         (conditional). If sidechains are present in the peaklist:
         identifies the sidechains entries (rows) and counts the number
@@ -704,123 +755,89 @@ different lengths.".\
         title = 'IDENTIFIES RESIDUE INFORMATION FROM ASSIGNMENT COLUMN'
         self.logs(title, istitle=True)
         
-        for z, y, x in it.product(self.zzcoords, self.yycoords, self.xxcoords):
-            
-            # checks misleading chars
-            self._checks_misleading_chars(z, y, x)
-            
-            # Step 1
-            resInfo = \
-                self.allpeaklists[z][y][x].\
-                    loc[:,'Assign F1'].str.extract('(\d+)(.{3})', expand=True)
-            resInfo.columns = ['ResNo', '3-letter']
-            
-            # Step 2
-            resInfo.loc[:,'1-letter'] = \
-                resInfo.loc[:,"3-letter"].map(aal3tol1.get)
-            
-            # Step 3
-            self.allpeaklists[z][y][x] = \
-                pd.concat([self.allpeaklists[z][y][x], resInfo], axis=1)
-            
-            # Adds the 'Peak Status' Column. All the peaks in the peaklist
-            # at this stage are peaks that have been measured and are
-            # identified in the NMR spectrum. Therefore all the peaks here
-            # are labeled as 'measured'. On later stages of the script
-            # peaks not identified will be added to the peaklist, and those
-            # peaks will be label as 'missing' or 'unassigned'.
-            try:
-                self.allpeaklists[z][y][x].loc[:,'Peak Status'] = 'measured'
-            
-            except ValueError:
-                # if the peaklist is an empty file containing only the header.
-                self.allpeaklists[z][y][x] = \
-                    self.allpeaklists[z][y][self.xxref].copy()
-                self.allpeaklists[z][y][x].\
-                    loc[:,[
-                        'Peak Status',
-                        'Merit',
-                        'Position F1',
-                        'Position F2',
-                        'Height',
-                        'Volume',
-                        'Line Width F1 (Hz)',
-                        'Line Width F2 (Hz)'
-                        ]
-                    ] = [
-                            'missing',
-                            np.nan,
-                            np.nan,
-                            np.nan,
-                            np.nan,
-                            np.nan,
-                            np.nan,
-                            np.nan
-                            ]
-            
-            # sidechains entries always end with an 'a' or 'b' in the AssignF1
-            # use of regex: http://www.regular-expressions.info/tutorial.html
-            # identify the sidechain rows
-            sidechains_bool = \
-                self.allpeaklists[z][y][x].\
-                    loc[:,'Assign F1'].str.contains('[^HN]$')
-            self.has_sidechains = any(sidechains_bool)
-            
-            self.logger.debug("sidechains_bool.value_counts(): {}".format(
-                sidechains_bool.value_counts()
-                ))
-            self.logger.debug("Any? {}".format(self.has_sidechains))
-            # initiates SD counter
-            sd_count = {True:0}
-            
-            # if the user says it has sidechains and there are actually sidechains.
+        cube_coords = \
+            list(it.product(self.zzcoords, self.yycoords, self.xxcoords))
+        # peaklists read from the cache are already split
+        cached_coords = [c for c in cube_coords if c in self.cache_entries]
+        
+        for z, y, x in cube_coords:
+            if not((z, y, x) in cached_coords):
+                # checks misleading chars
+                self._checks_misleading_chars(z, y, x)
+        
+        # cached peaklists are validated as freshly parsed ones
+        if cached_coords:
+            self._checks_cached_entries(cached_coords)
+        
+        # peaklists that are empty files containing only the header
+        # are completed in Step 3.1
+        empty_coords = [
+            (z, y, x) for z, y, x in cube_coords
+                if self.allpeaklists[z][y][x].shape[0] == 0 \
+                    and not((z, y, x) in cached_coords)
+            ]
+        coords = [
+            c for c in cube_coords
+                if not(c in empty_coords or c in cached_coords)
+            ]
+        
+        # {(z, y, x): {'backbone': pd.DataFrame,
+        #              'sidechains': pd.DataFrame or None,
+        #              'sd_count': int}}
+        split = {}
+        
+        if coords:
+            split.update(self._splits_assignments(coords))
+        
+        for coord in cached_coords:
+            split[coord] = self.cache_entries[coord]
+        
+        self.has_sidechains = \
+            any(entry['sd_count'] > 0 for entry in split.values())
+        
+        self.logger.debug("Any? {}".format(self.has_sidechains))
+        
+        # scatters the results back to the Farseer-NMR Cube
+        for coord, entry in split.items():
+            z, y, x = coord
+            self.allpeaklists[z][y][x] = entry['backbone']
             
             if self.has_sidechains:
+                self.allsidechains.setdefault(z, {}).setdefault(y, {})
                 
-                self.logger.debug("<has_sidechains> set to: {}".format(self.has_sidechains))
-                self.logger.debug("Is self.allsidechains? {}".format(bool(self.allsidechains)))
+                if entry['sidechains'] is None:
+                    self.allsidechains[z][y][x] = pd.DataFrame(
+                        columns=list(entry['backbone'].columns)+['ATOM']
+                        )
                 
-                # two condition are evaluated in case the user has set 
-                #sidechains to True but there are actually no sidechains.
-                sd_count = sidechains_bool.value_counts()
-                # DataFrame with side chains
-                self.allsidechains[z][y][x] = \
-                    self.allpeaklists[z][y][x].loc[sidechains_bool,:]
-                # adds sidechain nomenclature
-                self.allsidechains[z][y][x].loc[:,'ATOM'] = \
-                    self.allsidechains[z][y][x].loc[:,'Assign F1'].\
-                        str.split('[HN]', expand=True).loc[:,1]
-                # resets index
-                self.allsidechains[z][y][x].reset_index(inplace=True)
-                # ResNo column to int preparing for reindex
-                self.allsidechains[z][y][x].loc[:,'ResNo'] = \
-                    self.allsidechains[z][y][x]['ResNo'].astype(int)
-                # sorted dataframe based on ResNo and ATOM 'a' 'b' type
-                self.allsidechains[z][y][x].\
-                    sort_values(by=['ResNo','ATOM'] , inplace=True)
-                # revers ResNo to string
-                self.allsidechains[z][y][x].loc[:,'ResNo'] = \
-                    self.allsidechains[z][y][x]['ResNo'].astype(str)
-                # creates backbone peaklist without sidechains
-                self.allpeaklists[z][y][x] = \
-                    self.allpeaklists[z][y][x].loc[-sidechains_bool,:]
-            
-            # Step 4
-            self._check_res_duplicates(self.allpeaklists, z, y, x)
-            self.allpeaklists[z][y][x].loc[:,'ResNo'] = \
-                self.allpeaklists[z][y][x]['ResNo'].astype(int)
-            self.allpeaklists[z][y][x].sort_values(by='ResNo', inplace=True)
-            self.allpeaklists[z][y][x].loc[:,'ResNo'] = \
-                self.allpeaklists[z][y][x].loc[:,'ResNo'].astype(str)
-            self.allpeaklists[z][y][x].reset_index(inplace=True)
+                else:
+                    self.allsidechains[z][y][x] = entry['sidechains']
+        
+        # Step 3.1
+        for z, y, x in empty_coords:
+            self.allpeaklists[z][y][x] = \
+                self._missing_peaklist(self.allpeaklists[z][y][self.xxref])
             
+            if self.has_sidechains:
+                self.allsidechains.setdefault(z, {}).setdefault(y, {})
+                self.allsidechains[z][y][x] = \
+                    self._missing_peaklist(
+                        self.allsidechains[z][y][self.xxref]
+                        )
+        
+        for z, y, x in cube_coords:
             # Writes sanity check
             if {'1-letter', 'ResNo', '3-letter', 'Peak Status'}.\
                     issubset(self.allpeaklists[z][y][x].columns):
                 columns_OK = 'OK'
             
+            else:
+                columns_OK = 'Failed'
+            
+            sd_found = split.get((z, y, x), {'sd_count': 0})['sd_count']
+            
             # the script does not correct for the fact that the user sets
-            # no sidechains but that actually are sidechains, 
+            # no sidechains but that actually are sidechains,
             # though the log file register such occurrence.
             logs = \
 '**[{}][{}][{}]** new columns inserted:  {}  \
@@ -832,34 +849,259 @@ different lengths.".\
                     x,
                     columns_OK,
                     self.has_sidechains,
-                    (True in sidechains_bool.value_counts()),
-                    sd_count[True]
+                    sd_found > 0,
+                    sd_found
                     )
             
             self.logs(logs)
-            
+        
+        if self.cache is not None:
+            self.logs(
+                '**Peaklists read from cache:** {} of {}'.\
+                    format(len(cached_coords), len(cube_coords))
+                )
+        
         # confirms F1 and F2 coherency with nuclei
         self._checks_posf1_posf2_nuclei(self.allpeaklists)
         
+        # stores the newly split peaklists for next runs,
+        # only after all the checks passed
+        if self.cache is not None:
+            for coord in coords:
+                self.cache.save(self.cache_keys[coord], split[coord])
+        
+        return None
+    
+    def _checks_cached_entries(self, coords):
+        """
+        Runs on peaklists read from the cache the checks that
+        .split_res_info() runs on parsed peaklists.
+        
+        Parameters:
+            coords (list): the (z, y, x) coordinates of the cached
+                peaklists.
+        """
+        # cached peaklists keep the original line index in column 'index'
+        original = {
+            coord: pd.concat(
+                [
+                    self.cache_entries[coord]['backbone'],
+                    self.cache_entries[coord]['sidechains']
+                    ]
+                ).set_index('index').sort_index()
+            for coord in coords
+            }
+        
+        for coord in coords:
+            self._checks_misleading_chars(*coord, peaklist=original[coord])
+        
+        backbones = {
+            coord: self.cache_entries[coord]['backbone'].set_index('index')
+            for coord in coords
+            }
+        self._check_res_duplicates(
+            pd.concat(
+                [backbones[coord] for coord in coords],
+                keys=coords,
+                names=['z', 'y', 'x']
+                )
+            )
+        
+        return None
+    
+    def _splits_assignments(self, coords):
+        """
+        Performs Steps 1 to 4 of .split_res_info() at once for all the
+        peaklists in <coords>.
+        
+        Parameters:
+            coords (list): the (z, y, x) coordinates of the peaklists.
+        
+        Returns:
+            A dictionary {(z, y, x): {'backbone': pd.DataFrame,
+                'sidechains': pd.DataFrame or None, 'sd_count': int}}
+        """
+        # keeps the original columns order of each peaklist
+        columns = {
+            (z, y, x): list(self.allpeaklists[z][y][x].columns)
+                for z, y, x in coords
+            }
+        stacked = self._stack_peaklists(self.allpeaklists, coords)
+        
+        # Step 1
+        resInfo = \
+            stacked.loc[:,'Assign F1'].str.extract('(\d+)(.{3})', expand=True)
+        resInfo.columns = ['ResNo', '3-letter']
+        resInfo.loc[:,'ResNo'] = resInfo.loc[:,'ResNo'].astype(int)
+        
+        # Step 2
+        resInfo.loc[:,'1-letter'] = \
+            resInfo.loc[:,"3-letter"].map(aal3tol1.get)
+        
+        # Step 3
+        stacked = pd.concat([stacked, resInfo], axis=1)
+        
+        # Adds the 'Peak Status' Column. All the peaks in the peaklist
+        # at this stage are peaks that have been measured and are
+        # identified in the NMR spectrum. Therefore all the peaks here
+        # are labeled as 'measured'. On later stages of the script
+        # peaks not identified will be added to the peaklist, and those
+        # peaks will be label as 'missing' or 'unassigned'.
+        stacked.loc[:,'Peak Status'] = 'measured'
+        new_cols = ['ResNo', '3-letter', '1-letter', 'Peak Status']
+        
+        # sidechains entries always end with an 'a' or 'b' in the AssignF1
+        # use of regex: http://www.regular-expressions.info/tutorial.html
+        # identify the sidechain rows
+        sidechains_bool = \
+            stacked.loc[:,'Assign F1'].str.contains('[^HN]$')
+        sd_count = sidechains_bool.groupby(level=[0, 1, 2]).sum()
+        sd_groups = {}
+        
+        self.logger.debug("sidechains count: {}".format(sd_count))
+        
+        if any(sidechains_bool):
+            # DataFrame with side chains
+            sidechains = stacked.loc[sidechains_bool,:].copy()
+            # adds sidechain nomenclature
+            sidechains.loc[:,'ATOM'] = \
+                sidechains.loc[:,'Assign F1'].\
+                    str.split('[HN]', expand=True).loc[:,1]
+            # sorted dataframe based on ResNo and ATOM 'a' 'b' type
+            sidechains.sort_values(by=['ResNo','ATOM'] , inplace=True)
+            sd_groups = dict(list(sidechains.groupby(level=[0, 1, 2], sort=False)))
+            # creates backbone peaklists without sidechains
+            stacked = stacked.loc[-sidechains_bool,:]
+        
+        # Step 4
+        self._check_res_duplicates(stacked)
+        stacked = stacked.sort_values(by='ResNo', kind='mergesort')
+        bb_groups = dict(list(stacked.groupby(level=[0, 1, 2], sort=False)))
+        
+        split = {}
+        
+        for coord in coords:
+            split[coord] = {
+                'backbone': bb_groups.get(coord, stacked.iloc[0:0]).\
+                    loc[:,columns[coord]+new_cols].\
+                    reset_index(level=[0, 1, 2], drop=True).\
+                    reset_index(),
+                'sidechains': None,
+                'sd_count': int(sd_count.get(coord, 0))
+                }
+            
+            if coord in sd_groups:
+                split[coord]['sidechains'] = \
+                    sd_groups[coord].\
+                        loc[:,columns[coord]+new_cols+['ATOM']].\
+                        reset_index(level=[0, 1, 2], drop=True).\
+                        reset_index()
+        
+        return split
+    
+    def _stack_peaklists(self, target, coords):
+        """
+        Concatenates peaklists of the Farseer-NMR Cube in a single
+        pd.DataFrame.
+        
+        Parameters:
+            target (dict): nested dictionary of peaklists, for example,
+                self.allpeaklists or self.allsidechains.
+            
+            coords (list): the (z, y, x) coordinates of the peaklists
+                to concatenate.
+        
+        Returns:
+            pd.DataFrame indexed by (z, y, x, original row index).
+        """
+        
+        return pd.concat(
+            [target[z][y][x] for z, y, x in coords],
+            keys=coords,
+            names=['z', 'y', 'x']
+            )
+    
+    def _scatter_peaklists(self, target, stacked, coords):
+        """
+        Reverts ._stack_peaklists(), stores each peaklist of <stacked>
+        back in the nested dictionary <target>.
+        
+        Parameters:
+            target (dict): nested dictionary of peaklists, for example,
+                self.allpeaklists or self.allsidechains.
+            
+            stacked (pd.DataFrame): peaklists concatenated by
+                ._stack_peaklists().
+            
+            coords (list): the (z, y, x) coordinates of the peaklists.
+        """
+        groups = dict(list(stacked.groupby(level=[0, 1, 2], sort=False)))
+        
+        for coord in coords:
+            z, y, x = coord
+            target[z][y][x] = \
+                groups.get(coord, stacked.iloc[0:0]).\
+                    reset_index(level=[0, 1, 2], drop=True)
+        
         return None
     
+    def _missing_peaklist(self, ref_pkl):
+        """
+        Generates a peaklist where all the peaks of <ref_pkl> are
+        <missing>. Used for input peaklists that are empty files
+        containing only the header.
+        
+        Parameters:
+            ref_pkl (pd.DataFrame): the peaklist to use as template.
+        
+        Returns:
+            The new pd.DataFrame.
+        """
+        missing_pkl = ref_pkl.copy()
+        missing_pkl.\
+            loc[:,[
+                'Peak Status',
+                'Merit',
+                'Position F1',
+                'Position F2',
+                'Height',
+                'Volume',
+                'Line Width F1 (Hz)',
+                'Line Width F2 (Hz)'
+                ]
+            ] = [
+                    'missing',
+                    np.nan,
+                    np.nan,
+                    np.nan,
+                    np.nan,
+                    np.nan,
+                    np.nan,
+                    np.nan
+                    ]
+        
+        return missing_pkl
+    
     def correct_shifts_backbone(self, ref_res):
         """
         Corrects Chemical Shifts in a peaklist according to an internal 
         reference peak.
         
         This function operates only along the X axis and for Backbone.
-        Cycles over all the Z and Y data points.
+        The reference peak chemical shifts of all the Z, Y and X data
+        points are gathered in a single lookup and the correction is
+        applied as one broadcast subtraction over all the peaklists.
         
         Parameters:
             ref_res (int): the reference residue number.
+        
+        Modifies:
+            self.cs_corrections (pd.DataFrame): the F1 and F2 correction
+                applied to each (z, y, x) data point.
         """
         
         # confirms correct input
-        if isinstance(ref_res, int):
-            ref_res = str(ref_res)
-        
-        else:
+        if not(isinstance(ref_res, int)):
             msg = \
 'Argument ref_res for method .correct_shifts_backbone() must be of type <int>.'
             self.logs(msg)
@@ -874,42 +1116,65 @@ different lengths.".\
         title = 'CORRECTS BACKBONE CHEMICAL SHIFTS BASED ON A RESIDUE {}'.\
             format(ref_res)
         self.logs(title, istitle=True)
-        ref_data = {}
         
-        for z, y, x in it.product(self.zzcoords, self.yycoords, self.xxcoords):
-            dp_res_mask = \
-                self.allpeaklists[z][y][x].loc[:,'ResNo'] == ref_res
-            dp_F1_cs = \
-                self.allpeaklists[z][y][x].loc[dp_res_mask,'Position F1']
-            dp_F2_cs = \
-                self.allpeaklists[z][y][x].loc[dp_res_mask,'Position F2']
-            
-            # Reads the information of the selected peak in the reference
-            # spectrum
-            if x == self.xxref:
-                # loads the chemical shift for F1 of the ref res
-                ref_data['F1_cs'] = dp_F1_cs
-                # loads the chemical shift for the F2 of the ref res
-                ref_data['F2_cs'] = dp_F2_cs
-            
-            # For the reference residue, calculates the difference between the 
-            # chemical shift in the reference and the current spectra. If 
-            # current == reference, difference should yield 0.
-            F1_cs_diff = float(dp_F1_cs) - float(ref_data['F1_cs'])
-            F2_cs_diff = float(dp_F2_cs) - float(ref_data['F2_cs'])
-            # copies the chemical shift data to a backup column
-            self.allpeaklists[z][y][x].loc[:,'Position F1 original'] = \
-                self.allpeaklists[z][y][x].loc[:,'Position F1']
-            self.allpeaklists[z][y][x].loc[:,'Position F2 original'] = \
-                self.allpeaklists[z][y][x].loc[:,'Position F2']
-            # records the used correction factor
-            self.allpeaklists[z][y][x].loc[:,'Pos F1 correction'] = F1_cs_diff
-            self.allpeaklists[z][y][x].loc[:,'Pos F2 correction'] = F2_cs_diff
-            # corrects the chemical shift by applying a subtration
-            self.allpeaklists[z][y][x].loc[:,'Position F1'] = \
-                self.allpeaklists[z][y][x].loc[:,'Position F1'].sub(F1_cs_diff)
-            self.allpeaklists[z][y][x].loc[:,'Position F2'] = \
-                self.allpeaklists[z][y][x].loc[:,'Position F2'].sub(F2_cs_diff)
+        coords = \
+            list(it.product(self.zzcoords, self.yycoords, self.xxcoords))
+        stacked = self._stack_peaklists(self.allpeaklists, coords)
+        positions = ['Position F1', 'Position F2']
+        
+        # chemical shifts of the reference residue in every data point
+        # shape (z, y, x, 2)
+        ref_res_cs = \
+            stacked.loc[stacked.loc[:,'ResNo'] == ref_res, positions]
+        ref_res_cs.index = ref_res_cs.index.droplevel(3)
+        ref_res_cs = \
+            ref_res_cs.reindex(pd.MultiIndex.from_tuples(coords)).\
+                values.astype(float).\
+                reshape(
+                    len(self.zzcoords),
+                    len(self.yycoords),
+                    len(self.xxcoords),
+                    2
+                    )
+        
+        # the reference residue is not in all the peaklists
+        no_ref = np.isnan(ref_res_cs).any(axis=-1).ravel()
+        
+        if no_ref.any():
+            z, y, x = coords[np.flatnonzero(no_ref)[0]]
+            self._check_ref_res(self.allpeaklists[z][y][x].loc[:,'ResNo'], ref_res)
+        
+        # For the reference residue, calculates the difference between the
+        # chemical shift in the reference and the current spectra. If
+        # current == reference, difference should yield 0.
+        xref_cs = ref_res_cs[:,:,[self.xxcoords.index(self.xxref)],:]
+        cs_diff = ref_res_cs - xref_cs
+        self.cs_corrections = pd.DataFrame(
+            cs_diff.reshape(-1, 2),
+            index=pd.MultiIndex.from_tuples(coords),
+            columns=['Pos F1 correction', 'Pos F2 correction']
+            )
+        
+        # broadcasts the correction of each data point to its peaks
+        peak_corrections = \
+            self.cs_corrections.reindex(stacked.index.droplevel(3)).values
+        # copies the chemical shift data to a backup column
+        stacked.loc[:,'Position F1 original'] = stacked.loc[:,'Position F1']
+        stacked.loc[:,'Position F2 original'] = stacked.loc[:,'Position F2']
+        # records the used correction factor
+        stacked.loc[:,'Pos F1 correction'] = peak_corrections[:,0]
+        stacked.loc[:,'Pos F2 correction'] = peak_corrections[:,1]
+        # corrects the chemical shift by applying a subtraction
+        stacked.loc[:,positions] = \
+            stacked.loc[:,positions].values.astype(float) - peak_corrections
+        
+        self._scatter_peaklists(self.allpeaklists, stacked, coords)
+        
+        for (z, y, x), ref_cs, xref, diff in zip(
+                coords,
+                ref_res_cs.reshape(-1, 2),
+                np.broadcast_to(xref_cs, ref_res_cs.shape).reshape(-1, 2),
+                cs_diff.reshape(-1, 2)):
             # logs the operation
             logs = \
 '**[{}][{}][{}]** | F1: {:.4f}-{:.4f}={:.4f} | F2: {:.4f}-{:.4f}={:.4f}'.\
@@ -917,8 +1182,8 @@ different lengths.".\
                     z,
                     y,
                     x,
-                    float(dp_F1_cs), float(ref_data['F1_cs']), F1_cs_diff, 
-                    float(dp_F2_cs), float(ref_data['F2_cs']), F2_cs_diff
+                    ref_cs[0], xref[0], diff[0],
+                    ref_cs[1], xref[1], diff[1]
                     )
             self.logs(logs)
         
@@ -931,20 +1196,26 @@ different lengths.".\
         Can only be performed after .correct_shifts_backbone().
         
         This function operates only along the X axis and for Backbone.
-        Cycles over all the Z and Y data points.
+        Applies the corrections of all the Z, Y and X data points in a
+        single broadcast subtraction.
         """
         
         title = \
 'CORRECTS SIDECHAINS CHEMICAL SHIFTS BASED ON Previous backbone correction'
         self.logs(title, istitle=True)
         
-        for z, y, x in it.product(self.zzcoords, self.yycoords, self.xxcoords):
-            self.allsidechains[z][y][x].loc[:,'Position F1'] = \
-                self.allsidechains[z][y][x].loc[:,'Position F1'].\
-                    sub(self.allpeaklists[z][y][x].loc[0,'Pos F1 correction'])
-            self.allsidechains[z][y][x].loc[:,'Position F2'] = \
-                self.allsidechains[z][y][x].loc[:,'Position F2'].\
-                    sub(self.allpeaklists[z][y][x].loc[0,'Pos F2 correction'])
+        coords = \
+            list(it.product(self.zzcoords, self.yycoords, self.xxcoords))
+        stacked = self._stack_peaklists(self.allsidechains, coords)
+        positions = ['Position F1', 'Position F2']
+        peak_corrections = \
+            self.cs_corrections.reindex(stacked.index.droplevel(3)).values
+        stacked.loc[:,positions] = \
+            stacked.loc[:,positions].values.astype(float) - peak_corrections
+        
+        self._scatter_peaklists(self.allsidechains, stacked, coords)
+        
+        for z, y, x in coords:
             s2w = \
 '**[{}][{}][{}]** Corrected chemical shift fot sidechain residues.'.\
                 format(z, y, x)
@@ -952,15 +1223,20 @@ different lengths.".\
         
         return None
     
-    def seq_expand(self, ref_pkl, target_pkl, resonance_type, fillna):
+    def seq_expand(self, targets, refs, resonance_type, fillna):
         """
-        Expands a <target> peaklist to the size of the <reference>.
+        Expands <target> peaklists to the size of their <reference>.
         Adds rows of missing residues.
         
+        All the peaklists are concatenated and reindexed against the
+        concatenated reference residue index in a single operation,
+        followed by a single fill pass.
+        
         Parameters:
-            ref_pkl (pd.DataFrame): the reference peaklist
+            targets (dict): {(z, y, x): pd.DataFrame} the target peaklists
             
-            target_pkl (pd.DataFrame): the target peaklist
+            refs (dict): {(z, y, x): pd.DataFrame} the reference peaklist
+                of each target.
             
             resonance_type (str): {'Backbone'. 'Sidechain'}
             
@@ -971,59 +1247,105 @@ different lengths.".\
                      'Details': 'None'}
         
         Returns:
-            The expanded pd.DataFrame
-            A list with information on the peaklist length evolution
+            A dictionary {(z, y, x): pd.DataFrame} of expanded peaklists
+            A dictionary {(z, y, x): list} with information on the
+                peaklist length evolution
                 [target initial length, ref length, target final length]
         """
-        # merges ResNo and ATOM cols to keep sorted
+        # sidechains are indexed by residue number and ATOM 'a' 'b' type
         if resonance_type=='Sidechains':
-            ref_pkl.loc[:,'ResNo'] = \
-                ref_pkl.loc[:,['ResNo', 'ATOM']].\
-                    apply(lambda x: ''.join(x), axis=1)
-            target_pkl.loc[:,'ResNo'] = \
-                target_pkl.loc[:,['ResNo', 'ATOM']].\
-                    apply(lambda x: ''.join(x), axis=1)
-        
-        # creates an index based on the residue numbers of the reference
-        # peaklist
-        ind = ref_pkl.loc[:,'ResNo']
-        # reads size of reference index
-        length_ind = ind.size 
-        # reads size of target peaklist
-        target_ind_init_len = target_pkl.shape[0]
-        # expands the target peaklist to the new index
+            index_cols = ['ResNo', 'ATOM']
+        
+        else:
+            index_cols = ['ResNo']
+        
+        # columns transfered from the reference to the expanded peaklists
+        ref_cols = ['3-letter', '1-letter', 'Assign F1', 'Assign F2']
+        coords = list(targets.keys())
+        
+        stacked_ref = pd.concat(
+            [refs[coord].loc[:,index_cols+ref_cols] for coord in coords],
+            keys=coords
+            )
+        # creates an index based on the data point coordinates and the
+        # residue numbers of the reference peaklists
+        ind = pd.MultiIndex.from_arrays(
+            [stacked_ref.index.get_level_values(i) for i in range(3)] \
+                + [stacked_ref.loc[:,col] for col in index_cols],
+            names=['z', 'y', 'x'] + index_cols
+            )
+        
+        stacked = pd.concat(
+            [targets[coord] for coord in coords],
+            keys=coords,
+            names=['z', 'y', 'x']
+            )
+        stacked.index = stacked.index.droplevel(3)
+        stacked.set_index(index_cols, append=True, inplace=True)
+        
+        # expands the target peaklists to the new index
         try:
-            target_pkl = \
-                target_pkl.set_index('ResNo').\
-                    reindex(ind).reset_index().fillna(fillna)
+            if not(stacked.index.is_unique):
+                raise ValueError('non-unique residue index')
+            
+            stacked = stacked.reindex(ind).fillna(fillna)
+        
         except ValueError:
             msg = "Farseer-NMR could not reindex this peaklist. There are \
 several input errors that may occur in this case. Read the Documentation for \
 more details." 
             self._abort(fsw(msg_title='ERROR', msg=msg, wet_num=24))
         
-        # reads length of the expanded peaklist
-        target_ind_final_len = target_pkl.shape[0]
         # transfers information of the different columns
         # from the reference to the expanded peaklist
-        target_pkl.loc[:,'3-letter'] = ref_pkl.loc[:,'3-letter']
-        target_pkl.loc[:,'1-letter'] = ref_pkl.loc[:,'1-letter']
-        target_pkl.loc[:,'Assign F1'] = ref_pkl.loc[:,'Assign F1']
-        target_pkl.loc[:,'Assign F2'] = ref_pkl.loc[:,'Assign F2']
-        
-        # reverts previous merge
-        if resonance_type=='Sidechains':
-            target_pkl.loc[:,'ATOM'] = ref_pkl.loc[:,'ATOM']
-            target_pkl.loc[:,'ResNo'] = ref_pkl.loc[:,'ResNo'].str.extract('(\d+)', expand=False)
-            ref_pkl.loc[:,'ResNo'] = ref_pkl.loc[:,'ResNo'].str.extract('(\d+)', expand=False)
-        
-        tmp_list = [
-                target_ind_init_len, 
-                length_ind, 
-                target_ind_final_len
+        for col in ref_cols:
+            stacked.loc[:,col] = stacked_ref.loc[:,col].values
+        
+        groups = dict(list(stacked.groupby(level=[0, 1, 2], sort=False)))
+        expanded = {}
+        lengths = {}
+        
+        for coord in coords:
+            expanded[coord] = \
+                groups.get(coord, stacked.iloc[0:0]).\
+                    reset_index(level=[0, 1, 2], drop=True).\
+                    reset_index()
+            lengths[coord] = [
+                targets[coord].shape[0],
+                refs[coord].shape[0],
+                expanded[coord].shape[0]
                 ]
         
-        return target_pkl, tmp_list
+        return expanded, lengths
+    
+    def _logs_expansion(self, coords, ref_coords, lengths):
+        """
+        Writes to the log the peaklist length evolution of each
+        peaklist expanded by .seq_expand().
+        """
+        
+        for (z, y, x) in coords:
+            refz, refy, refx = ref_coords[(z, y, x)]
+            popi = lengths[(z, y, x)]
+            logs = \
+"**[{}][{}][{}]** vs. [{}][{}][{}] \
+| Target Initial Length :: {} \
+| Template Length :: {} \
+| Target final length :: {}".\
+                format(
+                    z,
+                    y,
+                    x,
+                    refz,
+                    refy,
+                    refx,
+                    popi[0],
+                    popi[1],
+                    popi[2]
+                    )
+            self.logs(logs)
+        
+        return None
     
     def compares_references(
             self,
@@ -1086,68 +1408,35 @@ more details."
             return
             
         elif along_axis == 'z':
-            for y, z in it.product(self.yycoords, self.zzcoords):
-                if z == self.zzref:
-                    ref_pkl = target[z][y][self.xxref]
-                    refz = z
-                    refy = y
-                
-                target[z][y][self.xxref], popi = \
-                    self.seq_expand(
-                        ref_pkl.copy(), 
-                        target[z][y][self.xxref].copy(),
-                        resonance_type,
-                        fillna_dict
-                        )
-                logs = \
-"**[{}][{}][{}]** vs. [{}][{}][{}] \
-| Target Initial Length :: {} \
-| Template Length :: {} \
-| Target final length :: {}".\
-                    format(
-                        z,
-                        y,
-                        self.xxref,
-                        refz,
-                        refy,
-                        self.xxref,
-                        popi[0],
-                        popi[1],
-                        popi[2]
-                        )
-                self.logs(logs)
+            coords = [
+                (z, y, self.xxref)
+                    for y, z in it.product(self.yycoords, self.zzcoords)
+                ]
+            ref_coords = {
+                (z, y, x): (self.zzref, y, self.xxref) for z, y, x in coords
+                }
         
         elif along_axis == 'y':
-            for z, y in it.product(self.zzcoords, self.yycoords):
-                if y == self.yyref:
-                    ref_pkl = target[z][y][self.xxref]
-                    refz = z
-                    refy = y
-        
-                target[z][y][self.xxref], popi = \
-                    self.seq_expand(
-                        ref_pkl.copy(),
-                        target[z][y][self.xxref].copy(),
-                        resonance_type,
-                        fillna_dict
-                        )
-                logs = \
-"**[{}][{}][{}]** vs. [{}][{}][{}] \
-| Target Initial Length :: {} \
-| Template Length :: {} \
-| Target final length :: {}".\
-                    format(
-                        z,
-                        y,
-                        self.xxref,
-                        refz,
-                        refy,
-                        self.xxref,
-                        popi[0],
-                        popi[1],
-                        popi[2]
-                        )
-                self.logs(logs)
+            coords = [
+                (z, y, self.xxref)
+                    for z, y in it.product(self.zzcoords, self.yycoords)
+                ]
+            ref_coords = {
+                (z, y, x): (z, self.yyref, self.xxref) for z, y, x in coords
+                }
+        
+        expanded, lengths = \
+            self.seq_expand(
+                {(z, y, x): target[z][y][x] for z, y, x in coords},
+                {c: target[r[0]][r[1]][r[2]] for c, r in ref_coords.items()},
+                resonance_type,
+                fillna_dict
+                )
+        
+        for z, y, x in coords:
+            target[z][y][x] = expanded[(z, y, x)]
+        
+        self._logs_expansion(coords, ref_coords, lengths)
         
         return None
     
@@ -1207,46 +1496,34 @@ more details."
             self.logs(msg)
             return
         
-        for z, y, x in it.product(self.zzcoords, self.yycoords, self.xxcoords):
-            # sets the reference peaklist
-            if x == self.xxref and missing == 'missing':
-                ref_pkl = target[z][y][x]
-                refz = z
-                refy = y
-                refx = x
-            
-            elif x == self.xxref and missing == 'unassigned':
-                ref_fasta_key = list(self.allfasta[z][y].keys())[0]
-                ref_pkl = self.allfasta[z][y][ref_fasta_key]
-                refz = z
-                refy = y
-                refx = ref_fasta_key
-            
-            target[z][y][x], popi = \
-                self.seq_expand(
-                    ref_pkl.copy(),
-                    target[z][y][x].copy(),
-                    resonance_type,
-                    fillna_dict
-                    )
+        coords = \
+            list(it.product(self.zzcoords, self.yycoords, self.xxcoords))
+        refs = {}
+        ref_coords = {}
+        
+        # sets the reference peaklist
+        for z, y, x in coords:
+            if missing == 'missing':
+                refs[(z, y, x)] = target[z][y][self.xxref]
+                ref_coords[(z, y, x)] = (z, y, self.xxref)
             
-            logs = \
-"**[{}][{}][{}]** vs. [{}][{}][{}] \
-| Target Initial Length :: {} \
-| Template Length :: {} \
-| Target final length :: {}".\
-                format(
-                    z,
-                    y,
-                    x,
-                    refz,
-                    refy,
-                    refx,
-                    popi[0],
-                    popi[1],
-                    popi[2]
-                    )
-            self.logs(logs)
+            elif missing == 'unassigned':
+                ref_fasta_key = list(self.allfasta[z][y].keys())[0]
+                refs[(z, y, x)] = self.allfasta[z][y][ref_fasta_key]
+                ref_coords[(z, y, x)] = (z, y, ref_fasta_key)
+        
+        expanded, lengths = \
+            self.seq_expand(
+                {(z, y, x): target[z][y][x] for z, y, x in coords},
+                refs,
+                resonance_type,
+                fillna_dict
+                )
+        
+        for z, y, x in coords:
+            target[z][y][x] = expanded[(z, y, x)]
+        
+        self._logs_expansion(coords, ref_coords, lengths)
             
         return None
     
@@ -1397,12 +1674,12 @@ more details."
         """
         Initiates the 5D Farseer-NMR Cube.
         
-        Uses self.p5d to create a 5D matrix with the information of all
+        Creates a DenseCube, a 5D matrix with the information of all
         the peaklists in the experimental dataset. The Cube will be
         accessed and used later to create the FarseerSeries objects,
         upon each the Farseer Analysis routines will be performed.
         
-        If there are sidechains, creates a Panel5D for the sidechains,
+        If there are sidechains, creates a DenseCube for the sidechains,
         which are treated separately from the backbone residues.
         
         Generates:
@@ -1411,16 +1688,185 @@ more details."
         """
         
         self.logs('INITIATING FARSEER CUBE', istitle=True)
-        ## .copy() is used to solve issue_86
-        self.peaklists_p5d = self.p5d(self.allpeaklists.copy())
+        self.peaklists_p5d = DenseCube.from_nested_dict(
+            self.allpeaklists,
+            self.zzcoords,
+            self.yycoords,
+            self.xxcoords
+            )
         self.logs('> Created cube for all the backbone peaklists - OK!')
         
         if use_sidechains:
-            self.sidechains_p5d = self.p5d(self.allsidechains.copy())
+            self.sidechains_p5d = DenseCube.from_nested_dict(
+                self.allsidechains,
+                self.zzcoords,
+                self.yycoords,
+                self.xxcoords
+                )
             self.logs('> Created cube for all the sidechains peaklists - OK!')
         
         return None
     
+    def snapshot_key(self, settings=None):
+        """
+        Generates the key that identifies the input of a snapshot.
+        
+        The key changes when any input file is added, removed or
+        modified (path, size and modification time) or when the
+        preprocessing <settings> change.
+        
+        Parameters:
+            settings (dict): the user settings that affect the parsing
+                and preprocessing of the peaklists.
+        
+        Returns:
+            The hexadecimal sha1 key.
+        """
+        sha = hashlib.sha1()
+        
+        for path in self.paths:
+            stat = os.stat(path)
+            sha.update(
+                '{}\x00{}\x00{}\n'.format(
+                    os.path.relpath(path, self.spectra_path),
+                    stat.st_size,
+                    stat.st_mtime_ns
+                    ).encode('utf-8')
+                )
+        
+        sha.update(
+            json.dumps(settings, sort_keys=True, default=str).encode('utf-8')
+            )
+        
+        return sha.hexdigest()
+    
+    def snapshot_is_current(self, snapshot_path, settings=None):
+        """
+        Checks if the snapshot in <snapshot_path> was saved from the
+        current input files and preprocessing <settings>,
+        see .snapshot_key().
+        
+        Returns:
+            False if the snapshot is outdated or was saved without key.
+        """
+        manifest_path = os.path.join(snapshot_path, 'farseer_cube.json')
+        
+        with open(manifest_path, 'r') as fin:
+            manifest = json.load(fin)
+        
+        return manifest.get('input_key') == self.snapshot_key(settings)
+    
+    def save_snapshot(self, snapshot_path, settings=None):
+        """
+        Saves the Farseer-NMR Cube to disk.
+        
+        Each DenseCube is saved to a subfolder of <snapshot_path> and
+        the dataset axes are saved to a JSON manifest. The snapshot
+        can be loaded with .load_snapshot() to skip the parsing and
+        preprocessing of the peaklists in following runs.
+        
+        Must be called after .init_Farseer_cube().
+        
+        Parameters:
+            snapshot_path (str): the snapshot folder.
+            
+            settings (dict): the preprocessing settings used, stored in
+                the manifest key, see .snapshot_key().
+        """
+        
+        self.logs('SAVING FARSEER CUBE SNAPSHOT', istitle=True)
+        
+        self.peaklists_p5d.save(os.path.join(snapshot_path, 'Backbone'))
+        
+        if self.sidechains_p5d is not None:
+            self.sidechains_p5d.save(os.path.join(snapshot_path, 'Sidechains'))
+        
+        if self.applyFASTA:
+            fasta_lengths = {
+                z: {
+                    y: self.allfasta[z][y][list(self.allfasta[z][y])[0]].\
+                        shape[0]
+                        for y in self.yycoords
+                    }
+                    for z in self.zzcoords
+                }
+        
+        else:
+            fasta_lengths = None
+        
+        manifest = {
+            'zzcoords': self.zzcoords,
+            'yycoords': self.yycoords,
+            'xxcoords': self.xxcoords,
+            'has_sidechains': self.sidechains_p5d is not None,
+            'applyFASTA': self.applyFASTA,
+            'fasta_lengths': fasta_lengths,
+            'input_key': self.snapshot_key(settings)
+            }
+        
+        with open(os.path.join(snapshot_path, 'farseer_cube.json'), 'w') as fout:
+            json.dump(manifest, fout, indent=4)
+        
+        self.logs('**Saved:** {}'.format(snapshot_path))
+        
+        return None
+    
+    def load_snapshot(self, snapshot_path):
+        """
+        Loads a Farseer-NMR Cube saved with .save_snapshot().
+        
+        The cube blocks are read-only memory-maps of the snapshot files.
+        Replaces .load_experiments(), .split_res_info() and all the
+        preprocessing steps until .init_Farseer_cube().
+        
+        Parameters:
+            snapshot_path (str): the snapshot folder.
+        """
+        
+        self.logs('LOADING FARSEER CUBE SNAPSHOT', istitle=True)
+        
+        manifest_path = os.path.join(snapshot_path, 'farseer_cube.json')
+        
+        with open(manifest_path, 'r') as fin:
+            manifest = json.load(fin)
+        
+        self.zzcoords = manifest['zzcoords']
+        self.yycoords = manifest['yycoords']
+        self.xxcoords = manifest['xxcoords']
+        self.zzref = self.zzcoords[0]
+        self.yyref = self.yycoords[0]
+        self.xxref = self.xxcoords[0]
+        self.haszz = len(self.zzcoords) > 1
+        self.hasyy = len(self.yycoords) > 1
+        self.hasxx = len(self.xxcoords) > 1
+        self.has_sidechains = manifest['has_sidechains']
+        self.applyFASTA = manifest['applyFASTA']
+        self.fasta_lengths = manifest['fasta_lengths']
+        
+        self.peaklists_p5d = \
+            DenseCube.load(os.path.join(snapshot_path, 'Backbone'))
+        
+        if self.has_sidechains:
+            self.sidechains_p5d = \
+                DenseCube.load(os.path.join(snapshot_path, 'Sidechains'))
+        
+        self.logs('**Loaded:** {}'.format(snapshot_path))
+        
+        return None
+    
+    def _peaklists_from_cube(self, fscube):
+        """
+        Generates the nested dictionary of peaklists from a DenseCube.
+        """
+        peaklists = {}
+        
+        for z, y, x in it.product(self.zzcoords, self.yycoords, self.xxcoords):
+            peaklists.setdefault(z, {}).setdefault(y, {})
+            peaklists[z][y][x] = \
+                fscube.get_frame(z, y, x).dropna(subset=['ResNo'])
+        
+        return peaklists
+    
     def export_series_dict_over_axis(
             self, series_class,
             along_axis='x',
@@ -1474,14 +1920,14 @@ more details."
         elif along_axis=='y':
             self._compare_fastas()
             series_type='along_y'
-            fscube = fscube.transpose(2,0,1,3,4, copy=True)
+            fscube = fscube.transpose(2,0,1,3,4)
             owndim_pts=self.yycoords
             next_axis = self.zzcoords
             next_axis_2 = self.xxcoords
         
         elif along_axis=='z':
             series_type='along_z'
-            fscube = fscube.transpose(1,2,0,3,4, copy=True)
+            fscube = fscube.transpose(1,2,0,3,4)
             owndim_pts=self.zzcoords
             next_axis = self.xxcoords
             next_axis_2 = self.yycoords
@@ -1510,21 +1956,27 @@ more details."
             ## are added if no fasta file is used to complete the residue
             ## list and when different constrcuts are used along y
             ## which may lead to different number of rows when generating
-            ## the 5D panel - creating NaN rows that later conflict with
+            ## the Farseer-NMR Cube - creating NaN rows that later conflict with
             ## parameter calculation.
-            dfdict = {}
-            
-            for item in fscube.loc[dp2, dp1, :, :, :].items:
-                df = fscube.loc[dp2, dp1, item, :, :]
-                df.dropna(axis=0, how='any', subset=['ResNo'], inplace=True)
-                dfdict[item] = df
-            
-            self._compare_peaklists_length(dp1, dp2, series_type, dfdict)
+            ## Rows are filtered with a mask over the cube major_axis,
+            ## the series data is copied only once when the series_class
+            ## object is created.
+            resno_mask = fscube.notnull_mask(dp2, dp1, 'ResNo')
+            series_rows = resno_mask.any(axis=0)
+            
+            self._compare_peaklists_length(
+                dp1,
+                dp2,
+                series_type,
+                dict(zip(fscube.items, resno_mask.sum(axis=1)))
+                )
             
-            series_panel_NaN_filtered = pd.Panel.from_dict(dfdict)
             series_dct[dp2][dp1] = \
                 self.gen_series(
-                    series_panel_NaN_filtered,
+                    fscube.series_array(dp2, dp1, rows=series_rows),
+                    fscube.items,
+                    fscube.major_axis[series_rows],
+                    fscube.minor_axis,
                     series_class,
                     series_kwargs
                     )
@@ -1536,15 +1988,25 @@ more details."
         
         return series_dct
     
-    def gen_series(self, series_panel, series_class, sc_kwargs):
+    def gen_series(
+            self,
+            series_array,
+            items,
+            major_axis,
+            minor_axis,
+            series_class,
+            sc_kwargs
+            ):
         """
         Creates a Series object of class <series_class>.
         
         Argument initiation has to be synchronized with the class needs.
         
         Parameters:
-            series_panel (pd.Panel): contains the series to be converted
-                to series_class instance.
+            series_array (np.ndarray): object array (items x major_axis
+                x minor_axis) with the series data.
+            
+            items, major_axis, minor_axis (pd.Index): axes labels.
             
             series_class (class): Farseer Series class.
             
@@ -1557,10 +2019,10 @@ more details."
         
         series_panel = \
             series_class(
-                np.array(series_panel),
-                items=series_panel.items,
-                minor_axis=series_panel.minor_axis,
-                major_axis=series_panel.major_axis
+                series_array,
+                items=items,
+                minor_axis=minor_axis,
+                major_axis=major_axis
                 )
         # activates the series attibutes
         series_panel.create_attributes(**sc_kwargs)
@@ -1573,6 +2035,14 @@ more details."
         title = 'EXPORTS PARSED PEAKLISTS FROM FARSEER-NMR CUBE'
         self.logs(title, istitle=True)
         
+        # the cube was loaded from a snapshot
+        if not(self.allpeaklists) and self.peaklists_p5d is not None:
+            self.allpeaklists = self._peaklists_from_cube(self.peaklists_p5d)
+            
+            if self.has_sidechains:
+                self.allsidechains = \
+                    self._peaklists_from_cube(self.sidechains_p5d)
+        
         for z, y, x in it.product(self.zzcoords, self.yycoords, self.xxcoords):
             folder = os.path.join('spectra_parsed', z, y)
             
@@ -1613,6 +2083,60 @@ more details."
         
         return None
     
+    def _reads_fasta_file(self, fasta_path):
+        """
+        Reads a .fasta file to a pd.DataFrame.
+        
+        Parameters:
+            fasta_path (str): path to the .fasta file.
+        
+        Returns:
+            The FASTA pd.DataFrame created by FastaHandler.
+        """
+        if self.cache is not None:
+            key = self.cache.file_key(fasta_path, self.FASTAstart)
+            fasta_df = self.cache.load(key)
+            
+            if fasta_df is not None:
+                return fasta_df
+        
+        fh = FastaHandler(
+                fasta_file_path=fasta_path,
+                fasta_start_num=self.FASTAstart
+                )
+        fh.reads_fasta_to_dataframe(reads_from_file=True)
+        
+        if self.cache is not None:
+            self.cache.save(key, fh.fasta_df)
+        
+        return fh.fasta_df
+    
+    def _reads_peaklist_file(self, peaklist_path):
+        """
+        Reads a .csv peaklist file to a pd.DataFrame.
+        
+        If the peaklist is in the cache, returns the cached peaklist
+        already processed by .split_res_info().
+        
+        Parameters:
+            peaklist_path (str): path to the .csv file.
+        
+        Returns:
+            The peaklist pd.DataFrame.
+        """
+        
+        if self.cache is None:
+            return pd.read_csv(peaklist_path)
+        
+        key = self.cache.file_key(peaklist_path)
+        entry = self.cache.load(key)
+        self._cache_lookups[peaklist_path] = (key, entry)
+        
+        if entry is not None:
+            return entry['backbone']
+        
+        return pd.read_csv(peaklist_path)
+    
     def load_experiments(self, filetype='.csv', resonance_type='Backbone'):
         """
         Loads the <filetype> files in self.paths into nested
@@ -1626,6 +2150,10 @@ more details."
             resonance_type (str): {'Backbone', 'Sidechains'}.
                 'Sidechains' only available for '.csv' <filetype>.
         
+        If self.load_workers > 1, files are read concurrently by a pool
+        of threads, the nested dictionaries are filled in the order
+        of self.paths.
+        
         If filetype='.csv' and resonance_type='Backbone' executes
         self.init_coords_names()
         
@@ -1684,7 +2212,7 @@ more details."
         
         # defines functions to use and target storage dictionaries
         if filetype == '.csv' and resonance_type == 'Backbone':
-            f = pd.read_csv
+            f = self._reads_peaklist_file
             target = self.allpeaklists
             main_peaklists=True
             
@@ -1693,6 +2221,7 @@ more details."
                 #msg = 'Do not attempt to load the .fasta files prior to the peaklist .csv files, please :-)'
                 #self.logs(fsw.gen_wet('ERROR', msg, 21))
                 #self._abort()
+            f = self._reads_fasta_file
             target = self.allfasta
             
         elif filetype == '.csv' and resonance_type == 'Sidechains':
@@ -1709,6 +2238,8 @@ the possible options.'
         # loads files in nested dictionaries
         # piece of code found in stackoverflow, reference missing
         
+        to_load = []
+        
         for p in self.paths:
             #https://stackoverflow.com/questions/8384737/extract-file-name-from-path-no-matter-what-the-os-path-format
             
@@ -1740,23 +2271,43 @@ the possible options.'
             if x_file.lower().endswith(filetype):
                 self.logs('* {}'.format(p))
                 lessparts = x_file.split('.')[0]
+                to_load.append((p, branch, x_file, (z_dir, y_dir, lessparts)))
+        
+        # reads the files, concurrently if requested, results are kept
+        # in the same order as self.paths
+        paths = [p for p, _, _, _ in to_load]
+        # cache lookups done while reading {path: (key, entry)}
+        self._cache_lookups = {}
+        
+        if self.load_workers > 1 and f is not str:
+            executor = ThreadPoolExecutor(max_workers=self.load_workers)
+            loaded = executor.map(f, paths)
+        
+        else:
+            executor = None
+            loaded = map(f, paths)
+        
+        try:
+            for (p, branch, x_file, coord), data in zip(to_load, loaded):
                 
-                try:
-                    if filetype == '.csv':
-                        branch[lessparts] = branch.get(x_file, f(p))
-                    elif filetype == '.fasta':
-                        fh = FastaHandler(
-                                fasta_file_path=p,
-                                fasta_start_num=self.FASTAstart
-                                )
-                        fh.reads_fasta_to_dataframe(reads_from_file=True)
-                        branch[lessparts] = branch.get(x_file, fh.fasta_df)
+                if p in self._cache_lookups:
+                    key, entry = self._cache_lookups[p]
+                    self.cache_keys[coord] = key
+                    
+                    if entry is not None:
+                        self.cache_entries[coord] = entry
                 
-                except pd.errors.EmptyDataError:
-                    msg = \
+                branch[coord[2]] = branch.get(x_file, data)
+        
+        except pd.errors.EmptyDataError:
+            msg = \
 "The file {} is empty. To introduce an empty data point, add the header.".\
-                        format(filetype)
-                    self._abort(fsw(msg_title='ERROR', msg=msg, wet_num=14))
+                format(filetype)
+            self._abort(fsw(msg_title='ERROR', msg=msg, wet_num=14))
+        
+        finally:
+            if executor:
+                executor.shutdown(wait=True)
         
         self._checks_xy_datapoints_coherency(target, filetype)
         
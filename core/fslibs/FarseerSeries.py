@@ -27,13 +27,171 @@ import os
 import numpy as np
 import pandas as pd
 import itertools as it
-from pydoc import locate
 from math import ceil
+from functools import lru_cache
 from matplotlib import pyplot as plt
 import datetime 
 
 import core.fslibs.Logger as Logger
 from core.fslibs.WetHandler import WetHandler as fsw
+from core.fslibs.FittingBase import fit_statuses
+from core.fslibs import restraint_functions
+from core.fslibs import fitting_functions
+from core.utils import peak_status_vocabulary
+
+@lru_cache(maxsize=None)
+def gaussian_kernel(stddev, x_size):
+    """
+    Normalized 1D Gaussian kernel sampled at the center of each bin,
+    same as astropy.convolution.Gaussian1DKernel(stddev, x_size=x_size).
+    
+    Parameters:
+        stddev (float): standard deviation.
+        
+        x_size (int): odd kernel size.
+    
+    Returns:
+        Read-only np.ndarray of length <x_size> that sums to 1.
+    """
+    if x_size % 2 == 0:
+        raise ValueError('Kernel size must be odd: {}'.format(x_size))
+    
+    x = np.arange(x_size) - x_size // 2
+    kernel = np.exp(-0.5*(x/stddev)**2)
+    kernel /= kernel.sum()
+    kernel.flags.writeable = False
+    
+    return kernel
+
+def convolve_extend(values, kernel):
+    """
+    Convolves each row of <values> with <kernel>, the same as
+    astropy.convolution.convolve with boundary='extend' and
+    normalize_kernel=True. Values beyond the edges take the edge value
+    and NaN values are ignored, renormalizing the kernel over the valid
+    neighbours.
+    
+    Parameters:
+        values (np.ndarray): (rows, n) float array.
+        
+        kernel (np.ndarray): odd length normalized kernel.
+    
+    Returns:
+        (rows, n) float array, NaN where no valid neighbours exist.
+    """
+    half = kernel.size // 2
+    n = values.shape[1]
+    padded = np.pad(values, ((0,0),(half,half)), mode='edge')
+    valid = ~np.isnan(padded)
+    padded = np.where(valid, padded, 0.)
+    top = np.zeros(values.shape)
+    bot = np.zeros(values.shape)
+    
+    # kernel is symmetric, so correlation and convolution are the same
+    for k, weight in enumerate(kernel):
+        top += weight * padded[:,k:k+n]
+        bot += weight * valid[:,k:k+n]
+    
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(bot > 0, top / bot, np.nan)
+
+class SeriesBatch:
+    """
+    Stack of FarseerSeries with the same number of items and residues,
+    for example, all the series along an axis of the Farseer-NMR Cube.
+    
+    Restraints are calculated for all the series at once, the restraint
+    kernels receive arrays of shape (series, items, residues) and read
+    the series attributes through this class.
+    
+    Attributes:
+        series_list (list): the FarseerSeries.
+        
+        cs_missing (str): the missing peaks policy, the same for
+            all the series.
+    """
+    
+    def __init__(self, series_list):
+        """
+        Parameters:
+            series_list (list): FarseerSeries with the same shape
+                and calculation settings.
+        """
+        shapes = set((len(s.items), len(s.major_axis)) for s in series_list)
+        
+        if len(shapes) > 1:
+            raise ValueError(
+                'Series in a batch must have the same shape: {}'.\
+                    format(shapes)
+                )
+        
+        self.series_list = series_list
+        self.cs_missing = series_list[0].cs_missing
+    
+    def column_block(self, cols):
+        """
+        Returns the float array (series, items, residues, len(cols))
+        with the values of columns <cols>.
+        """
+        return np.stack([s._columns_array(cols) for s in self.series_list])
+    
+    def peak_status_mask(self, status):
+        """(series, items, residues) boolean mask of peaks in <status>."""
+        return np.stack(
+            [s._peak_status_mask(status) for s in self.series_list]
+            )
+    
+    def csp_alpha(self):
+        """(series, items, residues) CSP normalization factors."""
+        return np.stack([s._csp_alpha_array() for s in self.series_list])
+    
+    def calc_restraints(self, restraints):
+        """
+        Calculates restraints for all the series in a single pass.
+        
+        The input columns of all the restraints are read at once as
+        float arrays and each restraint kernel operates over all the
+        series, experiments and residues. Restraints run in the given
+        order, so a restraint can read columns calculated by the
+        previous ones.
+        
+        Parameters:
+            restraints (list): RestraintBase instances,
+                see core.fslibs.restraint_functions.
+        
+        Modifies:
+            Creates the .calccol column of each restraint in each series.
+        """
+        
+        # columns read from the series, not calculated by a previous restraint
+        to_read = []
+        calculated = []
+        
+        for restraint in restraints:
+            for col in restraint.input_columns:
+                if col not in to_read and col not in calculated:
+                    to_read.append(col)
+            
+            calculated.append(restraint.calccol)
+        
+        block = self.column_block(to_read)
+        columns = {col:block[...,i] for i, col in enumerate(to_read)}
+        
+        for restraint in restraints:
+            inputs = [columns[col] for col in restraint.input_columns]
+            columns[restraint.calccol] = restraint.kernel(self, *inputs)
+        
+        # hands each series its view of the results
+        for iseries, series in enumerate(self.series_list):
+            for restraint in restraints:
+                series.loc[:,:,restraint.calccol] = pd.DataFrame(
+                    columns[restraint.calccol][iseries].T,
+                    index=series.major_axis,
+                    columns=series.items
+                    )
+                series.logs(restraint.log_calculated())
+        
+        return None
 
 class FarseerSeries(pd.Panel):
     """
@@ -81,13 +239,18 @@ class FarseerSeries(pd.Panel):
         restraint_list (list): ORDERED names of the restraints that can
             be calculated.
         
-        cs_missing (str): {'prev', 'full', 'zero'}, how to represent bars
+        cs_missing (str): {'prev', 'full', 'zero'} or other policy
+            registered in core.fslibs.missing_policies, how to represent bars
             for missing residues.
             
         csp_alpha4res (dict): a dictionary containing the alpha values
             to be used for each residue in the CSP calculation formula.
         
-        fitdf (dict): stored pd.DataFrames with information on fitting.
+        fit_results (dict): the fits of each fitted column, structured
+            np.ndarrays as created by FittingBase.new_results().
+        
+        fit_models (dict): the fitting function of each fitted column.
+        
         fit_performed (bool): defaults False. True after .perform_fit().
     
     """
@@ -148,11 +311,18 @@ class FarseerSeries(pd.Panel):
         self.resonance_type = resonance_type
         self.res_info = \
             self.loc[:,:,['ResNo','1-letter','3-letter','Peak Status']]
+        # 'Peak Status' encoded as integers (items x major_axis)
+        # according to the peak_status_vocabulary, read by the status
+        # masks of the restraints, Chimera attributes and fits. Plots
+        # colour peaks from the decoded 'Peak Status' strings
+        status = self.res_info.loc[:,:,'Peak Status'].values.T
+        self.peak_status = \
+            pd.Index(peak_status_vocabulary).\
+                get_indexer(status.ravel()).reshape(status.shape)
         self.restraint_list = restraint_list
-        # dictionary to store dataframes with information on fitting results
-        self.fit_plot_text = {}
-        self.fit_plot_ydata = {}
-        self.fit_okay = {}
+        # fitting results and fitting function of each fitted column
+        self.fit_results = {}
+        self.fit_models = {}
         # becomes if perform_fit() runs.
         # affects plot_res_evo()
         self.fit_performed = False 
@@ -210,6 +380,16 @@ class FarseerSeries(pd.Panel):
         # because Titration inherits a pd.Panel.
         return FarseerSeries
         
+    def _peak_status_mask(self, status):
+        """
+        Returns a boolean array (items x major_axis) flagging the peaks
+        with 'Peak Status' equal to <status>.
+        
+        Parameters:
+            status (str): one of peak_status_vocabulary.
+        """
+        return self.peak_status == peak_status_vocabulary.index(status)
+    
     def _abort(self, wet):
         """
         Aborts run with message. Writes message to log.
@@ -787,36 +967,34 @@ and stacked (compared) along "{}" axis'.format(
         
         return None
     
+    def calc_restraints(self, restraints):
+        """
+        Calculates restraints along the Series in a single pass.
+        
+        Parameters:
+            restraints (list): RestraintBase instances,
+                see core.fslibs.restraint_functions.
+        
+        Modifies:
+            Creates the .calccol column of each restraint.
+        """
+        SeriesBatch([self]).calc_restraints(restraints)
+        
+        return None
+    
     def calc_cs_diffs(self, calccol, sourcecol):
         """
         Calculates the difference between two columns along a Series 
         using as reference the column from the reference experiment, 
         which is always stored in Item=0.
         
+        Missing peaks are set according to self.cs_missing.
+        
         Calculation results are stored in new columns.
         """
-        
-        self.loc[:,:,calccol] = \
-            self.loc[:,:,sourcecol].sub(self.ix[0,:,sourcecol], axis='index')
-        
-        # sets missing peaks results according to the self.cs_missing
-        if self.cs_missing == 'full':
-            for item in self.items:
-                mask_missing = self.loc[item,:,'Peak Status'] == 'missing'
-                self.loc[item,mask_missing,calccol] = 1.
-        
-        elif self.cs_missing == 'prev':
-            for iitem in range(1, len(self.items)):
-                mask_missing = self.ix[iitem,:,'Peak Status'] == 'missing'
-                self.ix[iitem,mask_missing,calccol] = \
-                    self.ix[iitem-1,mask_missing,calccol]
-        
-        elif self.cs_missing == 'zero':
-            for iitem in range(1, len(self.items)):
-                mask_missing = self.ix[iitem,:,'Peak Status'] == 'missing'
-                self.ix[iitem,mask_missing,calccol] = 0
-        
-        self.logs('**Calculated** {}'.format(calccol))
+        self.calc_restraints(
+            [restraint_functions.cs_delta(calccol, sourcecol)]
+            )
         
         return
     
@@ -828,32 +1006,36 @@ and stacked (compared) along "{}" axis'.format(
         
         Calculation result is stored in a new column of each DataFrame.
         """
-        
-        self.loc[:,:,calccol] = \
-            self.loc[:,:,sourcecol].div(self.ix[0,:,sourcecol], axis='index')
-        self.logs('**Calculated** {}'.format(calccol))
+        self.calc_restraints([restraint_functions.ratio(calccol, sourcecol)])
         
         return
     
-    def csp_willi(self, s):
+    def _columns_array(self, cols):
         """
-        Formula that calculates Chemical Shift Perturbations (CSPs).
-        
-        Parameters:
-            s (pd.Series): s[0], 1-letter res code; s[1]; chemical shift 
-            for nuclei 1, s[2], chemical shift for nuclei 2.
+        Returns the values of columns <cols> as a float array of shape
+        (items, major_axis, len(cols)). Only <cols> are read from the
+        series.
+        """
+        return self.loc[:,:,list(cols)].values.astype(float)
+    
+    def _csp_alpha_array(self):
+        """
+        Maps the residue type of each peak to its CSP normalization
+        factor (alpha), see restraint_functions.csp.
         
-        np.sqrt(0.5*(H1**2 + (alpha*N15)**2))
-
-        where the proportional normalization factor (alpha) for the 15N
-        dimension is set by default to 0.2 for Glycine and 0.14 for all
-        the other residues.
-
-        Williamson, M. P. Using chemical shift perturbation to
-        characterise ligand binding. Prog. Nuc. Magn. Res. Spect.
-        73, 1–16 (2013). SEE CORRIGENDUM
+        Returns:
+            float array of shape (items, major_axis), NaN for residue
+            types not in self.csp_alpha4res.
         """
-        return np.sqrt(0.5*(s[1]**2+(self.csp_alpha4res[s[0]]*s[2])**2))
+        residues = self.res_info.loc[:,:,'1-letter'].values.T
+        alpha_keys = list(self.csp_alpha4res.keys())
+        alpha_values = np.array(
+            [self.csp_alpha4res[k] for k in alpha_keys] + [np.nan]
+            )
+        # residue types not found get -1 and fall on the NaN
+        alpha_pos = pd.Index(alpha_keys).get_indexer(residues.ravel())
+        
+        return alpha_values[alpha_pos].reshape(residues.shape)
     
     def calc_csp(self, calccol='CSP', pos1='PosF1_delta', pos2='PosF2_delta'):
         """
@@ -864,11 +1046,9 @@ and stacked (compared) along "{}" axis'.format(
         pos1 (str): the column name of the source data for nuclei 1.
         pos2 (str): the column name for the source data for nuclei 2.
         """
-
-        self.loc[:,:,calccol] = \
-            self.loc[:,:,['1-letter',pos1,pos2]].\
-                apply(lambda x: self.csp_willi(x), axis=2)
-        self.logs('**Calculated** {}'.format(calccol))
+        self.calc_restraints(
+            [restraint_functions.csp(calccol, pos1, pos2)]
+            )
         
         return
     
@@ -937,7 +1117,7 @@ and stacked (compared) along "{}" axis'.format(
             self._abort(fsw(msg_title='ERROR', msg=msg, wet_num=15))
         
         # check tag residue
-        if not(any(self.loc[self.para_name,:,'ResNo'].isin([tag]))):
+        if not(any(self.loc[self.para_name,:,'ResNo'].isin([tag_num]))):
             msg = \
 'The residue number where the tag is placed according to the \*.pre file ({}) \
 is not part of the protein sequence ({}-{}).'.\
@@ -949,7 +1129,7 @@ is not part of the protein sequence ({}-{}).'.\
             self._abort(fsw(msg_title='ERROR', msg=msg, wet_num=17))
         
         self.loc[self.para_name,:,'tag'] = ''
-        tagmask = self.loc[self.para_name,:,'ResNo'] == tag
+        tagmask = self.loc[self.para_name,:,'ResNo'] == tag_num
         self.loc[self.para_name,tagmask,'tag'] = '*'
         tagf.close()
         self.logs('**Tag position found** at residue {}'.format(tag_num))
@@ -976,28 +1156,31 @@ is not part of the protein sequence ({}-{}).'.\
             
             gaussian_stddev (int): standard deviation.
         """
-        # astropy is imported to avoind demanding import when not necessary
-        from astropy.convolution import Gaussian1DKernel, convolve
+        columns = self._columns_array(['Theo PRE', sourcecol])
+        delta_pre = columns[...,0] - columns[...,1]
+        
+        # converts to 0 negative values
+        with np.errstate(invalid='ignore'):
+            delta_pre[delta_pre < 0] = 0
         
-        # http://docs.astropy.org/en/stable/api/astropy.convolution.Gaussian1DKernel.html
-        gauss = Gaussian1DKernel(gaussian_stddev, x_size=guass_x_size)
-        self.loc[:,:,targetcol] = \
-            self.loc[:,:,'Theo PRE'].sub(self.loc[:,:,sourcecol])
+        self.loc[:,:,targetcol] = pd.DataFrame(
+            delta_pre.T,
+            index=self.major_axis,
+            columns=self.items
+            )
         self.logs('**Calculated DELTA PRE** for source {} in target {}'.\
                 format(sourcecol, targetcol))
         
-        for exp in self.items:
-            # converts to 0 negative values
-            negmask = self.loc[exp,:,targetcol] < 0
-            self.loc[exp,negmask,targetcol] = 0
-            # aplies convolution with a normalized 1D Gaussian kernel
-            smooth_col = '{}_smooth'.format(targetcol)
-            self.loc[exp,:,smooth_col] = convolve(
-                np.array(self.loc[exp,:,targetcol]),
-                gauss,
-                boundary='extend',
-                normalize_kernel=True
-                )
+        # aplies convolution with a normalized 1D Gaussian kernel
+        smooth_col = '{}_smooth'.format(targetcol)
+        self.loc[:,:,smooth_col] = pd.DataFrame(
+            convolve_extend(
+                delta_pre,
+                gaussian_kernel(gaussian_stddev, guass_x_size)
+                ).T,
+            index=self.major_axis,
+            columns=self.items
+            )
         self.logs(\
 '**Calculated DELTA PRE Smoothed** for source {} in target {} \
 with window size {} and stdev {}'.\
@@ -1112,10 +1295,14 @@ with window size {} and stdev {}'.\
         colform = lambda x: colformat.format(x)
         formatting = {'ResNo': resform}
         
-        for item in self.items:
-            mask_missing = self.loc[item,:,'Peak Status'] == 'missing'
-            mask_unassigned = self.loc[item,:,'Peak Status'] == 'unassigned'
-            mask_measured = self.loc[item,:,'Peak Status'] == 'measured'
+        missing = self._peak_status_mask('missing')
+        unassigned = self._peak_status_mask('unassigned')
+        measured = self._peak_status_mask('measured')
+        
+        for iitem, item in enumerate(self.items):
+            mask_missing = missing[iitem]
+            mask_unassigned = unassigned[iitem]
+            mask_measured = measured[iitem]
             file_path = os.path.join(self.chimera_att_folder, calccol)
             
             if not(os.path.exists(file_path)):
@@ -1307,7 +1494,7 @@ recipient: residues
             
             ticklabels = \
                 self.loc[experiment,0::mod_,['ResNo','1-letter']].\
-                    apply(lambda x: ''.join(x), axis=1)
+                    astype(str).apply(lambda x: ''.join(x), axis=1)
             # Configure XX ticks and Label
             axs[i].set_xticks(xticks)
             ## https://github.com/matplotlib/matplotlib/issues/6266
@@ -1348,7 +1535,7 @@ recipient: residues
             ## https://github.com/matplotlib/matplotlib/issues/6266
             axs[i].set_xticklabels(
                 self.loc[experiment,:,['ResNo', '1-letter', 'ATOM']].\
-                    apply(lambda x: ''.join(x), axis=1),
+                    astype(str).apply(lambda x: ''.join(x), axis=1),
                 fontname=x_ticks_fn,
                 fontsize=x_ticks_fs,
                 fontweight=x_ticks_weight,
@@ -1677,13 +1864,13 @@ recipient: residues
         
         ticklabels = \
             self.loc[experiment,0::mod_,['ResNo','1-letter']].\
-                apply(lambda x: ''.join(x), axis=1)
+                astype(str).apply(lambda x: ''.join(x), axis=1)
         # Configure XX ticks and Label
         axs[i].set_yticks(xticks)
         # https://github.com/matplotlib/matplotlib/issues/6266
         axs[i].set_yticklabels(
             self.loc[experiment,0::mod_,['ResNo','1-letter']].\
-                apply(lambda x: ''.join(x), axis=1),
+                astype(str).apply(lambda x: ''.join(x), axis=1),
             fontname=x_ticks_fn,
             fontsize=x_ticks_fs-2,
             fontweight=x_ticks_weight,
@@ -1885,7 +2072,7 @@ recipient: residues
         
         # Draws subplot title
         res = self.ix[0,i,'ResNo']
-        subtitle = self.ix[0,i,'ResNo'] + self.ix[0,i,'1-letter']
+        subtitle = str(self.ix[0,i,'ResNo']) + self.ix[0,i,'1-letter']
         axs[i].set_title(
             subtitle,
             y=subtitle_pad,
@@ -2042,38 +2229,25 @@ variable or confirm you have not forgot any peaklist [{}].".\
                 alpha=fill_alpha
                 )
         
-        fit_res_col = "{}_{}".format(calccol, res)
+        fit_result = self._fit_result(calccol, row_number)
         
-        if self.fit_performed \
-                and self.series_axis == 'along_x'\
-                and self.fit_okay[fit_res_col]:
-            #print(res)
-            #print(self.xfit)
-            #print(self.fit_plot_ydata[fit_res_col])
-            # plot fit
-            axs[i].plot(
-                self.xfit,
-                self.fit_plot_ydata[fit_res_col],
-                fit_line_style,
-                lw=fit_line_width,
-                color=fit_line_color, zorder=6
-                )
+        if fit_result is not None and self.series_axis == 'along_x':
+            
+            if fit_result['status'] == fit_statuses.index('okay'):
+                # plot fit
+                axs[i].plot(
+                    self.xfit,
+                    fit_result['ydata'],
+                    fit_line_style,
+                    lw=fit_line_width,
+                    color=fit_line_color, zorder=6
+                    )
+            
             # write text
             axs[i].text(
                 xmax*0.05,
                 y_lims[1]*0.97,
-                self.fit_plot_text[fit_res_col],
-                ha='left',
-                va='top',
-                fontsize=4
-                )
-        
-        elif self.fit_performed and self.series_axis == 'along_x' \
-                and not(self.fit_okay[fit_res_col]):
-            axs[i].text(
-                xmax*0.05,
-                y_lims[1]*0.97,
-                self.fit_plot_text[fit_res_col],
+                self.fit_models[calccol].plot_text(fit_result),
                 ha='left',
                 va='top',
                 fontsize=4
@@ -2159,7 +2333,7 @@ variable or confirm you have not forgot any peaklist [{}].".\
                 )
         
         # Configure subtitle
-        subtitle = self.ix[0,i,'ResNo'] + self.ix[0,i,'1-letter']
+        subtitle = str(self.ix[0,i,'ResNo']) + self.ix[0,i,'1-letter']
         axs[i].set_title(
             subtitle,
             y=subtitle_pad,
@@ -2453,7 +2627,7 @@ but measured in a subsequent peaklist".\
             axs[0].text(
                 float(self.loc[mesmask,residue,'H1_delta'].tail(n=1))*1.05,
                 float(self.loc[mesmask,residue,'N15_delta'].tail(n=1))*1.05,
-                self.ix[0,residue,'ResNo'],
+                str(self.ix[0,residue,'ResNo']),
                 fontsize=4,
                 color=res_label_color,
                 zorder=10
@@ -2873,7 +3047,7 @@ but measured in a subsequent peaklist".\
         if res_highlight:
             for rr in res_hl_list:
                 axs[i].axvline(x=rr, ls=':', lw=0.3, color=grid_color)
-                rrmask = self.ix[0,:,'ResNo'] == str(rr)
+                rrmask = self.ix[0,:,'ResNo'] == int(rr)
                 l1 = list(self.loc[experiment,rrmask,'1-letter'])
                 axs[i].text(
                     rr,
@@ -3094,7 +3268,24 @@ but measured in a subsequent peaklist".\
         
         return
     
-    def perform_fit(self, col, x_values, mindp, fit_function):
+    def perform_fit(
+            self,
+            col,
+            x_values,
+            mindp,
+            fit_function,
+            batch_fitting=False,
+            executor=None,
+            fit_cache=None,
+            shared_parameter=None,
+            global_fit_groups=None,
+            bootstrap_replicas=0,
+            bootstrap_method='residual',
+            confidence_level=0.95,
+            write_fit_report=True,
+            prescreen=False,
+            prescreen_min_amplitude=0.05
+            ):
         """
         General workflow for fitting data along X axis.
         
@@ -3107,86 +3298,559 @@ but measured in a subsequent peaklist".\
             - x_values: the x data
             - mindp: minimum number of points to consider residue
                 for fitting.
-            - fit_function: fitting library name according to
-                core.fslibs.fitting_functions.__init__.py
+            - fit_function: fitting function name in the registry
+                core.fslibs.fitting_functions.models
+            - batch_fitting (opt, bool): fits all the residues at once
+                with the fitting function .fit_data_batch().
+            - executor (opt, concurrent.futures.Executor): distributes
+                the residues fits across the executor workers.
+            - fit_cache (opt, FitCache): reuses the fits of residues
+                whose data did not change since the cached run, other
+                residues start from the cached parameters.
+            - shared_parameter (opt, str): fits all the residues at once
+                sharing this parameter of the fitting function, with
+                the fitting function .fit_data_global(). Takes
+                precedence over <batch_fitting> and <executor>.
+            - global_fit_groups (opt, list): lists of residue numbers,
+                the residues of each list share their own value of
+                <shared_parameter> and the residues not listed share
+                another one. By default all the residues share it.
+            - bootstrap_replicas (opt, int): number of resampled replicas
+                of each residue data used to estimate confidence
+                intervals of the fitted parameters, written to the fit
+                table. 0 disables the estimation.
+            - bootstrap_method (opt, str): 'residual' or 'montecarlo',
+                see FittingBase.bootstrap_batch().
+            - confidence_level (opt, float): level of the confidence
+                intervals.
+            - write_fit_report (opt, bool): writes the fit report log
+                file with the data and fit of each residue.
+            - prescreen (opt, bool): residues whose data is flat or
+                has low amplitude are not fitted, see
+                FittingBase.prescreen_batch().
+            - prescreen_min_amplitude (opt, float): the amplitude
+                threshold of the pre-screen, relative to the median
+                amplitude of the residues.
         """
+        self.writes_fit(
+            self.submit_fit(
+                col,
+                x_values,
+                mindp,
+                fit_function,
+                batch_fitting=batch_fitting,
+                executor=executor,
+                fit_cache=fit_cache,
+                shared_parameter=shared_parameter,
+                global_fit_groups=global_fit_groups,
+                bootstrap_replicas=bootstrap_replicas,
+                bootstrap_method=bootstrap_method,
+                confidence_level=confidence_level,
+                write_fit_report=write_fit_report,
+                prescreen=prescreen,
+                prescreen_min_amplitude=prescreen_min_amplitude
+                )
+            )
         
-        self.fit_performed = True
+        return
+    
+    def submit_fit(
+            self,
+            col,
+            x_values,
+            mindp,
+            fit_function,
+            batch_fitting=False,
+            executor=None,
+            fit_cache=None,
+            shared_parameter=None,
+            global_fit_groups=None,
+            bootstrap_replicas=0,
+            bootstrap_method='residual',
+            confidence_level=0.95,
+            write_fit_report=True,
+            prescreen=False,
+            prescreen_min_amplitude=0.05
+            ):
+        """
+        Prepares the data of each residue and starts the fits,
+        parameters as in .perform_fit().
         
-        try:
-            to_fit = locate(
-                'core.fslibs.fitting_functions.{}'.format(fit_function)
-                )()
+        With an <executor>, fits run in the executor workers while other
+        fits are submitted, results are collected by .writes_fit().
+        
+        Returns:
+            dict with the fit state, to be passed to .writes_fit().
+        """
         
-        except TypeError:
+        self.fit_performed = True
+        
+        if not(fit_function in fitting_functions.models):
             msg = "Chosen fitting function <{}> not an available option.".\
                 format(fit_function)
             self._abort(fsw(msg_title='ERROR', msg=msg, wet_num=23))
         
-        self.logs("*** Performing fit using function: {}".format(fit_function))
-        # logging ###
-        not_enough_data = to_fit.not_enough_data
-        col_path = os.path.join(self.tables_and_plots_folder, col)
+        to_fit = fitting_functions.models[fit_function]()
         
-        if not(os.path.exists(col_path)):
-            os.makedirs(col_path)
+        if shared_parameter is not None \
+                and not(shared_parameter in to_fit.param_names):
+            msg = "Shared parameter <{}> not an available option for \
+fitting function <{}>. Options are: {}.".format(
+                shared_parameter,
+                fit_function,
+                ', '.join(to_fit.param_names)
+                )
+            self._abort(fsw(msg_title='ERROR', msg=msg, wet_num=23))
         
-        logfrep_name = os.path.join(
-            self.tables_and_plots_folder,
-            col,
-            "{}_fit_report.log".format(col)
-            )
-        logfreport = open(logfrep_name, 'w')
-        logfreport.write(to_fit.fit_log_header(col))
-        logftable_name = os.path.join(
-            self.tables_and_plots_folder,
-            col,
-            '{}_fit_table.csv'.format(col)
-            )
-        logftable = open(logftable_name, 'w')
-        logftable.write(to_fit.results_header())
+        # group of each residue in the global fit, residues not listed
+        # make one more group
+        global_fit_groups = global_fit_groups or []
+        res_groups = {}
+        
+        for group, residues in enumerate(global_fit_groups):
+            for res in residues:
+                if res in res_groups:
+                    msg = "Residue <{}> is in more than one global fit \
+group.".format(res)
+                    self._abort(fsw(msg_title='ERROR', msg=msg, wet_num=23))
+                
+                res_groups[res] = group
+        
+        if bootstrap_replicas \
+                and not(bootstrap_method in ('residual', 'montecarlo')):
+            msg = "Bootstrap method <{}> not an available option. \
+Options are: residual, montecarlo.".format(bootstrap_method)
+            self._abort(fsw(msg_title='ERROR', msg=msg, wet_num=23))
+        
+        self.logs("*** Performing fit using function: {}".format(fit_function))
         self.logs('** Performing fitting for {}...'.format(col))
-        measured_mask = self.loc[:,:, 'Peak Status'] == 'measured'
+        measured_mask = self._peak_status_mask('measured')
         self.xfit = np.linspace(0, x_values[-1], 200, endpoint=True)
         
-        for row in self.major_axis:
-            mmask = measured_mask.loc[row,:]
+        # residues data to fit, in residue order. Sidechains have two
+        # rows per residue, rows are identified by the key (res, ATOM)
+        fit_input = []
+        has_atoms = 'ATOM' in self.minor_axis
+        
+        for irow, row in enumerate(self.major_axis):
+            mmask = measured_mask[:,irow]
             res = int(self.loc[self.items[0],row, 'ResNo'])
-            col_res = "{}_{}".format(col,res)
+            
+            if has_atoms:
+                key = (res, str(self.loc[self.items[0],row, 'ATOM']))
+            else:
+                key = (res, '')
+            
             xdata = pd.Series(x_values)[np.array(mmask)]
             # .fillna is used to avoid minpack.error:
             # Result from function call is not a proper array of floats.
             ydata = self.loc[mmask,row,col].fillna(value=0.0)
             xdata.index = ydata.index
+            fit_input.append((res, xdata, ydata, mmask.sum() >= mindp, key))
+        
+        # (key, dataset) of the residues to fit
+        candidates = [
+            (key, (xdata, ydata, res))
+            for res, xdata, ydata, enough, key in fit_input if enough
+            ]
+        # rows not fitted after the pre-screen and their status, by key
+        skipped = {}
+        
+        if prescreen and candidates:
+            x, y, weights = to_fit.pads_datasets([d for k, d in candidates])
+            screen = to_fit.prescreen_batch(
+                y,
+                weights,
+                prescreen_min_amplitude
+                )
+            skipped = {
+                key: status
+                for (key, dataset), status in zip(candidates, screen)
+                if status != fit_statuses.index('okay')
+                }
+            candidates = [c for c in candidates if not(c[0] in skipped)]
+            self.logs(
+                '*** Pre-screen: {} flat and {} low amplitude residues \
+not fitted'.format(
+                    np.sum(screen == fit_statuses.index('flat')),
+                    np.sum(screen == fit_statuses.index('low amplitude'))
+                    )
+                )
+        
+        # fits found in the cache and keys of the fitted data
+        cached_fits = {}
+        data_keys = {}
+        table_key = None
+        p0s = None
+        
+        if fit_cache is not None:
+            table_key = fit_cache.table_key(
+                self.tables_and_plots_folder,
+                col,
+                fit_function,
+                *(
+                    ('global', shared_parameter, global_fit_groups)
+                    if shared_parameter else ()
+                    )
+                )
+            entry = fit_cache.load(table_key) or {}
+            data_keys = {
+                key:fit_cache.data_key(xdata, ydata, self.xfit)
+                for key, (xdata, ydata, res) in candidates
+                }
+            
+            for key, data_key in data_keys.items():
+                if key in entry and entry[key][0] == data_key:
+                    cached_fits[key] = entry[key][1]
             
-            if mmask.sum() < mindp:
-                # residue does not have enough data to perform fit
-                logfreport.write(to_fit.not_enough_data(res, xdata, ydata))
-                self.fit_okay[col_res] = False
-                self.fit_plot_text[col_res] = "not enough data"
-                self.fit_plot_ydata[col_res] = None
+            # the shared parameters depend on all the residues of their
+            # group, global fits are reused only if no residue changed
+            if shared_parameter and len(cached_fits) < len(candidates):
+                cached_fits = {}
+            
+            candidates = [c for c in candidates if not(c[0] in cached_fits)]
+            p0s = [
+                fit_cache.starting_parameters(entry, key)
+                for key, dataset in candidates
+                ]
+            self.logs(
+                '*** {} fits reused from cache, {} to fit'.\
+                    format(len(cached_fits), len(candidates))
+                )
+        
+        datasets = [dataset for key, dataset in candidates]
+        
+        if shared_parameter and datasets:
+            groups = [
+                res_groups.get(res, len(global_fit_groups))
+                for xdata, ydata, res in datasets
+                ]
+            global_fits = to_fit.fit_data_global(
+                datasets,
+                shared_parameter,
+                p0s=p0s,
+                groups=groups
+                )
+            shared_index = to_fit.param_names.index(shared_parameter)
+            
+            for group in sorted(set(groups)):
+                fitted = [
+                    fit for fit, g in zip(global_fits, groups) if g == group
+                    ]
+                shared_values = [
+                    popt[shared_index] for okay, popt, pcov in fitted if okay
+                    ]
+                
+                if shared_values:
+                    self.logs(
+                        '*** Global fit of {} residues, shared {} = {:.4f}'.\
+                            format(
+                                len(fitted),
+                                shared_parameter,
+                                shared_values[0]
+                                )
+                        )
+                
+                else:
+                    self.logs('*** Global fit of {} residues failed'.\
+                        format(len(fitted)))
+            
+            fits = iter(global_fits)
+        
+        elif executor is not None and datasets:
+            fits = _submits_fit_jobs(
+                executor,
+                to_fit,
+                datasets,
+                batch_fitting,
+                p0s
+                )
+        
+        elif batch_fitting:
+            fits = iter(to_fit.fit_data_batch(datasets, p0s=p0s))
+        
+        else:
+            fits = (
+                to_fit.fit_data(xdata, ydata, res, p0=p0)
+                for (xdata, ydata, res), p0 in \
+                    zip(datasets, p0s or [None] * len(datasets))
+                )
+        
+        return {
+            'col': col,
+            'to_fit': to_fit,
+            'fit_input': fit_input,
+            'fits': fits,
+            'cached_fits': cached_fits,
+            'data_keys': data_keys,
+            'fit_cache': fit_cache,
+            'table_key': table_key,
+            'executor': executor,
+            'bootstrap_replicas': bootstrap_replicas,
+            'bootstrap_method': bootstrap_method,
+            'confidence_level': confidence_level,
+            'write_fit_report': write_fit_report,
+            'skipped': skipped
+            }
+    
+    def writes_fit(self, fit_state):
+        """
+        Collects the fits started by .submit_fit() in a result array
+        and writes the fit table and, if requested, the fit report.
+        
+        Parameters:
+            fit_state (dict): as returned by .submit_fit().
+        
+        Modifies:
+            self.fit_results, self.fit_models
+        """
+        col = fit_state['col']
+        to_fit = fit_state['to_fit']
+        fits = fit_state['fits']
+        fit_input = fit_state['fit_input']
+        cached_fits = fit_state['cached_fits']
+        results = to_fit.new_results(
+            [row[0] for row in fit_input],
+            self.xfit
+            )
+        skipped = fit_state['skipped']
+        new_entry = {}
+        # rows of the fitted residues and their fits
+        rows = []
+        res_fits = []
+        
+        for row, (res, xdata, ydata, enough, key) in enumerate(fit_input):
+            if not(enough):
                 continue
+            elif key in skipped:
+                results['status'][row] = skipped[key]
+                continue
+            elif key in cached_fits:
+                fit = cached_fits[key]
+            else:
+                fit = next(fits)
             
-            a, b, c, d, e = \
-                to_fit.fit_data(
-                    xdata,
-                    ydata,
-                    res,
-                    self.xfit
-                    )
-            logfreport.write(a)
-            logftable.write(b)
-            self.fit_plot_text[col_res] = c
-            self.fit_okay[col_res] = d
-            self.fit_plot_ydata[col_res] = e
-        
-        logfreport.close()
-        self.logs("*** Fit report log file written: {}".format(logfrep_name))
+            new_entry[key] = (fit_state['data_keys'].get(key), fit)
+            rows.append(row)
+            res_fits.append(fit)
+        
+        to_fit.stores_fits(results, rows, res_fits, self.xfit)
+        self.fit_results[col] = results
+        self.fit_models[col] = to_fit
+        
+        col_path = os.path.join(self.tables_and_plots_folder, col)
+        
+        if not(os.path.exists(col_path)):
+            os.makedirs(col_path)
+        
+        logftable_name = os.path.join(
+            self.tables_and_plots_folder,
+            col,
+            '{}_fit_table.csv'.format(col)
+            )
+        logftable = open(logftable_name, 'w')
+        logftable.write(
+            to_fit.renders_table(
+                results,
+                self._bootstraps_fit(fit_state, results)
+                )
+            )
         logftable.close()
         self.logs("*** Fit table log file written: {}".format(logftable_name))
         
+        if fit_state['write_fit_report']:
+            logfrep_name = os.path.join(
+                self.tables_and_plots_folder,
+                col,
+                "{}_fit_report.log".format(col)
+                )
+            logfreport = open(logfrep_name, 'w')
+            logfreport.write(to_fit.renders_report(col, results, fit_input))
+            logfreport.close()
+            self.logs(
+                "*** Fit report log file written: {}".format(logfrep_name)
+                )
+        
+        if fit_state['fit_cache'] is not None:
+            fit_state['fit_cache'].save(fit_state['table_key'], new_entry)
+        
         return
     
+    def _bootstraps_fit(self, fit_state, results):
+        """
+        Estimates the confidence intervals of the successful fits,
+        see FittingBase.bootstrap_batch().
+        
+        Parameters:
+            fit_state (dict): as returned by .submit_fit().
+            
+            results (np.ndarray): the fits, as created by
+                FittingBase.new_results().
+        
+        Returns:
+            dict {row of <results>: (parameters, 2) np.ndarray}, None
+            when the estimation is disabled.
+        """
+        n_replicas = fit_state['bootstrap_replicas']
+        
+        if not(n_replicas):
+            return None
+        
+        okay = results['status'] == fit_statuses.index('okay')
+        datasets = [
+            (xdata, ydata, res)
+            for (res, xdata, ydata, enough, key), fitted in \
+                zip(fit_state['fit_input'], okay)
+            if fitted
+            ]
+        
+        if not(datasets):
+            return {}
+        
+        self.logs(
+            '*** Estimating {:.0%} confidence intervals of {} fits from \
+{} {} replicas'.format(
+                fit_state['confidence_level'],
+                len(datasets),
+                n_replicas,
+                fit_state['bootstrap_method']
+                )
+            )
+        intervals = _submits_bootstrap_jobs(
+            fit_state['executor'],
+            fit_state['to_fit'],
+            datasets,
+            results['popt'][okay],
+            n_replicas,
+            fit_state['bootstrap_method'],
+            fit_state['confidence_level']
+            )
+        
+        return dict(zip(np.flatnonzero(okay), intervals))
+    
+    def _fit_result(self, col, row_number):
+        """
+        The fit of the residue in major_axis row <row_number> in column
+        <col>, a row of .fit_results[col], None if it was not fitted.
+        
+        Rows are looked up by position because sidechains have two rows
+        per residue.
+        """
+        if not(self.fit_performed) or not(col in self.fit_results):
+            return None
+        
+        return self.fit_results[col][self.major_axis.get_loc(row_number)]
+
+def _fit_job(to_fit, datasets, batch_fitting, p0s):
+    """
+    Fits a chunk of residues datasets in an executor worker.
+    
+    Defined at module level so that it can be sent to worker processes.
+    """
+    if batch_fitting:
+        return to_fit.fit_data_batch(datasets, p0s=p0s)
+    
+    return [
+        to_fit.fit_data(x, y, res, p0=p0)
+        for (x, y, res), p0 in zip(datasets, p0s)
+        ]
+
+def _submits_fit_jobs(
+        executor,
+        to_fit,
+        datasets,
+        batch_fitting,
+        p0s=None
+        ):
+    """
+    Splits the residues datasets in chunks and submits them to
+    <executor>.
+    
+    Returns:
+        Iterator over the results of each dataset, in the order of
+        <datasets>, waiting for each chunk as needed.
+    """
+    # up to 64 chunks balance the load between workers
+    # without much communication overhead
+    chunk_size = max(1, ceil(len(datasets) / 64))
+    p0s = p0s or [None] * len(datasets)
+    futures = [
+        executor.submit(
+            _fit_job,
+            to_fit,
+            datasets[i:i+chunk_size],
+            batch_fitting,
+            p0s[i:i+chunk_size]
+            )
+        for i in range(0, len(datasets), chunk_size)
+        ]
+    
+    return (fit for future in futures for fit in future.result())
+
+def _bootstrap_job(to_fit, datasets, popts, n_replicas, method, level, seed):
+    """
+    Estimates the confidence intervals of a chunk of residues fits
+    in an executor worker.
+    
+    Defined at module level so that it can be sent to worker processes.
+    """
+    x, y, weights = to_fit.pads_datasets(datasets)
+    replicas = to_fit.bootstrap_batch(
+        x,
+        y,
+        weights,
+        popts,
+        n_replicas,
+        method=method,
+        random_state=np.random.RandomState(seed)
+        )
+    
+    return to_fit.confidence_intervals(replicas, level)
+
+def _submits_bootstrap_jobs(
+        executor,
+        to_fit,
+        datasets,
+        popts,
+        n_replicas,
+        method,
+        level
+        ):
+    """
+    Splits the residues fits in chunks and estimates their confidence
+    intervals in <executor>, or in this process if <executor> is None.
+    
+    Returns:
+        List with the intervals of each dataset, in the order of
+        <datasets>.
+    """
+    # chunks of up to 100000 replicas bound the memory of each batch,
+    # each chunk is seeded by its position for reproducible results
+    chunk_size = max(
+        1,
+        min(ceil(len(datasets) / 64), 100000 // n_replicas)
+        )
+    jobs = [
+        (
+            to_fit,
+            datasets[i:i+chunk_size],
+            popts[i:i+chunk_size],
+            n_replicas,
+            method,
+            level,
+            i
+            )
+        for i in range(0, len(datasets), chunk_size)
+        ]
+    
+    if executor is None:
+        chunks = [_bootstrap_job(*job) for job in jobs]
+    else:
+        futures = [executor.submit(_bootstrap_job, *job) for job in jobs]
+        chunks = [future.result() for future in futures]
+    
+    return [ci for chunk in chunks for ci in chunk]
+
 if __name__ == "__main__":
     
     print('FarseerSeries')
@@ -235,21 +235,20 @@ is executed previously."
         
         # Generates FASTA reference dataframe
         dd = {}
-        # ResNo is kept as str() to allow reindexing
-        # later on the finds_missing function.
+        # ResNo is kept as int, the same type as the peaklists ResNo,
+        # to allow reindexing later on the finds_missing function.
         dd["ResNo"] = \
-            [str(i) for i in range(
+            list(range(
                 self.fasta_start_num,
                 (self.fasta_start_num + len(fasta_string))
-                )
-            ]
+                ))
         dd["1-letter"] = list(fasta_string)
         dd["3-letter"] = [aal1tol3[i] for i in fasta_string]
         # Assign F1 is generated here because it will serve in future functions.
         dd["Assign F1"] = \
-            [str(i+j+atom1) for i, j in zip(dd["ResNo"], dd["3-letter"])]
+            [str(i)+j+atom1 for i, j in zip(dd["ResNo"], dd["3-letter"])]
         dd["Assign F2"] = \
-            [str(i+j+atom2) for i, j in zip(dd["ResNo"], dd["3-letter"])]
+            [str(i)+j+atom2 for i, j in zip(dd["ResNo"], dd["3-letter"])]
         # Details set to 'None' as it is by default in CCPNMRv2 peaklists
         dd['Details'] = [details for i in fasta_string]
         self.fasta_df = pd.DataFrame(
@@ -321,11 +320,11 @@ MQPPCV
     
     # sets data frame for comparison
     dd = {}
-    dd["ResNo"] = [str(i) for i in range(1, (1 + len(fasta_clean)))]
+    dd["ResNo"] = list(range(1, (1 + len(fasta_clean))))
     dd["1-letter"] = list(fasta_clean)
     dd["3-letter"] = [aal1tol3[i] for i in fasta_clean]
-    dd["Assign F1"] = [str(i+j+'H') for i, j in zip(dd["ResNo"], dd["3-letter"])]
-    dd["Assign F2"] = [str(i+j+'N') for i, j in zip(dd["ResNo"], dd["3-letter"])]
+    dd["Assign F1"] = [str(i)+j+'H' for i, j in zip(dd["ResNo"], dd["3-letter"])]
+    dd["Assign F2"] = [str(i)+j+'N' for i, j in zip(dd["ResNo"], dd["3-letter"])]
     dd['Details'] = ['None' for i in fasta_clean]
     fasta_df = pd.DataFrame(
         dd,
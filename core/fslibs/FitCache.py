@@ -0,0 +1,111 @@
+"""
+Copyright © 2017-2018 Farseer-NMR
+João M.C. Teixeira and Simon P. Skinner
+
+@ResearchGate https://goo.gl/z8dPJU
+@Twitter https://twitter.com/farseer_nmr
+
+This file is part of Farseer-NMR.
+
+Farseer-NMR is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Farseer-NMR is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Farseer-NMR. If not, see <http://www.gnu.org/licenses/>.
+"""
+import hashlib
+import numpy as np
+
+from core.fslibs.PeaklistCache import PeaklistCache
+
+# increase when fit results change for the same data,
+# entries created by other versions are ignored.
+fit_version = '3'
+
+class FitCache(PeaklistCache):
+    """
+    Persistent cache of fit results, stored as PeaklistCache entries.
+    
+    There is one entry per fit table, identified by the series folder,
+    the fitted column and the fitting function. The entry is a
+    dictionary with the row key (residue number, sidechain ATOM or '')
+    as key and the tuple
+    (data key, fit_data() output) as values. Residues whose data key
+    did not change reuse the cached fit, the fitted parameters of the
+    others are used as starting parameters for refitting.
+    """
+    
+    def table_key(self, table_path, col, fit_function, *extra):
+        """
+        Generates the key of the entry of a fit table.
+        
+        Parameters:
+            table_path (str): the series folder where tables are written.
+            
+            col (str): the fitted column.
+            
+            fit_function (str): the fitting function name.
+            
+            extra (str): additional fitting options that change the
+                fitted result, for example, the shared parameter of
+                global fits.
+        
+        Returns:
+            The hexadecimal sha1 key.
+        """
+        sha = hashlib.sha1()
+        
+        for item in (fit_version, table_path, col, fit_function) + extra:
+            sha.update(str(item).encode('utf-8'))
+        
+        return sha.hexdigest()
+    
+    def data_key(self, xdata, ydata, xfit):
+        """
+        Generates the key of the data fitted for a residue.
+        
+        Returns:
+            The hexadecimal sha1 key.
+        """
+        sha = hashlib.sha1()
+        
+        for values in (xdata, ydata, xfit):
+            values = np.asarray(values, dtype=float)
+            sha.update(str(values.shape).encode('utf-8'))
+            sha.update(values.tobytes())
+        
+        return sha.hexdigest()
+    
+    def starting_parameters(self, entry, key):
+        """
+        Finds starting parameters for the row <key>, (res, ATOM), in a
+        cached table <entry>: its own previous fit or, if it failed or
+        is missing, the fit of the nearest residue, preferring the same
+        sidechain ATOM.
+        
+        Returns:
+            The fitted parameters, None if there is no successful fit
+            in <entry>.
+        """
+        fitted = {
+            r:fit[1] for r, (data_key, fit) in entry.items()
+            if fit[0]
+            }
+        
+        if not(fitted):
+            return None
+        
+        res, atom = key
+        nearest = min(
+            fitted,
+            key=lambda k: (abs(k[0] - res), k[1] != atom, k)
+            )
+        
+        return fitted[nearest]
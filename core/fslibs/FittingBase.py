@@ -21,6 +21,33 @@ You should have received a copy of the GNU General Public License
 along with Farseer-NMR. If not, see <http://www.gnu.org/licenses/>.
 """
 from abc import ABCMeta, abstractmethod
+import inspect
+import warnings
+import numpy as np
+import scipy.optimize as sciopt
+import scipy.sparse as sparse
+
+def _solve_batch(lhs, rhs):
+    """
+    Solves the stacked linear systems lhs x = rhs, systems that are
+    singular are solved by least squares.
+    """
+    try:
+        return np.linalg.solve(lhs, rhs[...,None])[...,0]
+    
+    except np.linalg.LinAlgError:
+        return np.array(
+            [np.linalg.lstsq(a, b)[0] for a, b in zip(lhs, rhs)]
+            )
+
+# status of the fits in the result arrays, see FittingBase.new_results()
+fit_statuses = (
+    'okay',
+    'failed',
+    'not enough data',
+    'flat',
+    'low amplitude'
+    )
 
 class FittingBase(metaclass=ABCMeta):
     """
@@ -35,6 +62,74 @@ class FittingBase(metaclass=ABCMeta):
         """The equation formula to which continuous data is fit."""
         pass
     
+    # names of the .equation() parameters, in order.
+    param_names = ()
+    
+    # Optional analytic Jacobian of .equation(), a method
+    # jacobian(x, *params) returning the derivatives with respect to
+    # each parameter stacked in the last axis, shape (..., points, params).
+    # When None, fits use finite differences.
+    jacobian = None
+    
+    # typical values of the .equation() parameters, used to generate
+    # synthetic titrations, see .validates_model() and
+    # core.fslibs.fitting_functions.benchmark_models().
+    reference_parameters = ()
+    
+    @classmethod
+    def validates_model(cls):
+        """
+        Checks that the fitting function can be used by the fitting
+        workflows: it implements all the abstract methods, .equation()
+        and .jacobian() take x and one argument per parameter and both
+        evaluate several parameter sets at once.
+        
+        Raises:
+            TypeError if the fitting function is not valid.
+        """
+        def fails(problem):
+            raise TypeError(
+                'Fitting function {} {}'.format(cls.__name__, problem)
+                )
+        
+        if inspect.isabstract(cls):
+            fails('does not implement all the FittingBase abstract methods')
+        
+        n_params = len(cls.param_names)
+        
+        if not(n_params):
+            fails('does not define param_names')
+        
+        if len(cls.reference_parameters) != n_params:
+            fails('reference_parameters do not match param_names')
+        
+        methods = [cls.equation]
+        
+        if cls.jacobian is not None:
+            methods.append(cls.jacobian)
+        
+        for method in methods:
+            # self, x and the parameters
+            if len(inspect.signature(method).parameters) != n_params + 2:
+                fails(
+                    '{} does not take x and {} parameters'.format(
+                        method.__name__,
+                        n_params
+                        )
+                    )
+        
+        model = cls()
+        x = np.tile(np.linspace(0, 2, 5), (2, 1))
+        p = np.tile(np.array(cls.reference_parameters, dtype=float), (2, 1))
+        
+        if np.shape(model.evaluate_batch(x, p)) != x.shape:
+            fails('equation does not evaluate parameter sets at once')
+        
+        if np.shape(model.jacobian_batch(x, p)) != x.shape + (n_params,):
+            fails('jacobian does not evaluate parameter sets at once')
+        
+        return None
+    
     @abstractmethod
     def log_okay(self, *args):
         """
@@ -96,8 +191,803 @@ ydata: {}
         
         return s2w
     
+    # SKIPPED BY THE PRE-SCREEN
+    def fit_skipped(self, res, x, y, status):
+        """
+        What to write in the fit_report.log file when the data
+        was not fitted after .prescreen_batch().
+        """
+        s2w = \
+"""
+ResNo:  {}
+xdata: {}
+ydata: {}
+!¡{} DATA - FIT NOT PERFORMED!¡
+**************************
+""". \
+                format(res, list(x), list(y), status.upper())
+        
+        return s2w
+    
     @abstractmethod
     def fit_data(self, *args):
-        """Workflow for fitting data with the specific equation."""
+        """
+        Workflow for fitting data with the specific equation.
+        
+        Called as fit_data(x, y, res, p0=None), where p0 are
+        optional starting parameters, and returns the tuple
+        (fit okay, fitted parameters, covariance), parameters and
+        covariance are None if the fit failed.
+        """
         pass
+    
+    def fit_data_batch(self, datasets, p0s=None):
+        """
+        Fits several independent datasets.
+        
+        Fitting functions can override this method with a vectorized
+        workflow, see HillEquation.
+        
+        Parameters:
+            datasets (list): (xdata, ydata, res) tuples.
+            
+            p0s (list, optional): starting parameters of each dataset,
+                None to use the default ones.
+        
+        Returns:
+            List with the output of .fit_data() for each dataset.
+        """
+        p0s = p0s or [None] * len(datasets)
+        
+        return [
+            self.fit_data(x, y, res, p0=p0)
+            for (x, y, res), p0 in zip(datasets, p0s)
+            ]
+    
+    def fit_data_global(
+            self,
+            datasets,
+            shared_parameter,
+            p0s=None,
+            groups=None
+            ):
+        """
+        Fits the datasets of each group together sharing parameter
+        <shared_parameter> while other parameters are fit for each
+        dataset, see .least_squares_global().
+        
+        Parameters as in .fit_data_batch() and
+            shared_parameter (str): one of .param_names.
+            
+            groups (opt, list): the group of each dataset, each group
+                is fit separately with its own shared parameter.
+                By default all the datasets share the parameter.
+        
+        Returns:
+            List with the output of .fit_data() for each dataset.
+        """
+        
+        if not(datasets):
+            return []
+        
+        groups = groups or [0] * len(datasets)
+        p0 = self._initial_guesses(datasets, p0s)
+        shared_index = self.param_names.index(shared_parameter)
+        fits = [None] * len(datasets)
+        
+        # groups are independent problems, one sparse block each
+        for group in sorted(set(groups), key=groups.index):
+            members = [i for i, g in enumerate(groups) if g == group]
+            x, y, weights = self.pads_datasets([datasets[i] for i in members])
+            popts, pcovs, success = self.least_squares_global(
+                x,
+                y,
+                weights,
+                p0[members],
+                shared_index
+                )
+            group_fits = self._fit_outputs(
+                [datasets[i] for i in members],
+                popts,
+                pcovs,
+                success
+                )
+            
+            for i, fit in zip(members, group_fits):
+                fits[i] = fit
+        
+        return fits
+    
+    def initial_guess(self, x, y):
+        """
+        Default starting parameters of the fit of <x> and <y>, the
+        .reference_parameters unless overridden.
+        """
+        return list(self.reference_parameters)
+    
+    def _initial_guesses(self, datasets, p0s=None):
+        """(datasets, parameters) array of starting parameters."""
+        p0s = p0s or [None] * len(datasets)
+        
+        return np.array(
+            [
+                self.initial_guess(xd, yd) if p0 is None else p0
+                for (xd, yd, res), p0 in zip(datasets, p0s)
+                ],
+            dtype=float
+            )
+    
+    def _fit_outputs(self, datasets, popts, pcovs, success):
+        """The output of .fit_data() for each fitted dataset."""
+        fits = []
+        
+        for (xdata, ydata, res), popt, pcov, okay in \
+                zip(datasets, popts, pcovs, success):
+            
+            if not(okay):
+                print("*** Fit residue {} - Failed!".format(res))
+                fits.append((False, None, None))
+            else:
+                print("*** Fit residue {} - OK!".format(res))
+                fits.append((True, popt, pcov))
+        
+        return fits
+    
+    def new_results(self, res_numbers, xfit):
+        """
+        Preallocates the array where the fits of a column are stored.
+        
+        Parameters:
+            res_numbers (list): the residue number of each row.
+            
+            xfit (np.ndarray): x values where fitted curves are evaluated.
+        
+        Returns:
+            Structured np.ndarray with fields 'res', 'status' (index in
+            fit_statuses), 'popt', 'pcov' and 'ydata' (the fitted curve
+            at <xfit>). Residues start as 'not enough data' and nan.
+        """
+        n_params = len(self.param_names)
+        results = np.zeros(
+            len(res_numbers),
+            dtype=[
+                ('res', int),
+                ('status', np.int8),
+                ('popt', float, (n_params,)),
+                ('pcov', float, (n_params, n_params)),
+                ('ydata', float, (len(xfit),))
+                ]
+            )
+        results['res'] = res_numbers
+        results['status'] = fit_statuses.index('not enough data')
+        results['popt'] = np.nan
+        results['pcov'] = np.nan
+        results['ydata'] = np.nan
+        
+        return results
+    
+    def prescreen_batch(self, y, weights, min_amplitude=0.05):
+        """
+        Classifies the datasets from cheap statistics computed for all
+        of them at once, so that data that can not be fit does not reach
+        the solver.
+        
+        Parameters:
+            y, weights (np.ndarray): as in .levenberg_marquardt_batch().
+            
+            min_amplitude (float): fraction of the median amplitude of
+                the datasets below which a dataset is not fitted.
+        
+        Returns:
+            (datasets,) np.ndarray with the index in fit_statuses of
+            'flat' for datasets whose values do not change, for example,
+            all zero, 'low amplitude' for datasets whose peak to peak
+            amplitude is below <min_amplitude> times the median amplitude
+            of the non flat datasets, and 'okay' for the others.
+        """
+        valid = weights > 0
+        amplitude = np.where(valid, y, -np.inf).max(axis=1) \
+            - np.where(valid, y, np.inf).min(axis=1)
+        scale = np.where(valid, np.abs(y), 0.).max(axis=1)
+        flat = ~(amplitude > 1e-12 * scale)
+        status = np.full(y.shape[0], fit_statuses.index('okay'), np.int8)
+        status[flat] = fit_statuses.index('flat')
+        
+        if not(flat.all()):
+            reference = np.median(amplitude[~flat])
+            low = ~flat & (amplitude < min_amplitude * reference)
+            status[low] = fit_statuses.index('low amplitude')
+        
+        return status
+    
+    def stores_fits(self, results, rows, fits, xfit):
+        """
+        Stores the output of .fit_data() for the residues in <rows> and
+        evaluates all the fitted curves at <xfit> at once.
+        
+        Modifies:
+            results, as created by .new_results().
+        """
+        for row, (okay, popt, pcov) in zip(rows, fits):
+            if okay:
+                results['status'][row] = fit_statuses.index('okay')
+                results['popt'][row] = popt
+                results['pcov'][row] = pcov
+            else:
+                results['status'][row] = fit_statuses.index('failed')
+        
+        okay = results['status'] == fit_statuses.index('okay')
+        
+        with np.errstate(all='ignore'):
+            results['ydata'][okay] = self.evaluate_batch(
+                np.broadcast_to(xfit, (okay.sum(), len(xfit))),
+                results['popt'][okay]
+                )
+        
+        return None
+    
+    def renders_report(self, col, results, fit_input):
+        """
+        Renders the fit_report.log file.
+        
+        Parameters:
+            col (str): the fitted column.
+            
+            results (np.ndarray): as created by .new_results().
+            
+            fit_input (list): (res, xdata, ydata, ...) of each row of
+                <results>.
+        
+        Returns:
+            The report text.
+        """
+        lines = [self.fit_log_header(col)]
+        
+        for result, (res, xdata, ydata) in \
+                zip(results, (row[:3] for row in fit_input)):
+            status = fit_statuses[result['status']]
+            
+            if status == 'okay':
+                lines.append(
+                    self.log_okay(
+                        res,
+                        xdata,
+                        ydata,
+                        result['popt'],
+                        result['pcov']
+                        )
+                    )
+            
+            elif status == 'failed':
+                lines.append(self.fit_failed(res, xdata, ydata))
+            
+            elif status == 'not enough data':
+                lines.append(self.not_enough_data(res, xdata, ydata))
+            
+            else:
+                lines.append(self.fit_skipped(res, xdata, ydata, status))
+        
+        return ''.join(lines)
+    
+    def renders_table(self, results, intervals=None):
+        """
+        Renders the fit_table.csv file, residues without enough data
+        are not included, residues not fitted after .prescreen_batch()
+        are reported with their status.
+        
+        Parameters:
+            results (np.ndarray): as created by .new_results().
+            
+            intervals (dict, optional): {row of <results>: confidence
+                intervals},
+                adds the confidence intervals columns, see
+                .confidence_row().
+        
+        Returns:
+            The table text.
+        """
+        if intervals is None:
+            lines = [self.results_header()]
+        else:
+            lines = [
+                self.results_header().rstrip('\n') \
+                    + self.confidence_header() + '\n'
+                ]
+        
+        for row, result in enumerate(results):
+            status = fit_statuses[result['status']]
+            
+            if status == 'not enough data':
+                continue
+            
+            if status == 'okay':
+                line = self.results(result['res'], result['popt'])
+            else:
+                line = self.results(result['res'], None, status=status)
+            
+            if intervals is not None:
+                line = line.rstrip('\n') \
+                    + self.confidence_row(intervals.get(row)) \
+                    + '\n'
+            
+            lines.append(line)
+        
+        return ''.join(lines)
+    
+    def plot_text(self, result):
+        """Text writen in the subplot of a row of .new_results()."""
+        status = fit_statuses[result['status']]
+        
+        if status == 'okay':
+            return self.txt_plot(result['popt'])
+        
+        elif status == 'failed':
+            return 'fit failed'
+        
+        return status
+    
+    def pads_datasets(self, datasets):
+        """
+        Stacks (xdata, ydata, res) datasets with different number of
+        points in arrays of shape (datasets, points).
+        
+        Returns:
+            x, y, weights np.ndarrays, padded points have x = 1, y = 0
+            and weight 0.
+        """
+        n_points = max(len(x) for x, y, res in datasets)
+        x = np.ones((len(datasets), n_points))
+        y = np.zeros((len(datasets), n_points))
+        weights = np.zeros((len(datasets), n_points))
+        
+        for i, (xdata, ydata, res) in enumerate(datasets):
+            x[i,:len(xdata)] = xdata
+            y[i,:len(ydata)] = ydata
+            weights[i,:len(xdata)] = 1.
+        
+        return x, y, weights
+    
+    def evaluate_batch(self, x, p):
+        """
+        Evaluates .equation() for several parameter sets at once.
+        
+        Parameters:
+            x (np.ndarray): (datasets, points) x values.
+            
+            p (np.ndarray): (datasets, parameters) parameter values.
+        
+        Returns:
+            (datasets, points) np.ndarray.
+        """
+        return self.equation(x, *[p[:,k,None] for k in range(p.shape[1])])
+    
+    def jacobian_batch(self, x, p):
+        """
+        Jacobian of .equation() with respect to the parameters, from
+        .jacobian() if defined, otherwise by forward differences.
+        
+        Parameters:
+            x (np.ndarray): (datasets, points) x values.
+            
+            p (np.ndarray): (datasets, parameters) parameter values.
+        
+        Returns:
+            (datasets, points, parameters) np.ndarray.
+        """
+        if self.jacobian is not None:
+            return self.jacobian(
+                x,
+                *[p[:,k,None] for k in range(p.shape[1])]
+                )
+        
+        f0 = self.evaluate_batch(x, p)
+        jac = np.empty(f0.shape + (p.shape[1],))
+        
+        for k in range(p.shape[1]):
+            step = np.sqrt(np.finfo(float).eps) * np.abs(p[:,k])
+            step[step == 0] = np.sqrt(np.finfo(float).eps)
+            p_step = p.copy()
+            p_step[:,k] += step
+            jac[:,:,k] = (self.evaluate_batch(x, p_step) - f0) / step[:,None]
+        
+        return jac
+    
+    def levenberg_marquardt_batch(
+            self,
+            x,
+            y,
+            weights,
+            p0,
+            max_iter=None,
+            ftol=1.49012e-08,
+            xtol=1.49012e-08,
+            full_output=False
+            ):
+        """
+        Least squares fit of independent datasets to .equation() with
+        a vectorized Levenberg-Marquardt algorithm.
+        
+        Each dataset has its own damping factor and convergence state,
+        datasets that converge or fail stop being updated.
+        Datasets with different number of points are padded, padded
+        points have weight 0.
+        
+        Parameters:
+            x, y (np.ndarray): (datasets, points) data.
+            
+            weights (np.ndarray): (datasets, points), 1 for the points to
+                fit and 0 for padding.
+            
+            p0 (np.ndarray): (datasets, parameters) initial guess.
+            
+            max_iter (int): maximum number of iterations, defaults to
+                800 * (parameters + 1), the budget of function evaluations
+                of scipy.optimize.curve_fit. Fits normally stop earlier
+                by the tolerances.
+            
+            ftol, xtol (float): relative tolerances in the sum of squares
+                and in the parameters, as in scipy.optimize.leastsq:
+                a dataset converges when both the actual and the predicted
+                relative reductions of the sum of squares are below
+                <ftol> or when the step norm is below <xtol> times the
+                parameters norm.
+            
+            full_output (bool): also return the evaluations counts,
+                as scipy.optimize.curve_fit.
+        
+        Returns:
+            popt (np.ndarray): (datasets, parameters) fitted parameters.
+            
+            pcov (np.ndarray): (datasets, parameters, parameters) estimated
+                covariance, same as scipy.optimize.curve_fit, inf when it
+                can not be estimated.
+            
+            success (np.ndarray): (datasets,) boolean, False for datasets
+                that did not converge.
+            
+            infodict (dict): only with <full_output>, 'nfev' the
+                (datasets,) number of evaluations of each dataset and
+                'niter' the number of iterations until all the datasets
+                converged or failed.
+        """
+        
+        def sum_squares(x, y, weights, p):
+            residuals = np.where(
+                weights > 0,
+                weights * (y - self.evaluate_batch(x, p)),
+                0.
+                )
+            
+            return np.sum(residuals**2, axis=1), residuals
+        
+        n_sets, n_params = p0.shape
+        
+        if max_iter is None:
+            max_iter = 800 * (n_params + 1)
+        
+        p = np.array(p0, dtype=float)
+        damping = np.full(n_sets, 1e-3)
+        damping_step = np.full(n_sets, 2.)
+        converged = np.zeros(n_sets, dtype=bool)
+        failed = np.zeros(n_sets, dtype=bool)
+        nfev = np.ones(n_sets, dtype=int)
+        niter = 0
+        
+        with np.errstate(all='ignore'):
+            cost, residuals = sum_squares(x, y, weights, p)
+            failed |= ~np.isfinite(cost)
+            converged |= (cost == 0) & ~failed
+            
+            for iteration in range(max_iter):
+                active = ~(converged | failed)
+                
+                if not(active.any()):
+                    break
+                
+                # works only over the active datasets
+                ia = np.flatnonzero(active)
+                nfev[ia] += 1
+                niter += 1
+                jac = self._weighted_jacobian(x[ia], p[ia], weights[ia])
+                jtj = np.einsum('ijk,ijl->ikl', jac, jac)
+                jtr = np.einsum('ijk,ij->ik', jac, residuals[ia])
+                diag = np.einsum('ikk->ik', jtj).copy()
+                diag[diag == 0] = 1.
+                scaled_diag = damping[ia,None] * diag
+                lhs = jtj + scaled_diag[:,:,None] * np.eye(n_params)
+                delta = _solve_batch(lhs, jtr)
+                # reduction of the sum of squares predicted by the
+                # linear model
+                predicted = np.sum(delta * (scaled_diag * delta + jtr), axis=1)
+                
+                p_new = p[ia] + delta
+                cost_new, residuals_new = \
+                    sum_squares(x[ia], y[ia], weights[ia], p_new)
+                
+                improved = np.isfinite(cost_new) & (cost_new < cost[ia]) \
+                    & np.isfinite(delta).all(axis=1)
+                small_step = np.sqrt(np.sum(delta**2, axis=1)) \
+                    <= xtol * (np.sqrt(np.sum(p[ia]**2, axis=1)) + xtol)
+                # relative reductions as in MINPACK lmder
+                small_reduction = \
+                    (np.abs(cost[ia] - cost_new) <= ftol * cost[ia]) \
+                    & (predicted <= ftol * cost[ia])
+                
+                # damping update by Nielsen, H. B. Damping parameter in
+                # Marquardt's method. IMM-REP-1999-05, DTU (1999).
+                gain = (cost[ia] - cost_new) / predicted
+                iu = ia[improved]
+                damping[iu] *= np.maximum(
+                    1/3,
+                    1 - (2 * gain[improved] - 1)**3
+                    )
+                damping_step[iu] = 2.
+                ir = ia[~improved]
+                damping[ir] *= damping_step[ir]
+                damping_step[ir] *= 2
+                
+                # updates improved datasets
+                p[iu] = p_new[improved]
+                cost[iu] = cost_new[improved]
+                residuals[iu] = residuals_new[improved]
+                
+                converged[ia[small_step | small_reduction]] = True
+                failed[ia[~np.isfinite(delta).all(axis=1)]] = True
+                failed[ia[damping[ia] > 1e16]] = True
+                converged &= ~failed
+        
+        success = converged & np.isfinite(p).all(axis=1)
+        pcov = self._covariance_batch(x, p, weights, cost)
+        
+        if full_output:
+            return p, pcov, success, {'nfev': nfev, 'niter': niter}
+        
+        return p, pcov, success
+    
+    def bootstrap_batch(
+            self,
+            x,
+            y,
+            weights,
+            popt,
+            n_replicas,
+            method='residual',
+            random_state=None
+            ):
+        """
+        Resampling estimate of the distribution of the parameters
+        fitted to each dataset.
+        
+        Replicas of each dataset are generated from its fitted curve and
+        all the replicas of all the datasets are fit at once with
+        .levenberg_marquardt_batch(), starting from <popt>.
+        
+        Parameters:
+            x, y, weights (np.ndarray): as in .levenberg_marquardt_batch(),
+                padded points must be at the end of each dataset.
+            
+            popt (np.ndarray): (datasets, parameters) fitted parameters.
+            
+            n_replicas (int): number of replicas of each dataset.
+            
+            method (str): 'residual', replicas add to the fitted curve
+                the fit residuals resampled with replacement, or
+                'montecarlo', replicas add to the fitted curve gaussian
+                noise with the standard deviation of the residuals.
+            
+            random_state (opt, np.random.RandomState): random generator,
+                for reproducible replicas.
+        
+        Returns:
+            (datasets, replicas, parameters) np.ndarray with the
+            parameters fitted to each replica, nan for failed fits.
+        """
+        random_state = random_state or np.random.RandomState()
+        n_sets, n_points = y.shape
+        n_params = popt.shape[1]
+        valid = weights > 0
+        n_valid = valid.sum(axis=1)
+        
+        with np.errstate(all='ignore'):
+            fitted = self.evaluate_batch(x, popt)
+        
+        residuals = np.where(valid, y - fitted, 0.)
+        shape = (n_sets, n_replicas, n_points)
+        
+        if method == 'residual':
+            picks = (random_state.random_sample(shape) \
+                * n_valid[:,None,None]).astype(int)
+            noise = residuals[np.arange(n_sets)[:,None,None], picks]
+        
+        elif method == 'montecarlo':
+            stddev = np.sqrt(
+                np.sum(residuals**2, axis=1) \
+                    / np.maximum(n_valid - n_params, 1)
+                )
+            noise = random_state.standard_normal(shape) \
+                * stddev[:,None,None]
+        
+        else:
+            raise ValueError(
+                'Unknown resampling method: {}'.format(method)
+                )
+        
+        replicas = (fitted[:,None,:] + noise).reshape(-1, n_points)
+        p, pcov, success = self.levenberg_marquardt_batch(
+            np.repeat(x, n_replicas, axis=0),
+            replicas,
+            np.repeat(weights, n_replicas, axis=0),
+            np.repeat(popt, n_replicas, axis=0)
+            )
+        p[~success] = np.nan
+        
+        return p.reshape(n_sets, n_replicas, n_params)
+    
+    def confidence_intervals(self, replicas, level=0.95):
+        """
+        Percentile confidence intervals from the output of
+        .bootstrap_batch().
+        
+        Returns:
+            (datasets, parameters, 2) np.ndarray with the lower and
+            upper bounds, nan where all the replicas failed.
+        """
+        tail = (1 - level) / 2 * 100
+        
+        # all-nan slices warn and give nan, as wanted
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', RuntimeWarning)
+            bounds = np.nanpercentile(replicas, [tail, 100 - tail], axis=1)
+        
+        return np.moveaxis(bounds, 0, -1)
+    
+    def confidence_header(self):
+        """Fit table columns of the confidence intervals."""
+        return ''.join(
+            ',{0}_ci_low,{0}_ci_high'.format(name)
+            for name in self.param_names
+            )
+    
+    def confidence_row(self, intervals=None):
+        """
+        Fit table values of the confidence intervals of a dataset,
+        empty when <intervals> is None.
+        """
+        if intervals is None:
+            return ',,' * len(self.param_names)
+        
+        return ''.join(
+            ',{},{}'.format(low, high) for low, high in intervals
+            )
+    
+    def least_squares_global(self, x, y, weights, p0, shared_index):
+        """
+        Least squares fit of all the datasets together to .equation(),
+        with the parameter <shared_index> common to all datasets and the
+        other parameters fit for each dataset.
+        
+        The Jacobian is a sparse matrix with one column for the shared
+        parameter and a block of columns per dataset, so that the cost
+        grows linearly with the number of datasets.
+        
+        Parameters:
+            x, y, weights, p0: as in .levenberg_marquardt_batch(),
+                the starting value of the shared parameter is the median
+                of its values in <p0>.
+            
+            shared_index (int): index of the shared parameter.
+        
+        Returns:
+            popt (np.ndarray): (datasets, parameters) fitted parameters,
+                equal for the shared parameter.
+            
+            pcov (np.ndarray): (datasets, parameters, parameters)
+                covariance of each dataset parameters given the others.
+            
+            success (np.ndarray): (datasets,) boolean, the same for all.
+        """
+        n_sets, n_params = p0.shape
+        local = [k for k in range(n_params) if k != shared_index]
+        valid = weights > 0
+        rows_set = np.nonzero(valid)[0]
+        n_rows = rows_set.size
+        
+        def unpacks(theta):
+            p = np.empty((n_sets, n_params))
+            p[:,shared_index] = theta[0]
+            p[:,local] = theta[1:].reshape(n_sets, len(local))
+            return p
+        
+        def residuals(theta):
+            p = unpacks(theta)
+            return (weights * (self.evaluate_batch(x, p) - y))[valid]
+        
+        # each row depends on the shared column and on the block of
+        # columns of its dataset
+        indices = np.concatenate(
+            [
+                np.zeros((n_rows, 1), dtype=int),
+                1 + rows_set[:,None] * len(local) + np.arange(len(local))
+                ],
+            axis=1
+            ).ravel()
+        indptr = np.arange(n_rows + 1) * n_params
+        
+        def jacobian(theta):
+            jac = self._weighted_jacobian(x, unpacks(theta), weights)[valid]
+            return sparse.csr_matrix(
+                (jac[:,[shared_index] + local].ravel(), indices, indptr),
+                shape=(n_rows, 1 + n_sets * len(local))
+                )
+        
+        theta0 = np.concatenate(
+            [[np.median(p0[:,shared_index])], p0[:,local].ravel()]
+            )
+        
+        with np.errstate(all='ignore'):
+            try:
+                result = sciopt.least_squares(
+                    residuals,
+                    theta0,
+                    jac=jacobian,
+                    method='trf',
+                    tr_solver='lsmr',
+                    x_scale='jac'
+                    )
+            
+            except ValueError:
+                # raised when the starting point is not finite
+                failed = np.zeros(n_sets, dtype=bool)
+                return np.array(p0, dtype=float), \
+                    np.full((n_sets, n_params, n_params), np.inf), failed
+            
+            popt = unpacks(result.x)
+            fitted = weights * (y - self.evaluate_batch(x, popt))
+            cost = np.sum(np.where(valid, fitted, 0.)**2, axis=1)
+        
+        success = np.full(
+            n_sets,
+            result.success and np.isfinite(popt).all()
+            )
+        pcov = self._covariance_batch(x, popt, weights, cost)
+        
+        return popt, pcov, success
+    
+    def _weighted_jacobian(self, x, p, weights):
+        """Jacobian with padded points set to 0."""
+        return np.where(
+            weights[:,:,None] > 0,
+            weights[:,:,None] * self.jacobian_batch(x, p),
+            0.
+            )
+    
+    def _covariance_batch(self, x, p, weights, cost):
+        """
+        Estimated covariance of the fitted parameters, as in
+        scipy.optimize.curve_fit with absolute_sigma=False.
+        """
+        n_params = p.shape[1]
+        pcov = np.full((p.shape[0], n_params, n_params), np.inf)
+        dof = weights.sum(axis=1) - n_params
+        
+        with np.errstate(all='ignore'):
+            jac = self._weighted_jacobian(x, p, weights)
+            jtj = np.einsum('ijk,ijl->ikl', jac, jac)
+        
+        ok = np.flatnonzero((dof > 0) & np.isfinite(jtj).all(axis=(1,2)))
+        
+        try:
+            pcov[ok] = np.linalg.inv(jtj[ok]) \
+                * (cost[ok] / dof[ok])[:,None,None]
+        
+        except np.linalg.LinAlgError:
+            # some matrices are singular, inverts one by one
+            for i in ok:
+                try:
+                    pcov[i] = np.linalg.inv(jtj[i]) * cost[i] / dof[i]
+                
+                except np.linalg.LinAlgError:
+                    continue
+        
+        return pcov
 
@@ -0,0 +1,137 @@
+"""
+Copyright © 2017-2018 Farseer-NMR
+João M.C. Teixeira and Simon P. Skinner
+
+@ResearchGate https://goo.gl/z8dPJU
+@Twitter https://twitter.com/farseer_nmr
+
+This file is part of Farseer-NMR.
+
+Farseer-NMR is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Farseer-NMR is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Farseer-NMR. If not, see <http://www.gnu.org/licenses/>.
+"""
+import os
+import hashlib
+import threading
+import pandas as pd
+
+import core.fslibs.Logger as Logger
+
+# increase when the parsing of input files in FarseerCube changes,
+# entries created by other parser versions are ignored.
+parser_version = '1'
+
+class PeaklistCache:
+    """
+    Persistent cache of parsed input files.
+    
+    Entries are keyed by the content of the input file, the parser
+    version and the pandas version, so that a modified file or
+    a new parser never reads outdated entries. Entries are stored
+    as pickle files in <cache_path>.
+    
+    Attributes:
+        cache_path (str): the folder where entries are stored.
+        
+        hits (int): number of entries loaded.
+        
+        misses (int): number of entries not found.
+    
+    Entries can be loaded and saved from several threads.
+    """
+    
+    def __init__(self, cache_path):
+        """
+        Parameters:
+            cache_path (str): the cache folder, created if missing.
+        """
+        self.logger = Logger.FarseerLogger(__name__).setup_log()
+        self.logger.debug('logger initiated')
+        
+        self.cache_path = cache_path
+        self.hits = 0
+        self.misses = 0
+        # guards the counters, updated from the loading threads
+        self._lock = threading.Lock()
+        
+        if not(os.path.exists(self.cache_path)):
+            os.makedirs(self.cache_path)
+    
+    def file_key(self, file_path, *extra):
+        """
+        Generates the key of an input file.
+        
+        Parameters:
+            file_path (str): path to the input file.
+            
+            extra (str): additional parsing options that change the
+                parsed result, for example, the FASTA start number.
+        
+        Returns:
+            The hexadecimal sha1 key.
+        """
+        sha = hashlib.sha1()
+        
+        with open(file_path, 'rb') as input_file:
+            sha.update(input_file.read())
+        
+        for item in (parser_version, pd.__version__) + extra:
+            sha.update(str(item).encode('utf-8'))
+        
+        return sha.hexdigest()
+    
+    def _entry_path(self, key):
+        return os.path.join(self.cache_path, '{}.pkl'.format(key))
+    
+    def load(self, key):
+        """
+        Returns the entry stored under <key>, None if there is no entry
+        or it can not be read.
+        """
+        entry_path = self._entry_path(key)
+        
+        if not(os.path.exists(entry_path)):
+            self._counts(hit=False)
+            return None
+        
+        try:
+            entry = pd.read_pickle(entry_path)
+        
+        except Exception as err:
+            self.logger.debug('Cache entry {} not read: {}'.format(key, err))
+            self._counts(hit=False)
+            return None
+        
+        self._counts(hit=True)
+        
+        return entry
+    
+    def _counts(self, hit):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+        
+        return None
+    
+    def save(self, key, entry):
+        """Stores <entry> under <key>."""
+        
+        # writes to a temporary file first so that an interrupted run
+        # never leaves a corrupted entry.
+        tmp_path = self._entry_path(key) + '.tmp'
+        pd.to_pickle(entry, tmp_path)
+        os.replace(tmp_path, self._entry_path(key))
+        
+        return None
@@ -0,0 +1,79 @@
+"""
+Copyright © 2017-2018 Farseer-NMR
+João M.C. Teixeira and Simon P. Skinner
+@ResearchGate https://goo.gl/z8dPJU
+@Twitter https://twitter.com/farseer_nmr
+This file is part of Farseer-NMR.
+Farseer-NMR is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+Farseer-NMR is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU General Public License for more details.
+You should have received a copy of the GNU General Public License
+along with Farseer-NMR. If not, see <http://www.gnu.org/licenses/>.
+"""
+from abc import ABCMeta, abstractmethod
+
+class RestraintBase(metaclass=ABCMeta):
+    """
+    Restraint calculation base class.
+    
+    To implement a new restraint create a class that inherits
+    RestraintBase, lists the columns it reads in .input_columns,
+    defines its vectorized .kernel() and, in .from_config(), the
+    calculations activated by the user settings. Registered restraints,
+    see restraint_functions, are calculated without further changes.
+    
+    Attributes:
+        calccol (str): the column where the restraint is stored.
+        
+        input_columns (tuple): the series columns the kernel reads, each
+            given to the kernel as a float array of shape
+            (series, items, residues). Can be columns calculated by
+            restraints that run before.
+    """
+    
+    def __init__(self, calccol, input_columns):
+        self.calccol = calccol
+        self.input_columns = tuple(input_columns)
+    
+    @abstractmethod
+    def kernel(self, series, *columns):
+        """
+        Calculates the restraint for all the items and residues at once.
+        
+        Parameters:
+            series (SeriesBatch): the series being calculated, gives
+                access to series attributes such as .cs_missing,
+                see FarseerSeries.SeriesBatch.
+            
+            columns (np.ndarray): the (series, items, residues) float
+                arrays of each column in .input_columns, item 0 is the
+                reference experiment.
+        
+        Returns:
+            (series, items, residues) float array.
+        """
+        pass
+    
+    @classmethod
+    @abstractmethod
+    def from_config(cls, fsuv):
+        """
+        Creates the calculations of this restraint activated in the
+        user settings.
+        
+        Parameters:
+            fsuv (dict): the Farseer-NMR user settings.
+        
+        Returns:
+            List of instances, empty if none is activated.
+        """
+        pass
+    
+    def log_calculated(self):
+        """Text logged when the restraint is calculated."""
+        return '**Calculated** {}'.format(self.calccol)
@@ -28,11 +28,30 @@ class HillEquation(FittingBase):
     https://en.wikipedia.org/wiki/Hill_equation_(biochemistry)
     http://www.physiologyweb.com/calculators/hill_equation_interactive_graph.html
     """
-
+    
+    param_names = ('ymax', 'n', 'kd')
+    reference_parameters = (1., 1.2, 1.5)
+    
     def equation(self, L0, Vmax, n, kd):
         """The Hill Equation."""
         return (Vmax*L0**n)/(kd**n+L0**n)
-
+    
+    def jacobian(self, L0, Vmax, n, kd):
+        """
+        Derivatives of the Hill Equation with respect to Vmax, n and kd.
+        """
+        L0 = np.asarray(L0, dtype=float)
+        L0n = L0**n
+        jac = np.empty(L0n.shape + (3,))
+        jac[...,0] = d_vmax = L0n/(kd**n + L0n)
+        # Vmax*L0**n*kd**n/(kd**n + L0**n)**2
+        common = Vmax*d_vmax*(1 - d_vmax)
+        # L0 = 0 contributes 0, log(kd/kd)
+        jac[...,1] = common*np.log(np.where(L0 > 0, L0, kd)/kd)
+        jac[...,2] = -common*n/kd
+        
+        return jac
+    
     def log_okay(self, res, x, y, popt, pcov):
         s2w = \
 """
@@ -56,73 +75,212 @@ pcov: {}
                 popt,
                 pcov
                 )
-
+        
         return s2w
-
-    def results(self, res, popt, yhalf, status='okay'):
+    
+    def results(self, res, popt, status='okay'):
         if status == 'okay':
             row = "{},{},{},{},{},{}\n".format(
                 res,
                 status,
                 popt[0],
-                yhalf,
+                popt[0]/2,
                 popt[2],
                 popt[1]
                 )
-
+            
             return row
-
+        
         else:
             return "{},{},,,,,\n".format(res,status)
-
-    def txt_plot(self, popt, yhalf):
+    
+    def txt_plot(self, popt):
         s2w = \
 """ymax: {:.3f}
 yhalf: {:.3f}
 K0.5: {:.3f}
 n: {:.3f}""".\
-            format(popt[0],yhalf,popt[2],popt[1])
-
+            format(popt[0],popt[0]/2,popt[2],popt[1])
+        
         return s2w
-
+    
     def results_header(self):
         return "#res,fit,ymax,yhalf,kd,n\n"
-
+    
     def fit_log_header(self, col):
         """Library with the different headers for the implemented functions."""
-
+        
         s2w = \
 """# fitting for parameter: '{}'
 #fit performed: Hill Equation
 #(Vmax*[S]**n)/(K0.5**n+[S]**n)
 """. \
                 format(col)
-
+        
         return s2w
+    
+    def initial_guess(self, x, y):
+        """Default starting parameters of the fit."""
+        return [np.max(y), 1, np.median(x)]
+    
+    def fit_data(self, x, y, res, p0=None):
+        """
+        Workflow for fitting data with the Hill Equation.
 
-    def fit_data(self, x, y, res, xfit):
-        """Workflow for fitting data with the Hill Equation."""
-
-        p_guess = [np.max(y), 1, np.median(x)]
-
+        <p0> overrides the default starting parameters.
+        """
+        
+        if p0 is None:
+            p_guess = self.initial_guess(x, y)
+        else:
+            p_guess = p0
+        
         try:
-            popt, pcov = sciopt.curve_fit(self.equation, x, y, p0=p_guess)
-
+            popt, pcov = sciopt.curve_fit(
+                self.equation,
+                x,
+                y,
+                p0=p_guess,
+                jac=self.jacobian
+                )
+        
         except:
             print("*** Fit residue {} - Failed!".format(res))
-            a = self.fit_failed(res, x, y)
-            b = self.results(res, None, None, status='failed')
-            c = "fit failed"
-            d = False
-            e = None
-            return a, b, c, d, e
-
-        yhalf = popt[0]/2
+            return False, None, None
+        
         print("*** Fit residue {} - OK!".format(res))
-        a = self.log_okay(res, x, y, popt, pcov)
-        b = self.results(res, popt, yhalf)
-        c = self.txt_plot(popt, yhalf)
-        d = True
-        e = self.equation(xfit, popt[0], popt[1], popt[2])
+        
+        return True, popt, pcov
+    
+    def fit_data_batch(self, datasets, p0s=None):
+        """
+        Workflow for fitting several datasets with the Hill Equation
+        at once, see FittingBase.levenberg_marquardt_batch().
+        """
+        
+        if not(datasets):
+            return []
+        
+        x, y, weights = self.pads_datasets(datasets)
+        popts, pcovs, success = self.levenberg_marquardt_batch(
+            x,
+            y,
+            weights,
+            self._initial_guesses(datasets, p0s)
+            )
+        
+        return self._fit_outputs(datasets, popts, pcovs, success)
 
-        return a, b, c, d, e
\ No newline at end of file
+
+if __name__ == "__main__":
+    # Benchmarks the fits with the analytic Jacobian against
+    # finite differences on synthetic titrations.
+    import time
+    import warnings
+    
+    class CountingHill(HillEquation):
+        """Counts the evaluations of the equation and Jacobian."""
+        
+        def __init__(self, analytic):
+            self.n_equation = 0
+            self.n_jacobian = 0
+            
+            if not(analytic):
+                # falls back to finite differences
+                self.jacobian = None
+        
+        def equation(self, *args):
+            self.n_equation += 1
+            return super().equation(*args)
+        
+        def jacobian(self, *args):
+            self.n_jacobian += 1
+            return super().jacobian(*args)
+    
+    def report(analytic, mode, seconds, n_okay, nfev, niter, hill):
+        print(
+            '{:<9} jacobian, {:<11}: {:.3f} s, {} fits okay, '
+            '{:.1f} evaluations per residue, {} iterations, '
+            '{} equation and {} jacobian calls'.format(
+                'analytic' if analytic else 'numerical',
+                mode,
+                seconds,
+                n_okay,
+                nfev,
+                niter,
+                hill.n_equation,
+                hill.n_jacobian
+                )
+            )
+    
+    rand = np.random.RandomState(0)
+    x = np.array([0, 0.25, 0.5, 1, 2, 4, 8.])
+    datasets = []
+    
+    for res in range(500):
+        y = HillEquation().equation(
+            x,
+            rand.uniform(0.1, 1),
+            rand.uniform(0.7, 2),
+            rand.uniform(0.5, 3)
+            )
+        datasets.append((x, y + rand.normal(0, 0.01, x.size), res))
+    
+    p_guess = [HillEquation().initial_guess(x, y) for x, y, res in datasets]
+    
+    def fit_per_residue(hill):
+        """
+        Fits each residue with scipy.optimize.leastsq, the solver of
+        scipy.optimize.curve_fit, which reports the evaluations only
+        since scipy 1.9.
+        """
+        n_okay = 0
+        nfev = []
+        
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            
+            for (x, y, res), p0 in zip(datasets, p_guess):
+                if hill.jacobian is None:
+                    dfun = None
+                
+                else:
+                    dfun = lambda p: hill.jacobian(x, *p)
+                
+                popt, pcov, infodict, mesg, ier = sciopt.leastsq(
+                    lambda p: hill.equation(x, *p) - y,
+                    p0,
+                    Dfun=dfun,
+                    full_output=True
+                    )
+                nfev.append(infodict['nfev'])
+                # curve_fit raises RuntimeError for other codes
+                n_okay += ier in (1, 2, 3, 4)
+        
+        # residues are fit one after the other, so the iterations add up
+        return n_okay, np.mean(nfev), np.sum(nfev)
+    
+    def fit_batch(hill):
+        """Fits all residues at once."""
+        popt, pcov, success, infodict = hill.levenberg_marquardt_batch(
+            np.array([x for x, y, res in datasets]),
+            np.array([y for x, y, res in datasets]),
+            np.ones((len(datasets), x.size)),
+            np.array(p_guess),
+            full_output=True
+            )
+        
+        return success.sum(), infodict['nfev'].mean(), infodict['niter']
+    
+    for analytic in (False, True):
+        for mode, fit in (('per residue', fit_per_residue), ('batch', fit_batch)):
+            # best of 3 runs
+            times = []
+            
+            for repeat in range(3):
+                hill = CountingHill(analytic)
+                start = time.time()
+                n_okay, nfev, niter = fit(hill)
+                times.append(time.time() - start)
+            
+            report(analytic, mode, min(times), n_okay, nfev, niter, hill)
@@ -1 +1,73 @@
+import time
+
+import numpy as np
+
 from core.fslibs.fitting_functions.HillEquation import HillEquation as hill
+
+# registry of the available fitting functions, add new fitting
+# functions here. Models are validated once, when imported.
+models = {
+    'hill': hill
+    }
+
+for _model in models.values():
+    _model.validates_model()
+
+
+def benchmark_models(names=None, n_residues=500, repeats=3, seed=0):
+    """
+    Times the fitting functions on synthetic titrations, so that new
+    models can be compared with the existing ones.
+    
+    Titrations are generated around the .reference_parameters of each
+    model, with parameters varying up to 50% and gaussian noise, and
+    all fitted at once with .levenberg_marquardt_batch().
+    
+    Parameters:
+        names (list, optional): the models to time, defaults to all the
+            models in the registry.
+        
+        n_residues (int): number of synthetic titrations.
+        
+        repeats (int): number of runs, the fastest is reported.
+        
+        seed (int): seed of the synthetic data.
+    
+    Returns:
+        dict {name: dict} with the seconds of the fastest 'equation',
+        'jacobian' and 'fit' runs, and the number of 'fits_okay'.
+    """
+    timings = {}
+    
+    for name in names or sorted(models):
+        model = models[name]()
+        random_state = np.random.RandomState(seed)
+        reference = np.array(model.reference_parameters, dtype=float)
+        x = np.tile([0, 0.25, 0.5, 1, 2, 4, 8.], (n_residues, 1))
+        p = reference \
+            * random_state.uniform(0.5, 1.5, (n_residues, reference.size))
+        y = model.evaluate_batch(x, p)
+        y += random_state.normal(0, 0.01 * np.abs(y).max(), y.shape)
+        weights = np.ones_like(x)
+        p0 = np.tile(reference, (n_residues, 1))
+        
+        runs = {
+            'equation': lambda: model.evaluate_batch(x, p),
+            'jacobian': lambda: model.jacobian_batch(x, p),
+            'fit': lambda: model.levenberg_marquardt_batch(x, y, weights, p0)
+            }
+        timings[name] = {}
+        
+        for run_name, run in runs.items():
+            seconds = []
+            
+            for repeat in range(repeats):
+                start = time.time()
+                output = run()
+                seconds.append(time.time() - start)
+            
+            timings[name][run_name] = min(seconds)
+        
+        timings[name]['fits_okay'] = int(output[2].sum())
+    
+    return timings
@@ -0,0 +1,117 @@
+"""
+Copyright © 2017-2018 Farseer-NMR
+João M.C. Teixeira and Simon P. Skinner
+
+@ResearchGate https://goo.gl/z8dPJU
+@Twitter https://twitter.com/farseer_nmr
+
+This file is part of Farseer-NMR.
+
+Farseer-NMR is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Farseer-NMR is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Farseer-NMR. If not, see <http://www.gnu.org/licenses/>.
+"""
+"""
+Policies that set the calculated values of missing peaks along a series.
+
+A policy is a function that receives:
+    values (np.ndarray): float array of shape (..., items, residues)
+        with the calculated values along the series, item 0 is the
+        reference experiment. Leading dimensions stack several series.
+    
+    missing (np.ndarray): boolean array with the same shape as <values>,
+        True where the peak is missing.
+
+and returns the modified values array. Policies operate on the whole
+series at once and are registered with the @register decorator under
+the name used in the csp_settings["cs_missing"] configuration:
+    
+    @register('mean')
+    def fill_mean(values, missing):
+        ...
+"""
+import numpy as np
+
+policies = {}
+
+def register(name):
+    """
+    Registers the decorated function as the missing peaks policy <name>.
+    """
+    def decorator(func):
+        policies[name] = func
+        return func
+    
+    return decorator
+
+def apply_policy(name, values, missing):
+    """
+    Applies the missing peaks policy <name>.
+    
+    Parameters:
+        name (str): the registered policy name, unknown names leave
+            <values> unchanged.
+        
+        values (np.ndarray): (..., items, residues) float array.
+        
+        missing (np.ndarray): boolean mask with the shape of <values>.
+    
+    Returns:
+        The (..., items, residues) array with the policy applied.
+    """
+    policy = policies.get(name)
+    
+    if policy is None:
+        return values
+    
+    return policy(values, missing)
+
+@register('prev')
+def fill_previous(values, missing):
+    """
+    Missing peaks take the value of the previous experiment
+    (forward-fill along the items axis). The reference is never changed.
+    """
+    stacked = values.reshape((-1,) + values.shape[-2:])
+    items = np.arange(values.shape[-2])[:,None]
+    source = np.where(missing, 0, items).reshape(stacked.shape)
+    source[:,0] = 0
+    # the last not missing item up to each position
+    source = np.maximum.accumulate(source, axis=1)
+    
+    filled = stacked[
+        np.arange(stacked.shape[0])[:,None,None],
+        source,
+        np.arange(stacked.shape[2])
+        ]
+    
+    return filled.reshape(values.shape)
+
+@register('zero')
+def fill_zero(values, missing):
+    """
+    Missing peaks are set to zero. The reference is never changed.
+    """
+    values = values.copy()
+    values[...,1:,:][missing[...,1:,:]] = 0.
+    
+    return values
+
+@register('full')
+def fill_full(values, missing):
+    """
+    Missing peaks are set to 1, which plots as a full bar.
+    """
+    values = values.copy()
+    values[missing] = 1.
+    
+    return values
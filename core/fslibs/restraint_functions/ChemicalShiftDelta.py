@@ -0,0 +1,55 @@
+"""
+Copyright © 2017-2018 Farseer-NMR
+João M.C. Teixeira and Simon P. Skinner
+@ResearchGate https://goo.gl/z8dPJU
+@Twitter https://twitter.com/farseer_nmr
+This file is part of Farseer-NMR.
+Farseer-NMR is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+Farseer-NMR is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU General Public License for more details.
+You should have received a copy of the GNU General Public License
+along with Farseer-NMR. If not, see <http://www.gnu.org/licenses/>.
+"""
+from core.fslibs.RestraintBase import RestraintBase
+import core.fslibs.missing_policies as mp
+
+
+class ChemicalShiftDelta(RestraintBase):
+    """
+    Difference of a chemical shift column to the reference experiment.
+    
+    Missing peaks are set according to the series .cs_missing policy,
+    see core.fslibs.missing_policies.
+    """
+    
+    def __init__(self, calccol, sourcecol):
+        super().__init__(calccol, [sourcecol])
+    
+    @classmethod
+    def from_config(cls, fsuv):
+        # the differences are also needed to calculate CSPs
+        calcs_csp = fsuv["csp_settings"]["calcs_CSP"]
+        restraints = []
+        
+        for dim in ('F1', 'F2'):
+            settings = fsuv["Pos{}_settings".format(dim)]
+            
+            if calcs_csp or settings["calcs_Pos{}_delta".format(dim)]:
+                restraints.append(cls(
+                    settings["calccol_name_Pos{}_delta".format(dim)],
+                    'Position {}'.format(dim)
+                    ))
+        
+        return restraints
+    
+    def kernel(self, series, source):
+        return mp.apply_policy(
+            series.cs_missing,
+            source - source[...,:1,:],
+            series.peak_status_mask('missing')
+            )
@@ -0,0 +1,58 @@
+"""
+Copyright © 2017-2018 Farseer-NMR
+João M.C. Teixeira and Simon P. Skinner
+@ResearchGate https://goo.gl/z8dPJU
+@Twitter https://twitter.com/farseer_nmr
+This file is part of Farseer-NMR.
+Farseer-NMR is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+Farseer-NMR is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU General Public License for more details.
+You should have received a copy of the GNU General Public License
+along with Farseer-NMR. If not, see <http://www.gnu.org/licenses/>.
+"""
+import numpy as np
+from core.fslibs.RestraintBase import RestraintBase
+
+
+class ChemicalShiftPerturbation(RestraintBase):
+    """
+    Combined Chemical Shift Perturbation (CSP) from the chemical shift
+    differences of both dimensions.
+    
+    np.sqrt(0.5*(H1**2 + (alpha*N15)**2))
+    
+    where the proportional normalization factor (alpha) of the 15N
+    dimension is set for each residue type, by default to 0.2 for
+    Glycine and 0.14 for all the other residues, see
+    FarseerSeries.csp_alpha4res. Missing values and residue types
+    without alpha give NaN.
+    
+    Williamson, M. P. Using chemical shift perturbation to
+    characterise ligand binding. Prog. Nuc. Magn. Res. Spect.
+    73, 1–16 (2013). SEE CORRIGENDUM
+    """
+    
+    def __init__(self, calccol, pos1, pos2):
+        super().__init__(calccol, [pos1, pos2])
+    
+    @classmethod
+    def from_config(cls, fsuv):
+        
+        if not(fsuv["csp_settings"]["calcs_CSP"]):
+            return []
+        
+        return [cls(
+            fsuv["csp_settings"]["calccol_name_CSP"],
+            fsuv["PosF1_settings"]["calccol_name_PosF1_delta"],
+            fsuv["PosF2_settings"]["calccol_name_PosF2_delta"]
+            )]
+    
+    def kernel(self, series, d1, d2):
+        alpha = series.csp_alpha()
+        
+        return np.sqrt(0.5*(d1**2+(alpha*d2)**2))
@@ -0,0 +1,48 @@
+"""
+Copyright © 2017-2018 Farseer-NMR
+João M.C. Teixeira and Simon P. Skinner
+@ResearchGate https://goo.gl/z8dPJU
+@Twitter https://twitter.com/farseer_nmr
+This file is part of Farseer-NMR.
+Farseer-NMR is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+Farseer-NMR is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU General Public License for more details.
+You should have received a copy of the GNU General Public License
+along with Farseer-NMR. If not, see <http://www.gnu.org/licenses/>.
+"""
+import numpy as np
+from core.fslibs.RestraintBase import RestraintBase
+
+
+class Ratio(RestraintBase):
+    """
+    Ratio of a column to the reference experiment, for example,
+    Height or Volume ratios.
+    """
+    
+    def __init__(self, calccol, sourcecol):
+        super().__init__(calccol, [sourcecol])
+    
+    @classmethod
+    def from_config(cls, fsuv):
+        restraints = []
+        
+        for sourcecol in ('Height', 'Volume'):
+            settings = fsuv["{}_ratio_settings".format(sourcecol)]
+            
+            if settings["calcs_{}_ratio".format(sourcecol)]:
+                restraints.append(cls(
+                    settings["calccol_name_{}_ratio".format(sourcecol)],
+                    sourcecol
+                    ))
+        
+        return restraints
+    
+    def kernel(self, series, source):
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return source / source[...,:1,:]
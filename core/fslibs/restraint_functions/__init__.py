@@ -0,0 +1,29 @@
+from collections import OrderedDict
+
+from core.fslibs.restraint_functions.ChemicalShiftDelta import ChemicalShiftDelta as cs_delta
+from core.fslibs.restraint_functions.ChemicalShiftPerturbation import ChemicalShiftPerturbation as csp
+from core.fslibs.restraint_functions.Ratio import Ratio as ratio
+
+# registry of the available restraint calculations, add new
+# restraints here. Restraints are calculated in this order, so a
+# restraint can read the columns of the ones above.
+restraints = OrderedDict([
+    ('cs_delta', cs_delta),
+    ('csp', csp),
+    ('ratio', ratio)
+    ])
+
+def enabled_restraints(fsuv):
+    """
+    Creates the restraint calculations activated in the user settings
+    <fsuv>, see RestraintBase.from_config().
+    
+    Returns:
+        List of RestraintBase instances in calculation order.
+    """
+    enabled = []
+    
+    for restraint in restraints.values():
+        enabled.extend(restraint.from_config(fsuv))
+    
+    return enabled
@@ -0,0 +1,205 @@
+"""
+Copyright © 2017-2018 Farseer-NMR
+João M.C. Teixeira and Simon P. Skinner
+
+@ResearchGate https://goo.gl/z8dPJU
+@Twitter https://twitter.com/farseer_nmr
+
+This file is part of Farseer-NMR.
+
+Farseer-NMR is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Farseer-NMR is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Farseer-NMR. If not, see <http://www.gnu.org/licenses/>.
+"""
+import os
+import unittest
+import tempfile
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pandas as pd
+
+import core.fslibs.PeaklistCache as plc
+import core.fslibs.FitCache as fc
+
+class Test_PeaklistCache(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.cache = plc.PeaklistCache(os.path.join(self.folder, 'cache'))
+        self.peaklist = os.path.join(self.folder, 'L0.csv')
+
+        with open(self.peaklist, 'w') as fout:
+            fout.write('Assign F1,Position F1\n1MetH,8.1\n')
+
+        self.entry = {
+            'backbone': pd.DataFrame({'Position F1': [8.1]}),
+            'sidechains': None,
+            'sd_count': 0
+            }
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def test_save_load(self):
+        key = self.cache.file_key(self.peaklist)
+
+        self.assertIsNone(self.cache.load(key))
+        self.cache.save(key, self.entry)
+        entry = self.cache.load(key)
+
+        pd.testing.assert_frame_equal(
+            entry['backbone'],
+            self.entry['backbone']
+            )
+        self.assertEqual((self.cache.hits, self.cache.misses), (1, 1))
+        # no temporary files are left
+        self.assertEqual(
+            os.listdir(self.cache.cache_path),
+            ['{}.pkl'.format(key)]
+            )
+
+    def test_key_changes_with_content(self):
+        key = self.cache.file_key(self.peaklist)
+        self.cache.save(key, self.entry)
+
+        with open(self.peaklist, 'a') as fout:
+            fout.write('2GluH,8.2\n')
+
+        new_key = self.cache.file_key(self.peaklist)
+
+        self.assertNotEqual(new_key, key)
+        self.assertIsNone(self.cache.load(new_key))
+
+    def test_key_changes_with_options_and_parser(self):
+        key = self.cache.file_key(self.peaklist)
+
+        self.assertEqual(self.cache.file_key(self.peaklist), key)
+        self.assertNotEqual(self.cache.file_key(self.peaklist, 10), key)
+
+        parser_version = plc.parser_version
+
+        try:
+            plc.parser_version = parser_version + '.test'
+            self.assertNotEqual(self.cache.file_key(self.peaklist), key)
+
+        finally:
+            plc.parser_version = parser_version
+
+    def test_corrupted_entry(self):
+        key = self.cache.file_key(self.peaklist)
+
+        with open(self.cache._entry_path(key), 'w') as fout:
+            fout.write('not a pickle')
+
+        self.assertIsNone(self.cache.load(key))
+        self.assertEqual(self.cache.misses, 1)
+
+    def test_counters_from_threads(self):
+        key = self.cache.file_key(self.peaklist)
+        self.cache.save(key, self.entry)
+        keys = [key, 'missing'] * 200
+
+        with ThreadPoolExecutor(8) as executor:
+            list(executor.map(self.cache.load, keys))
+
+        self.assertEqual((self.cache.hits, self.cache.misses), (200, 200))
+
+class Test_FitCache(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.cache = fc.FitCache(os.path.join(self.folder, 'cache'))
+        self.xdata = np.arange(5.)
+        self.ydata = np.arange(5.)**2
+        self.xfit = np.linspace(0., 4., 20)
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def test_table_key(self):
+        table_key = self.cache.table_key
+        key = table_key('series', 'H1_delta', 'hill')
+
+        self.assertEqual(table_key('series', 'H1_delta', 'hill'), key)
+        self.assertNotEqual(table_key('series', 'N15_delta', 'hill'), key)
+        self.assertNotEqual(table_key('series', 'H1_delta', 'linear'), key)
+        self.assertNotEqual(
+            table_key('series', 'H1_delta', 'hill', ('global', 'kd')),
+            key
+            )
+
+        fit_version = fc.fit_version
+
+        try:
+            fc.fit_version = fit_version + '.test'
+            self.assertNotEqual(
+                table_key('series', 'H1_delta', 'hill'),
+                key
+                )
+
+        finally:
+            fc.fit_version = fit_version
+
+    def test_data_key(self):
+        key = self.cache.data_key(self.xdata, self.ydata, self.xfit)
+        ydata = self.ydata.copy()
+        ydata[2] += 1e-9
+
+        self.assertEqual(
+            self.cache.data_key(list(self.xdata), self.ydata, self.xfit),
+            key
+            )
+        self.assertNotEqual(
+            self.cache.data_key(self.xdata, ydata, self.xfit),
+            key
+            )
+        self.assertNotEqual(
+            self.cache.data_key(self.xdata, self.ydata, self.xfit[:-1]),
+            key
+            )
+
+    def test_save_load_sidechains(self):
+        key = self.cache.table_key('series', 'H1_delta', 'hill')
+        data_key = self.cache.data_key(self.xdata, self.ydata, self.xfit)
+        entry = {
+            (20, 'a'): (data_key, (True, np.array([1., 2.]), None)),
+            (20, 'b'): (data_key, (True, np.array([3., 4.]), None))
+            }
+        self.cache.save(key, entry)
+        loaded = self.cache.load(key)
+
+        self.assertEqual(sorted(loaded), [(20, 'a'), (20, 'b')])
+        np.testing.assert_array_equal(loaded[(20, 'b')][1][1], [3., 4.])
+
+    def test_starting_parameters(self):
+        entry = {
+            (1, ''): ('k1', (True, np.array([1.]), None)),
+            (2, ''): ('k2', (False, np.array([2.]), None)),
+            (4, 'a'): ('k4a', (True, np.array([4.]), None)),
+            (4, ''): ('k4', (True, np.array([5.]), None))
+            }
+
+        # its own fit
+        self.assertEqual(self.cache.starting_parameters(entry, (1, '')), [1.])
+        # failed own fit, the nearest residue
+        self.assertEqual(self.cache.starting_parameters(entry, (2, '')), [1.])
+        # the nearest residue with the same ATOM
+        self.assertEqual(self.cache.starting_parameters(entry, (5, 'a')), [4.])
+        self.assertEqual(self.cache.starting_parameters(entry, (5, '')), [5.])
+
+    def test_starting_parameters_no_fits(self):
+        entry = {(1, ''): ('k1', (False, np.array([1.]), None))}
+
+        self.assertIsNone(self.cache.starting_parameters(entry, (1, '')))
+        self.assertIsNone(self.cache.starting_parameters({}, (1, '')))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,123 @@
+"""
+Copyright © 2017-2018 Farseer-NMR
+João M.C. Teixeira and Simon P. Skinner
+
+@ResearchGate https://goo.gl/z8dPJU
+@Twitter https://twitter.com/farseer_nmr
+
+This file is part of Farseer-NMR.
+
+Farseer-NMR is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Farseer-NMR is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Farseer-NMR. If not, see <http://www.gnu.org/licenses/>.
+"""
+import unittest
+import warnings
+import numpy as np
+
+from core.fslibs.FarseerSeries import convolve_extend, gaussian_kernel
+
+try:
+    from astropy.convolution import Gaussian1DKernel, convolve
+    has_astropy = True
+except ImportError:
+    has_astropy = False
+
+def convolve_loop(row, kernel):
+    """
+    astropy.convolution.convolve semantics with boundary='extend',
+    normalize_kernel=True and NaN interpolation, point by point.
+    """
+    half = kernel.size // 2
+    result = np.empty(row.size)
+
+    for i in range(row.size):
+        top = bot = 0.
+
+        for k, weight in enumerate(kernel):
+            value = row[min(max(i + k - half, 0), row.size - 1)]
+
+            if not(np.isnan(value)):
+                top += weight * value
+                bot += weight
+
+        result[i] = top / bot if bot > 0 else np.nan
+
+    return result
+
+class Test_Case(unittest.TestCase):
+    def setUp(self):
+        rand = np.random.RandomState(0)
+        self.values = np.abs(rand.normal(size=(4, 40)))
+        # isolated NaN, NaN at the edges and a NaN run longer than the kernel
+        self.values[0,10] = np.nan
+        self.values[1,0] = np.nan
+        self.values[2,-1] = np.nan
+        self.values[3,5:20] = np.nan
+
+    def test_gaussian_kernel(self):
+        kernel = gaussian_kernel(1., 7)
+
+        self.assertEqual(kernel.size, 7)
+        self.assertAlmostEqual(kernel.sum(), 1.)
+        np.testing.assert_allclose(kernel, kernel[::-1])
+        # cached kernels are shared, so they must not change
+        self.assertFalse(kernel.flags.writeable)
+        self.assertIs(gaussian_kernel(1., 7), kernel)
+
+    def test_gaussian_kernel_odd_size(self):
+        with self.assertRaises(ValueError):
+            gaussian_kernel(1., 6)
+
+    def test_convolve_as_loop(self):
+        for stddev, x_size in ((1., 7), (2., 11), (0.5, 3)):
+            kernel = gaussian_kernel(stddev, x_size)
+            result = convolve_extend(self.values, kernel)
+
+            for row, smoothed in zip(self.values, result):
+                np.testing.assert_allclose(
+                    smoothed,
+                    convolve_loop(row, kernel),
+                    equal_nan=True
+                    )
+
+    def test_all_nan_neighbours(self):
+        values = np.full((1, 9), np.nan)
+        values[0,0] = 1.
+        result = convolve_extend(values, gaussian_kernel(1., 3))
+
+        self.assertEqual(result[0,1], 1.)
+        self.assertTrue(np.isnan(result[0,4]))
+
+    @unittest.skipUnless(has_astropy, 'astropy is not installed')
+    def test_convolve_as_astropy(self):
+        for stddev, x_size in ((1., 7), (2., 11)):
+            gauss = Gaussian1DKernel(stddev, x_size=x_size)
+            kernel = gaussian_kernel(stddev, x_size)
+            np.testing.assert_allclose(kernel, gauss.array)
+            result = convolve_extend(self.values, kernel)
+
+            for row, smoothed in zip(self.values, result):
+                with warnings.catch_warnings():
+                    # astropy warns on NaN runs longer than the kernel
+                    warnings.simplefilter('ignore')
+                    expected = convolve(
+                        row,
+                        gauss,
+                        boundary='extend',
+                        normalize_kernel=True
+                        )
+
+                np.testing.assert_allclose(smoothed, expected, equal_nan=True)
+
+if __name__ == "__main__":
+    unittest.main()
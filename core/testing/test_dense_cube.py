@@ -0,0 +1,213 @@
+"""
+Copyright © 2017-2018 Farseer-NMR
+João M.C. Teixeira and Simon P. Skinner
+
+@ResearchGate https://goo.gl/z8dPJU
+@Twitter https://twitter.com/farseer_nmr
+
+This file is part of Farseer-NMR.
+
+Farseer-NMR is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Farseer-NMR is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Farseer-NMR. If not, see <http://www.gnu.org/licenses/>.
+"""
+import unittest
+import tempfile
+import shutil
+import numpy as np
+import pandas as pd
+
+from core.fslibs.DenseCube import DenseCube
+
+def peaklist(resnos, shift, status):
+    """A small peaklist with numeric and string columns."""
+    return pd.DataFrame(
+        {
+            'ResNo': resnos,
+            'Position F1': [8. + shift + 0.1*i for i in range(len(resnos))],
+            'Height': [1e5 * (i+1) for i in range(len(resnos))],
+            'Peak Status': status,
+            'Assign F1': ['{}AlaH'.format(r) for r in resnos]
+            },
+        columns=['ResNo', 'Position F1', 'Height', 'Peak Status', 'Assign F1'],
+        index=resnos
+        )
+
+class Test_Case(unittest.TestCase):
+    def setUp(self):
+        self.nested = {
+            z: {
+                y: {
+                    x: peaklist(
+                        [1, 2, 3] if x != 'L2' else [1, 3, 4],
+                        shift,
+                        ['measured', 'missing', 'unassigned']
+                        )
+                    for x, shift in (('L0', 0.), ('L1', 0.5), ('L2', 1.))
+                    }
+                for y in ('278K', '298K')
+                }
+            for z in ('apo', 'holo')
+            }
+        self.cube = DenseCube.from_nested_dict(self.nested)
+        self.folder = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def test_from_nested_dict_axes(self):
+        self.assertEqual(list(self.cube.cool), ['apo', 'holo'])
+        self.assertEqual(list(self.cube.labels), ['278K', '298K'])
+        self.assertEqual(list(self.cube.items), ['L0', 'L1', 'L2'])
+        # rows are aligned on the union of the peaklists rows
+        self.assertEqual(list(self.cube.major_axis), [1, 2, 3, 4])
+        self.assertEqual(self.cube.shape, (2, 2, 3, 4, 5))
+        # numeric columns go to the float block
+        self.assertEqual(
+            self.cube.num_cols,
+            ['ResNo', 'Position F1', 'Height']
+            )
+        self.assertEqual(self.cube.int_cols, ['ResNo'])
+        self.assertEqual(self.cube.str_cols, ['Peak Status', 'Assign F1'])
+
+    def test_from_nested_dict_values(self):
+        frame = self.cube.get_frame('holo', '298K', 'L2')
+        expected = self.nested['holo']['298K']['L2']
+
+        np.testing.assert_allclose(
+            frame.loc[[1, 3, 4], 'Position F1'].astype(float),
+            expected.loc[:,'Position F1']
+            )
+        self.assertEqual(
+            list(frame.loc[[1, 3, 4], 'Assign F1']),
+            list(expected.loc[:,'Assign F1'])
+            )
+        # rows missing in a peaklist are NaN
+        self.assertTrue(np.isnan(frame.loc[2, 'Height']))
+        self.assertTrue(pd.isnull(frame.loc[2, 'Assign F1']))
+
+    def test_integer_columns(self):
+        for x in ('L0', 'L1'):
+            df = self.nested['apo']['278K'][x]
+            df.loc[:,'Height'] = [100000, 200000, 300000]
+            df.loc[:,'Volume'] = [7, 8, 9]
+
+        cube = DenseCube.from_nested_dict(self.nested)
+
+        # whole numbers are stored in the float block and decoded as
+        # integers only if they are integers in all the peaklists
+        self.assertEqual(
+            cube.num_cols,
+            ['ResNo', 'Position F1', 'Height', 'Volume']
+            )
+        self.assertEqual(cube.int_cols, ['ResNo', 'Volume'])
+        self.assertEqual(cube.str_cols, ['Peak Status', 'Assign F1'])
+
+        frame = cube.get_frame('apo', '278K', 'L1')
+
+        self.assertEqual(list(frame.loc[[1, 2, 3],'Volume']), [7, 8, 9])
+        self.assertIsInstance(frame.loc[1,'Volume'], int)
+        self.assertTrue(pd.isnull(frame.loc[4,'Volume']))
+        self.assertEqual(frame.loc[2,'Height'], 200000.)
+
+        arr = cube.series_array('apo', '278K')
+        self.assertIsInstance(arr[0, 0, cube.minor_axis.get_loc('ResNo')], int)
+
+    def test_peak_status_codes(self):
+        # 'Peak Status' codes follow the fixed vocabulary
+        self.assertEqual(self.cube.encode('Peak Status', 'measured'), 0)
+        self.assertEqual(self.cube.encode('Peak Status', 'unassigned'), 2)
+        self.assertEqual(
+            list(self.cube.column_view('apo', '278K', 'Peak Status')[0]),
+            [0, 1, 2, -1]
+            )
+        self.assertEqual(
+            list(self.cube.notnull_mask('apo', '278K', 'Peak Status')[2]),
+            [True, False, True, True]
+            )
+
+    def test_numeric_columns_not_encoded(self):
+        df = self.nested['holo']['298K']['L0']
+        # numbers read as objects, as after concatenating peaklists
+        df['Position F1'] = df.loc[:,'Position F1'].astype(object)
+        df['Merit'] = pd.Series([1, 0.5, np.nan], index=df.index)
+        cube = DenseCube.from_nested_dict(self.nested)
+
+        self.assertEqual(
+            cube.num_cols,
+            ['ResNo', 'Position F1', 'Height', 'Merit']
+            )
+        # only the string columns have vocabularies
+        self.assertEqual(cube.str_cols, ['Peak Status', 'Assign F1'])
+        self.assertEqual(
+            sorted(cube.vocabularies),
+            ['Assign F1', 'Peak Status']
+            )
+        self.assertEqual(cube.codes.shape[-1], 2)
+
+    def test_transpose(self):
+        transposed = self.cube.transpose(2, 0, 1, 3, 4)
+
+        self.assertEqual(list(transposed.cool), ['L0', 'L1', 'L2'])
+        self.assertEqual(list(transposed.labels), ['apo', 'holo'])
+        self.assertEqual(list(transposed.items), ['278K', '298K'])
+        # blocks are views of the original cube
+        self.assertTrue(np.shares_memory(transposed.values, self.cube.values))
+
+        for z, y, x in (('apo', '278K', 'L0'), ('holo', '298K', 'L2')):
+            pd.testing.assert_frame_equal(
+                transposed.get_frame(x, z, y),
+                self.cube.get_frame(z, y, x)
+                )
+
+    def test_transpose_keeps_rows_and_columns(self):
+        with self.assertRaises(ValueError):
+            self.cube.transpose(0, 1, 3, 2, 4)
+
+    def test_series_array(self):
+        rows = np.array([True, False, True, True])
+        arr = self.cube.series_array('holo', '278K', rows=rows)
+
+        self.assertEqual(arr.shape, (3, 3, 5))
+        frame = self.cube.get_frame('holo', '278K', 'L1')
+
+        for i, row in enumerate([1, 3, 4]):
+            for j, col in enumerate(self.cube.minor_axis):
+                if pd.isnull(frame.loc[row, col]):
+                    self.assertTrue(pd.isnull(arr[1, i, j]))
+                else:
+                    self.assertEqual(arr[1, i, j], frame.loc[row, col])
+
+    def test_save_load_round_trip(self):
+        self.cube.save(self.folder)
+        loaded = DenseCube.load(self.folder)
+
+        self.assertEqual(loaded.shape, self.cube.shape)
+        self.assertEqual(loaded.num_cols, self.cube.num_cols)
+        self.assertEqual(list(loaded.major_axis), list(self.cube.major_axis))
+        np.testing.assert_array_equal(loaded.values, self.cube.values)
+        np.testing.assert_array_equal(loaded.codes, self.cube.codes)
+
+        for col, vocabulary in self.cube.vocabularies.items():
+            self.assertEqual(list(loaded.vocabularies[col]), list(vocabulary))
+
+        # blocks are loaded as read-only memory-maps
+        self.assertIsInstance(loaded.values, np.memmap)
+        self.assertFalse(loaded.values.flags.writeable)
+
+        pd.testing.assert_frame_equal(
+            loaded.get_frame('apo', '298K', 'L1'),
+            self.cube.get_frame('apo', '298K', 'L1')
+            )
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,663 @@
+"""
+Copyright © 2017-2018 Farseer-NMR
+João M.C. Teixeira and Simon P. Skinner
+
+@ResearchGate https://goo.gl/z8dPJU
+@Twitter https://twitter.com/farseer_nmr
+
+This file is part of Farseer-NMR.
+
+Farseer-NMR is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Farseer-NMR is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Farseer-NMR. If not, see <http://www.gnu.org/licenses/>.
+"""
+import os
+import json
+import types
+import unittest
+import tempfile
+import shutil
+import numpy as np
+import pandas as pd
+
+from core.utils import aal3tol1
+from core.fslibs.FarseerCube import FarseerCube
+from core.fslibs.FarseerSeries import FarseerSeries
+from core.farseermain import FarseerNMR
+
+def peaklist(assignments, shift):
+    """A small parsed peaklist with the given 'Assign F1' labels."""
+    return pd.DataFrame(
+        {
+            'Assign F1': assignments,
+            'Assign F2': [a[:-1] + 'N' if a.endswith('H') else a
+                for a in assignments],
+            'Position F1': [8. + shift + 0.01*i
+                for i in range(len(assignments))],
+            'Position F2': [120. + shift + 0.1*i
+                for i in range(len(assignments))],
+            'Height': [1e5 * (i+1) for i in range(len(assignments))],
+            'Volume': [1e6 * (i+1) for i in range(len(assignments))],
+            'Line Width F1 (Hz)': 20.,
+            'Line Width F2 (Hz)': 15.,
+            'Merit': 1.
+            },
+        columns=[
+            'Assign F1',
+            'Assign F2',
+            'Position F1',
+            'Position F2',
+            'Height',
+            'Volume',
+            'Line Width F1 (Hz)',
+            'Line Width F2 (Hz)',
+            'Merit'
+            ]
+        )
+
+def split_loop(pkl):
+    """
+    Splits one peaklist the way FarseerCube.split_res_info() did
+    before peaklists were stacked, the reference of the tests.
+    """
+    resInfo = pkl.loc[:,'Assign F1'].str.extract(r'(\d+)(.{3})', expand=True)
+    resInfo.columns = ['ResNo', '3-letter']
+    resInfo.loc[:,'ResNo'] = resInfo.loc[:,'ResNo'].astype(int)
+    resInfo.loc[:,'1-letter'] = resInfo.loc[:,"3-letter"].map(aal3tol1.get)
+    pkl = pd.concat([pkl, resInfo], axis=1)
+    pkl.loc[:,'Peak Status'] = 'measured'
+    sidechains_bool = pkl.loc[:,'Assign F1'].str.contains('[^HN]$')
+    sidechains = None
+
+    if any(sidechains_bool):
+        sidechains = pkl.loc[sidechains_bool,:].copy()
+        sidechains.loc[:,'ATOM'] = \
+            sidechains.loc[:,'Assign F1'].str.split('[HN]', expand=True).loc[:,1]
+        sidechains = sidechains.sort_values(by=['ResNo','ATOM']).reset_index()
+        pkl = pkl.loc[~sidechains_bool,:]
+
+    backbone = pkl.sort_values(by='ResNo', kind='mergesort').reset_index()
+
+    return backbone, sidechains, int(sidechains_bool.sum())
+
+def expand_loop(ref, target, index_cols, fillna):
+    """
+    Expands one peaklist the way FarseerCube.seq_expand() did before
+    peaklists were stacked, the reference of the tests.
+    """
+    expanded = target.set_index(index_cols).\
+        reindex(pd.MultiIndex.from_arrays(
+                [ref.loc[:,col].values for col in index_cols],
+                names=index_cols
+                )
+            if len(index_cols) > 1 else ref.loc[:,index_cols[0]]).\
+        reset_index().fillna(fillna)
+
+    for col in ['3-letter', '1-letter', 'Assign F1', 'Assign F2']:
+        expanded.loc[:,col] = ref.loc[:,col].values
+
+    return expanded
+
+def correct_shifts_loop(allpeaklists, zzcoords, yycoords, xxcoords, ref_res):
+    """
+    Chemical shift correction as FarseerCube.correct_shifts_backbone()
+    applied it experiment by experiment before the broadcast
+    correction, the reference of the tests.
+    """
+    ref_data = {}
+
+    for z in zzcoords:
+        for y in yycoords:
+            for x in xxcoords:
+                pkl = allpeaklists[z][y][x]
+                mask = pkl.loc[:,'ResNo'] == ref_res
+                dp_F1_cs = pkl.loc[mask,'Position F1']
+                dp_F2_cs = pkl.loc[mask,'Position F2']
+
+                if x == xxcoords[0]:
+                    ref_data['F1_cs'] = dp_F1_cs
+                    ref_data['F2_cs'] = dp_F2_cs
+
+                F1_cs_diff = float(dp_F1_cs) - float(ref_data['F1_cs'])
+                F2_cs_diff = float(dp_F2_cs) - float(ref_data['F2_cs'])
+                pkl.loc[:,'Position F1 original'] = pkl.loc[:,'Position F1']
+                pkl.loc[:,'Position F2 original'] = pkl.loc[:,'Position F2']
+                pkl.loc[:,'Pos F1 correction'] = F1_cs_diff
+                pkl.loc[:,'Pos F2 correction'] = F2_cs_diff
+                pkl.loc[:,'Position F1'] = pkl.loc[:,'Position F1'].sub(F1_cs_diff)
+                pkl.loc[:,'Position F2'] = pkl.loc[:,'Position F2'].sub(F2_cs_diff)
+
+    return allpeaklists
+
+def series_panel_loop(fscube, dp2, dp1):
+    """
+    Series panel as FarseerCube.export_series_dict_over_axis() built
+    it before the ResNo row mask, dropping the NaN ResNo rows of each
+    data point, the reference of the tests.
+    """
+    dfdict = {}
+
+    for item in fscube.items:
+        df = fscube.get_frame(dp2, dp1, item)
+        df.dropna(axis=0, how='any', subset=['ResNo'], inplace=True)
+        dfdict[item] = df
+
+    return pd.Panel.from_dict(dfdict)
+
+config_path = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    'default_config.json'
+    )
+
+class Test_Case(unittest.TestCase):
+    def setUp(self):
+        self.spectra = tempfile.mkdtemp()
+        self.cube = FarseerCube(self.spectra)
+        self.coords = [
+            ('apo', '298K', 'L0'),
+            ('apo', '298K', 'L1'),
+            ('holo', '298K', 'L0'),
+            ('holo', '298K', 'L1')
+            ]
+        self.peaklists = {
+            self.coords[0]: peaklist(
+                ['3AlaH', '1MetH', '20GlnHa', '2GluH', '20GlnHb'],
+                0.
+                ),
+            self.coords[1]: peaklist(['2GluH', '1MetH'], 0.1),
+            self.coords[2]: peaklist(['1MetH', '20GlnHb', '3AlaH'], 0.2),
+            self.coords[3]: peaklist(['3AlaH', '2GluH'], 0.3)
+            }
+        self.cube.allpeaklists = {}
+
+        for (z, y, x), pkl in self.peaklists.items():
+            self.cube.allpeaklists.setdefault(z, {}).setdefault(y, {})[x] = \
+                pkl.copy()
+
+    def tearDown(self):
+        shutil.rmtree(self.spectra)
+
+    def test_splits_assignments_as_loop(self):
+        split = self.cube._splits_assignments(self.coords)
+
+        for coord in self.coords:
+            backbone, sidechains, sd_count = split_loop(self.peaklists[coord])
+
+            pd.testing.assert_frame_equal(
+                split[coord]['backbone'],
+                backbone,
+                check_dtype=False
+                )
+            self.assertEqual(split[coord]['sd_count'], sd_count)
+
+            if sidechains is None:
+                self.assertIsNone(split[coord]['sidechains'])
+
+            else:
+                pd.testing.assert_frame_equal(
+                    split[coord]['sidechains'],
+                    sidechains,
+                    check_dtype=False
+                    )
+
+    def test_splits_assignments_residue_types(self):
+        split = self.cube._splits_assignments(self.coords)
+        backbone = split[self.coords[0]]['backbone']
+
+        self.assertEqual(list(backbone.loc[:,'ResNo']), [1, 2, 3])
+        self.assertEqual(list(backbone.loc[:,'1-letter']), ['M', 'E', 'A'])
+        self.assertEqual(
+            list(split[self.coords[0]]['sidechains'].loc[:,'ATOM']),
+            ['a', 'b']
+            )
+
+    def test_seq_expand_as_loop(self):
+        split = self.cube._splits_assignments(self.coords)
+        ref = split[self.coords[0]]
+        fillna = {'Peak Status': 'missing', 'Height': 0.}
+
+        for resonance_type, part, index_cols in (
+                ('Backbone', 'backbone', ['ResNo']),
+                ('Sidechains', 'sidechains', ['ResNo', 'ATOM'])):
+            targets = {
+                coord: split[coord][part] for coord in self.coords[1:]
+                if split[coord][part] is not None
+                }
+            refs = {coord: ref[part] for coord in targets}
+            expanded, lengths = self.cube.seq_expand(
+                targets,
+                refs,
+                resonance_type,
+                fillna
+                )
+
+            for coord in targets:
+                pd.testing.assert_frame_equal(
+                    expanded[coord],
+                    expand_loop(refs[coord], targets[coord], index_cols, fillna),
+                    check_dtype=False
+                    )
+                self.assertEqual(
+                    lengths[coord],
+                    [
+                        targets[coord].shape[0],
+                        refs[coord].shape[0],
+                        refs[coord].shape[0]
+                        ]
+                    )
+
+    def test_seq_expand_missing_rows(self):
+        split = self.cube._splits_assignments(self.coords)
+        coord = self.coords[1]
+        expanded, lengths = self.cube.seq_expand(
+            {coord: split[coord]['backbone']},
+            {coord: split[self.coords[0]]['backbone']},
+            'Backbone',
+            {'Peak Status': 'missing'}
+            )
+
+        self.assertEqual(list(expanded[coord].loc[:,'ResNo']), [1, 2, 3])
+        self.assertEqual(
+            list(expanded[coord].loc[:,'Peak Status']),
+            ['measured', 'measured', 'missing']
+            )
+        # residue information comes from the reference
+        self.assertEqual(expanded[coord].loc[2,'Assign F1'], '3AlaH')
+
+    def test_splits_assignments_integer_resno(self):
+        coord = self.coords[0]
+        self.cube.allpeaklists['apo']['298K']['L0'] = peaklist(
+            ['10AlaH', '9MetH', '100GlyH', '2GluH', '10GlnHb', '9GlnHa'],
+            0.
+            )
+        split = self.cube._splits_assignments([coord])
+        backbone = split[coord]['backbone']
+        sidechains = split[coord]['sidechains']
+
+        # sorted as numbers, '10' < '9' as strings
+        self.assertEqual(backbone.loc[:,'ResNo'].dtype.kind, 'i')
+        self.assertEqual(list(backbone.loc[:,'ResNo']), [2, 9, 10, 100])
+        self.assertEqual(
+            list(backbone.loc[:,'1-letter']),
+            ['E', 'M', 'A', 'G']
+            )
+        self.assertEqual(sidechains.loc[:,'ResNo'].dtype.kind, 'i')
+        self.assertEqual(
+            sidechains.loc[:,['ResNo', 'ATOM']].values.tolist(),
+            [[9, 'a'], [10, 'b']]
+            )
+
+        # reindexing keeps the integer residue numbers
+        target = peaklist(['100GlyH', '9MetH'], 0.1)
+        self.cube.allpeaklists['apo']['298K']['L1'] = target
+        target = self.cube._splits_assignments([self.coords[1]])[
+            self.coords[1]]['backbone']
+        expanded, lengths = self.cube.seq_expand(
+            {self.coords[1]: target},
+            {self.coords[1]: backbone},
+            'Backbone',
+            {'Peak Status': 'missing'}
+            )
+
+        self.assertEqual(
+            list(expanded[self.coords[1]].loc[:,'ResNo']),
+            [2, 9, 10, 100]
+            )
+        self.assertEqual(
+            list(expanded[self.coords[1]].loc[:,'Peak Status']),
+            ['missing', 'measured', 'missing', 'measured']
+            )
+
+    def test_checks_cached_entries(self):
+        self.cube.cache_entries = self.cube._splits_assignments(self.coords)
+        self.assertIsNone(self.cube._checks_cached_entries(self.coords))
+
+        # a stale entry with a repeated residue is rejected as a parsed one
+        backbone = self.cube.cache_entries[self.coords[1]]['backbone']
+        self.cube.cache_entries[self.coords[1]]['backbone'] = \
+            pd.concat([backbone, backbone.iloc[:1]], ignore_index=True)
+
+        with self.assertRaises(SystemExit):
+            self.cube._checks_cached_entries(self.coords)
+
+    def test_checks_cached_entries_misleading_chars(self):
+        self.cube.cache_entries = self.cube._splits_assignments(self.coords)
+        backbone = self.cube.cache_entries[self.coords[2]]['backbone']
+        backbone.loc[0,'Assign F1'] = '1Met?H'
+
+        with self.assertRaises(SystemExit):
+            self.cube._checks_cached_entries(self.coords)
+
+class Test_CorrectShifts(unittest.TestCase):
+    def setUp(self):
+        self.spectra = tempfile.mkdtemp()
+        self.cube = FarseerCube(self.spectra)
+        rand = np.random.RandomState(0)
+        self.cube.allpeaklists = {}
+
+        for z in ('apo', 'holo'):
+            for y in ('278K', '298K'):
+                for x in ('L0', 'L1', 'L2'):
+                    # residues in a different order in each peaklist
+                    resno = rand.permutation(5) + 1
+                    self.cube.allpeaklists.setdefault(z, {}).\
+                        setdefault(y, {})[x] = pd.DataFrame(
+                            {
+                                'ResNo': resno,
+                                'Position F1': 8. + rand.normal(0, 0.1, 5),
+                                'Position F2': 120. + rand.normal(0, 1., 5),
+                                'Height': rand.uniform(1e5, 1e6, 5)
+                                },
+                            columns=[
+                                'ResNo',
+                                'Position F1',
+                                'Position F2',
+                                'Height'
+                                ]
+                            )
+
+        self.cube._init_coords_names()
+
+    def tearDown(self):
+        shutil.rmtree(self.spectra)
+
+    def test_correct_shifts_as_loop(self):
+        expected = correct_shifts_loop(
+            {z: {y: {x: pkl.copy() for x, pkl in ys.items()}
+                for y, ys in zs.items()}
+                for z, zs in self.cube.allpeaklists.items()},
+            self.cube.zzcoords,
+            self.cube.yycoords,
+            self.cube.xxcoords,
+            3
+            )
+        self.cube.correct_shifts_backbone(3)
+
+        for z in self.cube.zzcoords:
+            for y in self.cube.yycoords:
+                for x in self.cube.xxcoords:
+                    pd.testing.assert_frame_equal(
+                        self.cube.allpeaklists[z][y][x],
+                        expected[z][y][x],
+                        check_dtype=False
+                        )
+                    np.testing.assert_allclose(
+                        self.cube.cs_corrections.loc[(z, y, x)].values,
+                        expected[z][y][x].loc[
+                            0,
+                            ['Pos F1 correction', 'Pos F2 correction']
+                            ].values.astype(float)
+                        )
+
+        # the reference experiments are not corrected
+        self.assertTrue((self.cube.cs_corrections.loc[(
+            slice(None), slice(None), 'L0'),:] == 0).values.all())
+
+    def test_missing_reference_residue(self):
+        pkl = self.cube.allpeaklists['holo']['298K']['L2']
+        self.cube.allpeaklists['holo']['298K']['L2'] = \
+            pkl.loc[pkl.loc[:,'ResNo'] != 3,:]
+
+        with self.assertRaises(SystemExit):
+            self.cube.correct_shifts_backbone(3)
+
+class Test_Series(unittest.TestCase):
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.folder = tempfile.mkdtemp()
+        # series create their output folders in the working directory
+        os.chdir(self.folder)
+        self.cube = FarseerCube(self.folder)
+        self.cube.allpeaklists = {}
+
+        # the holo peaklists have one more residue, the apo series
+        # have a row of NaN in the cube
+        for z, n_res in (('apo', 3), ('holo', 4)):
+            for x in ('L0', 'L1'):
+                self.cube.allpeaklists.setdefault(z, {}).\
+                    setdefault('298K', {})[x] = pd.DataFrame(
+                        {
+                            'ResNo': list(range(1, n_res + 1)),
+                            '1-letter': ['M', 'E', 'A', 'Q'][:n_res],
+                            '3-letter': ['Met', 'Glu', 'Ala', 'Gln'][:n_res],
+                            'Peak Status': 'measured',
+                            'Position F1': [8. + 0.1*i for i in range(n_res)],
+                            'Height': [1e5 * (i+1) for i in range(n_res)]
+                            },
+                        columns=[
+                            'ResNo',
+                            '1-letter',
+                            '3-letter',
+                            'Peak Status',
+                            'Position F1',
+                            'Height'
+                            ]
+                        )
+
+        self.cube._init_coords_names()
+        self.cube.init_Farseer_cube()
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        shutil.rmtree(self.folder)
+
+    def test_series_as_loop(self):
+        series_dct = self.cube.export_series_dict_over_axis(
+            FarseerSeries,
+            along_axis='x'
+            )
+
+        for dp2, dp1, n_rows in (('apo', '298K', 3), ('holo', '298K', 4)):
+            fs = series_dct[dp2][dp1]
+            expected = series_panel_loop(self.cube.peaklists_p5d, dp2, dp1)
+
+            self.assertIsInstance(fs, FarseerSeries)
+            self.assertEqual(list(fs.items), ['L0', 'L1'])
+            self.assertEqual(len(fs.major_axis), n_rows)
+            self.assertEqual(list(fs.major_axis), list(expected.major_axis))
+
+            for item in fs.items:
+                pd.testing.assert_frame_equal(
+                    fs.loc[item,:,:],
+                    expected.loc[item,:,list(fs.minor_axis)],
+                    check_dtype=False
+                    )
+
+class Test_LoadExperiments(unittest.TestCase):
+    def setUp(self):
+        self.spectra = tempfile.mkdtemp()
+
+        for i, z in enumerate(('apo', 'holo')):
+            for j, y in enumerate(('278K', '298K')):
+                folder = os.path.join(self.spectra, z, y)
+                os.makedirs(folder)
+
+                for k, x in enumerate(('L0', 'L1', 'L2', 'L3')):
+                    peaklist(
+                        ['1MetH', '2GluH', '3AlaH'][:3 - (i + j + k) % 2],
+                        0.1 * k
+                        ).to_csv(os.path.join(folder, x + '.csv'), index=False)
+
+                with open(os.path.join(folder, 'seq.fasta'), 'w') as fout:
+                    fout.write('>seq\nMEAQ\n')
+
+    def tearDown(self):
+        shutil.rmtree(self.spectra)
+
+    def loads(self, load_workers, filetype):
+        """Loads the <filetype> files with <load_workers> threads."""
+        cube = FarseerCube(self.spectra, load_workers=load_workers)
+        cube.load_experiments(filetype=filetype)
+
+        return cube.allpeaklists if filetype == '.csv' else cube.allfasta
+
+    def test_threads_as_sequential(self):
+        for filetype in ('.csv', '.fasta'):
+            sequential = self.loads(1, filetype)
+
+            for load_workers in (2, 5):
+                threaded = self.loads(load_workers, filetype)
+                self.assertEqual(sorted(threaded), sorted(sequential))
+
+                for z in sequential:
+                    self.assertEqual(sorted(threaded[z]), sorted(sequential[z]))
+
+                    for y in sequential[z]:
+                        # filled in the same order
+                        self.assertEqual(
+                            list(threaded[z][y]),
+                            list(sequential[z][y])
+                            )
+
+                        for x in sequential[z][y]:
+                            pd.testing.assert_frame_equal(
+                                threaded[z][y][x],
+                                sequential[z][y][x]
+                                )
+
+    def test_threads_raise_errors(self):
+        # an empty file aborts with WET 14
+        open(os.path.join(self.spectra, 'holo', '278K', 'L2.csv'), 'w').close()
+
+        for load_workers in (1, 3):
+            with self.assertRaises(SystemExit, msg=str(load_workers)):
+                self.loads(load_workers, '.csv')
+
+        # other exceptions raised in a thread reach the caller
+        with open(os.path.join(self.spectra, 'apo', '298K', 'L1.csv'), 'w') as fout:
+            fout.write('"unclosed\n')
+
+        for load_workers in (1, 3):
+            with self.assertRaises(pd.errors.ParserError, msg=str(load_workers)):
+                self.loads(load_workers, '.csv')
+
+class Test_Snapshot(unittest.TestCase):
+    def setUp(self):
+        self.spectra = tempfile.mkdtemp()
+        self.snapshot = tempfile.mkdtemp()
+        self.coords = [('apo', '298K', 'L0'), ('apo', '298K', 'L1')]
+        allpeaklists = {}
+
+        for i, (z, y, x) in enumerate(self.coords):
+            pkl = peaklist(['1MetH', '2GluH', '3AlaH'], 0.1 * i)
+            allpeaklists.setdefault(z, {}).setdefault(y, {})[x] = pkl
+            folder = os.path.join(self.spectra, z, y)
+            os.makedirs(folder, exist_ok=True)
+            pkl.to_csv(os.path.join(folder, x + '.csv'), index=False)
+
+        self.cube = self.farseer_cube(allpeaklists)
+
+        with open(config_path, 'r') as fin:
+            self.fsuv = json.load(fin)
+
+        self.cube.save_snapshot(self.snapshot, self.settings())
+
+    def tearDown(self):
+        shutil.rmtree(self.spectra)
+        shutil.rmtree(self.snapshot)
+
+    def farseer_cube(self, allpeaklists=None):
+        """A FarseerCube of the peaklists in self.spectra."""
+        cube = FarseerCube(self.spectra)
+
+        if allpeaklists:
+            cube.allpeaklists = allpeaklists
+            cube.zzcoords = ['apo']
+            cube.yycoords = ['298K']
+            cube.xxcoords = ['L0', 'L1']
+            cube.init_Farseer_cube()
+
+        return cube
+
+    def settings(self):
+        """The preprocessing settings farseermain stores in snapshots."""
+        return FarseerNMR._snapshot_settings(
+            types.SimpleNamespace(fsuv=self.fsuv)
+            )
+
+    def test_current(self):
+        self.assertTrue(
+            self.farseer_cube().snapshot_is_current(
+                self.snapshot,
+                self.settings()
+                )
+            )
+
+    def test_touched_peaklist(self):
+        path = os.path.join(self.spectra, 'apo', '298K', 'L1.csv')
+        stat = os.stat(path)
+        # same content, newer modification time
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+        self.assertFalse(
+            self.farseer_cube().snapshot_is_current(
+                self.snapshot,
+                self.settings()
+                )
+            )
+
+    def test_added_peaklist(self):
+        path = os.path.join(self.spectra, 'apo', '298K', 'L2.csv')
+        peaklist(['1MetH'], 0.3).to_csv(path, index=False)
+
+        self.assertFalse(
+            self.farseer_cube().snapshot_is_current(
+                self.snapshot,
+                self.settings()
+                )
+            )
+
+    def test_changed_settings(self):
+        changes = [
+            ('fasta_settings', 'applyFASTA'),
+            ('cs_settings', 'perform_cs_correction'),
+            ('general_settings', 'use_sidechains'),
+            ('fitting_settings', 'expand_missing_yy'),
+            ('fitting_settings', 'expand_missing_zz')
+            ]
+
+        for section, key in changes:
+            value = self.fsuv[section][key]
+            self.fsuv[section][key] = not(value)
+
+            try:
+                self.assertFalse(
+                    self.farseer_cube().snapshot_is_current(
+                        self.snapshot,
+                        self.settings()
+                        ),
+                    msg=key
+                    )
+
+            finally:
+                self.fsuv[section][key] = value
+
+    def test_loads_memory_maps(self):
+        cube = self.farseer_cube()
+        cube.load_snapshot(self.snapshot)
+
+        self.assertEqual(cube.zzcoords, ['apo'])
+        self.assertEqual(cube.xxcoords, ['L0', 'L1'])
+        self.assertIsNone(cube.sidechains_p5d)
+        self.assertIsInstance(cube.peaklists_p5d.values, np.memmap)
+        self.assertFalse(cube.peaklists_p5d.values.flags.writeable)
+        np.testing.assert_array_equal(
+            cube.peaklists_p5d.values,
+            self.cube.peaklists_p5d.values
+            )
+        pd.testing.assert_frame_equal(
+            cube.peaklists_p5d.get_frame('apo', '298K', 'L1'),
+            self.cube.peaklists_p5d.get_frame('apo', '298K', 'L1')
+            )
+
+if __name__ == "__main__":
+    unittest.main()
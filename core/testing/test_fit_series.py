@@ -0,0 +1,205 @@
+"""
+Copyright © 2017-2018 Farseer-NMR
+João M.C. Teixeira and Simon P. Skinner
+
+@ResearchGate https://goo.gl/z8dPJU
+@Twitter https://twitter.com/farseer_nmr
+
+This file is part of Farseer-NMR.
+
+Farseer-NMR is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Farseer-NMR is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Farseer-NMR. If not, see <http://www.gnu.org/licenses/>.
+"""
+import os
+import unittest
+import tempfile
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+
+from core.fslibs.FarseerSeries import FarseerSeries
+
+x_values = [0, 0.25, 0.5, 1, 2, 4, 8]
+columns = ['ResNo', '1-letter', '3-letter', 'Peak Status', 'H1_delta']
+
+def titration_series(n_residues=40, seed=0):
+    """
+    A FarseerSeries along X with noisy Hill titrations in 'H1_delta'.
+    Residue 3 has only three measured peaks and residue 5 has an
+    infinite value, so that its curve_fit fails.
+    """
+    rand = np.random.RandomState(seed)
+    arr = np.empty((len(x_values), n_residues, len(columns)), dtype=object)
+
+    for j in range(n_residues):
+        ymax, n, kd = rand.uniform([0.1, 0.8, 0.5], [1., 2., 3.])
+        x = np.array(x_values, dtype=float)
+        y = ymax * x**n / (kd**n + x**n) + rand.normal(0, 0.01, x.size)
+
+        for i in range(len(x_values)):
+            arr[i, j] = [j + 1, 'A', 'Ala', 'measured', y[i]]
+
+    arr[3:, 2, 3] = 'missing'
+    arr[4, 4, 4] = np.inf
+
+    fs = FarseerSeries(
+        arr,
+        items=['L{}'.format(i) for i in range(len(x_values))],
+        major_axis=list(range(1, n_residues + 1)),
+        minor_axis=columns
+        )
+    fs.create_attributes(series_axis='along_x', series_dps=list(fs.items))
+
+    return fs
+
+def baseline_output(fs, col, mindp):
+    """
+    The fit table and report as FarseerSeries.perform_fit() wrote them
+    residue by residue before fits were stored in a result array, the
+    reference of the tests. The fitted parameters are read from
+    fs.fit_results[col].
+    """
+    report = \
+"""# fitting for parameter: '{}'
+#fit performed: Hill Equation
+#(Vmax*[S]**n)/(K0.5**n+[S]**n)
+""".format(col)
+    table = "#res,fit,ymax,yhalf,kd,n\n"
+    measured_mask = fs.loc[:,:, 'Peak Status'] == 'measured'
+
+    for irow, row in enumerate(fs.major_axis):
+        mmask = measured_mask.loc[row,:]
+        res = int(fs.loc[fs.items[0],row, 'ResNo'])
+        xdata = pd.Series(x_values)[np.array(mmask)]
+        ydata = fs.loc[mmask,row,col].fillna(value=0.0)
+        xdata.index = ydata.index
+        result = fs.fit_results[col][irow]
+
+        if mmask.sum() < mindp:
+            report += \
+"""
+ResNo:  {}
+xdata: {}
+ydata: {}
+!¡NOT ENOUGH DATA POINTS - FIT NOT PERFORMED!¡
+**************************
+""".format(res, list(xdata), list(ydata))
+            continue
+
+        if np.isnan(result['popt']).any():
+            report += \
+"""
+ResNo:  {}
+xdata: {}
+ydata: {}
+!¡FIT FAILED TO FIND MINIMIZATION!¡
+**************************
+""".format(res, list(xdata), list(ydata))
+            table += "{},{},,,,,\n".format(res, 'failed')
+            continue
+
+        popt = result['popt']
+        report += \
+"""
+Res:  {}
+xdata: {}
+ydata: {}
+ymax: {}
+K0.5: {}
+n: {}
+popt: {}
+pcov: {}
+**************************
+""".format(
+            res,
+            list(xdata),
+            list(ydata),
+            popt[0],
+            popt[2],
+            popt[1],
+            popt,
+            result['pcov']
+            )
+        table += "{},{},{},{},{},{}\n".format(
+            res,
+            'okay',
+            popt[0],
+            popt[0]/2,
+            popt[2],
+            popt[1]
+            )
+
+    return table.encode('utf-8'), report.encode('utf-8')
+
+class Test_Case(unittest.TestCase):
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.folder = tempfile.mkdtemp()
+        # series create their output folders in the working directory
+        os.chdir(self.folder)
+        self.series = titration_series()
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        shutil.rmtree(self.folder)
+
+    def fit_output(self, **kwargs):
+        """
+        Fits 'H1_delta' and returns the bytes of the fit table and
+        report written.
+        """
+        self.series.perform_fit('H1_delta', x_values, 4, 'hill', **kwargs)
+        output = []
+
+        for name in ('H1_delta_fit_table.csv', 'H1_delta_fit_report.log'):
+            path = os.path.join(
+                self.series.tables_and_plots_folder,
+                'H1_delta',
+                name
+                )
+
+            with open(path, 'rb') as fin:
+                output.append(fin.read())
+
+            os.remove(path)
+
+        return output
+
+    def test_baseline_format(self):
+        table, report = self.fit_output()
+        baseline_table, baseline_report = \
+            baseline_output(self.series, 'H1_delta', 4)
+
+        # okay, failed and not enough data rows are all present
+        self.assertIn(b'\n5,failed,,,,,\n', table)
+        self.assertNotIn(b'\n3,', table)
+        self.assertIn(b'NOT ENOUGH DATA POINTS', report)
+        self.assertEqual(table, baseline_table)
+        self.assertEqual(report, baseline_report)
+
+    def test_parallel_as_serial(self):
+        for kwargs in (
+                {},
+                {'batch_fitting': True},
+                {'bootstrap_replicas': 20}):
+            serial = self.fit_output(**kwargs)
+
+            for workers in (2, 3):
+                with ProcessPoolExecutor(workers) as executor:
+                    parallel = self.fit_output(executor=executor, **kwargs)
+
+                self.assertEqual(parallel, serial, msg=str(kwargs))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,489 @@
+"""
+Copyright © 2017-2018 Farseer-NMR
+João M.C. Teixeira and Simon P. Skinner
+
+@ResearchGate https://goo.gl/z8dPJU
+@Twitter https://twitter.com/farseer_nmr
+
+This file is part of Farseer-NMR.
+
+Farseer-NMR is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Farseer-NMR is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Farseer-NMR. If not, see <http://www.gnu.org/licenses/>.
+"""
+import unittest
+import warnings
+import numpy as np
+import scipy.optimize as sciopt
+
+from core.fslibs import fitting_functions
+from core.fslibs.FittingBase import FittingBase, fit_statuses
+from core.fslibs.fitting_functions.HillEquation import HillEquation
+
+def titrations(n_residues, noise, seed=0, kd=None):
+    """Synthetic Hill titrations (x, y, res) and their parameters."""
+    rand = np.random.RandomState(seed)
+    x = np.array([0, 0.25, 0.5, 1, 2, 4, 8.])
+    datasets = []
+    params = []
+
+    for res in range(n_residues):
+        p = [
+            rand.uniform(0.2, 1),
+            rand.uniform(0.8, 1.5),
+            kd if kd is not None else rand.uniform(0.5, 3)
+            ]
+        y = HillEquation().equation(x, *p)
+        datasets.append((x, y + rand.normal(0, noise, x.size), res))
+        params.append(p)
+
+    return datasets, np.array(params)
+
+class Linear(HillEquation):
+    """A valid model without analytic Jacobian."""
+    param_names = ('slope', 'intercept')
+    reference_parameters = (1., 0.5)
+    jacobian = None
+
+    def equation(self, x, slope, intercept):
+        return slope * x + intercept
+
+    def initial_guess(self, x, y):
+        return FittingBase.initial_guess(self, x, y)
+
+class Test_Case(unittest.TestCase):
+    def setUp(self):
+        self.hill = HillEquation()
+        self.datasets, self.params = titrations(100, 0.005)
+        self.x, self.y, self.weights = self.hill.pads_datasets(self.datasets)
+        self.p0 = self.hill._initial_guesses(self.datasets)
+
+    def test_batch_as_curve_fit(self):
+        popt, pcov, success = self.hill.levenberg_marquardt_batch(
+            self.x,
+            self.y,
+            self.weights,
+            self.p0
+            )
+
+        self.assertTrue(success.all())
+
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+
+            for (x, y, res), p0, p, c in zip(self.datasets, self.p0, popt, pcov):
+                expected, expected_cov = sciopt.curve_fit(
+                    self.hill.equation,
+                    x,
+                    y,
+                    p0=p0
+                    )
+                np.testing.assert_allclose(p, expected, rtol=1e-4)
+                np.testing.assert_allclose(c, expected_cov, rtol=1e-2)
+
+    def test_batch_recovers_parameters(self):
+        popt, pcov, success = self.hill.levenberg_marquardt_batch(
+            self.x,
+            self.y,
+            self.weights,
+            self.p0
+            )
+
+        # fitted curves follow the noiseless curves
+        np.testing.assert_allclose(
+            self.hill.evaluate_batch(self.x, popt),
+            self.hill.evaluate_batch(self.x, self.params),
+            atol=0.02
+            )
+
+    def test_batch_succeeds_as_curve_fit(self):
+        # noisy titrations where some fits fail
+        datasets, params = titrations(200, 0.05, seed=1)
+        x, y, weights = self.hill.pads_datasets(datasets)
+        p0 = self.hill._initial_guesses(datasets)
+        popt, pcov, success = self.hill.levenberg_marquardt_batch(
+            x,
+            y,
+            weights,
+            p0
+            )
+        n_okay = 0
+
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+
+            for (xd, yd, res), p in zip(datasets, p0):
+                try:
+                    sciopt.curve_fit(self.hill.equation, xd, yd, p0=p)
+                    n_okay += 1
+                except RuntimeError:
+                    continue
+
+        self.assertGreaterEqual(success.sum(), n_okay)
+
+    def test_padded_datasets(self):
+        # a residue with missing points is padded with weight 0
+        x, y, res = self.datasets[0]
+        datasets = [(x[:4], y[:4], 0)] + self.datasets[1:3]
+        px, py, pw = self.hill.pads_datasets(datasets)
+
+        self.assertEqual(px.shape, (3, 7))
+        self.assertEqual(list(pw[0]), [1, 1, 1, 1, 0, 0, 0])
+
+        popt, pcov, success = self.hill.levenberg_marquardt_batch(
+            px,
+            py,
+            pw,
+            self.hill._initial_guesses(datasets)
+            )
+        alone, alone_cov, alone_success = \
+            self.hill.levenberg_marquardt_batch(
+                px[:1,:4],
+                py[:1,:4],
+                pw[:1,:4],
+                self.hill._initial_guesses(datasets[:1])
+                )
+
+        np.testing.assert_allclose(popt[0], alone[0])
+
+    def test_full_output(self):
+        popt, pcov, success, infodict = \
+            self.hill.levenberg_marquardt_batch(
+                self.x,
+                self.y,
+                self.weights,
+                self.p0,
+                full_output=True
+                )
+
+        self.assertEqual(infodict['nfev'].shape, (len(self.datasets),))
+        self.assertEqual(infodict['nfev'].max(), infodict['niter'] + 1)
+
+    def test_max_iter(self):
+        popt, pcov, success = self.hill.levenberg_marquardt_batch(
+            self.x,
+            self.y,
+            self.weights,
+            self.p0,
+            max_iter=1
+            )
+
+        self.assertFalse(success.all())
+
+    def test_fit_data_batch(self):
+        fits = self.hill.fit_data_batch(self.datasets[:5])
+
+        for (x, y, res), (okay, popt, pcov) in zip(self.datasets, fits):
+            single = self.hill.fit_data(x, y, res)
+
+            self.assertTrue(okay)
+            self.assertTrue(single[0])
+            np.testing.assert_allclose(popt, single[1], rtol=1e-4)
+
+    def test_least_squares_global(self):
+        datasets, params = titrations(30, 0.005, kd=1.5)
+        x, y, weights = self.hill.pads_datasets(datasets)
+        p0 = self.hill._initial_guesses(datasets)
+        popt, pcov, success = self.hill.least_squares_global(
+            x,
+            y,
+            weights,
+            p0,
+            2
+            )
+
+        self.assertTrue(success.all())
+        # the shared parameter is the same for all the datasets
+        self.assertEqual(len(set(popt[:,2])), 1)
+
+        # same problem solved with a dense numerical Jacobian
+        def residuals(theta):
+            p = np.column_stack([
+                theta[1:].reshape(-1, 2),
+                np.full(len(datasets), theta[0])
+                ])
+            return (self.hill.evaluate_batch(x, p) - y).ravel()
+
+        dense = sciopt.least_squares(
+            residuals,
+            np.concatenate([[np.median(p0[:,2])], p0[:,:2].ravel()])
+            )
+
+        self.assertAlmostEqual(popt[0,2], dense.x[0], places=4)
+        np.testing.assert_allclose(
+            popt[:,:2],
+            dense.x[1:].reshape(-1, 2),
+            rtol=1e-3
+            )
+
+    def test_fit_data_global_groups(self):
+        low, low_params = titrations(10, 0.005, seed=2, kd=1.)
+        high, high_params = titrations(10, 0.005, seed=3, kd=3.)
+        datasets = low + high
+        groups = [0] * 10 + [1] * 10
+        fits = self.hill.fit_data_global(datasets, 'kd', groups=groups)
+
+        # each group is fit on its own
+        for group, expected_kd in ((low, 1.), (high, 3.)):
+            alone = self.hill.fit_data_global(group, 'kd')
+            grouped = fits[:10] if group is low else fits[10:]
+
+            for (okay, popt, pcov), single in zip(grouped, alone):
+                self.assertTrue(okay)
+                np.testing.assert_allclose(popt, single[1])
+                self.assertAlmostEqual(popt[2], expected_kd, delta=0.1)
+
+    def test_fit_data_global_any_model(self):
+        linear = Linear()
+        x = np.arange(6.)
+        datasets = [
+            (x, slope * x - 1 + 0.01 * np.sin(7 * x + slope), res)
+            for res, slope in enumerate((0.5, 1., 2., 3.))
+            ]
+        fits = linear.fit_data_global(datasets, 'intercept')
+
+        for (okay, popt, pcov), slope in zip(fits, (0.5, 1., 2., 3.)):
+            self.assertTrue(okay)
+            self.assertAlmostEqual(popt[0], slope, delta=0.01)
+            # the intercept is shared
+            self.assertEqual(popt[1], fits[0][1][1])
+            self.assertAlmostEqual(popt[1], -1., delta=0.02)
+
+    def test_bootstrap_batch(self):
+        popt, pcov, success = self.hill.levenberg_marquardt_batch(
+            self.x,
+            self.y,
+            self.weights,
+            self.p0
+            )
+
+        for method in ('residual', 'montecarlo'):
+            replicas = self.hill.bootstrap_batch(
+                self.x[:10],
+                self.y[:10],
+                self.weights[:10],
+                popt[:10],
+                50,
+                method=method,
+                random_state=np.random.RandomState(0)
+                )
+            again = self.hill.bootstrap_batch(
+                self.x[:10],
+                self.y[:10],
+                self.weights[:10],
+                popt[:10],
+                50,
+                method=method,
+                random_state=np.random.RandomState(0)
+                )
+
+            self.assertEqual(replicas.shape, (10, 50, 3))
+            # same random state, same replicas
+            np.testing.assert_array_equal(replicas, again)
+            intervals = self.hill.confidence_intervals(replicas, 0.95)
+            self.assertEqual(intervals.shape, (10, 3, 2))
+            self.assertTrue((intervals[:,0,0] <= popt[:10,0]).all())
+            self.assertTrue((intervals[:,0,1] >= popt[:10,0]).all())
+
+    def test_bootstrap_batch_noiseless(self):
+        # without residuals all the replicas are the fitted data
+        y = self.hill.evaluate_batch(self.x[:5], self.params[:5])
+        replicas = self.hill.bootstrap_batch(
+            self.x[:5],
+            y,
+            self.weights[:5],
+            self.params[:5],
+            20,
+            random_state=np.random.RandomState(0)
+            )
+
+        np.testing.assert_allclose(
+            replicas,
+            np.broadcast_to(self.params[:5,None,:], replicas.shape),
+            rtol=1e-6
+            )
+
+    def test_bootstrap_intervals_grow_with_noise(self):
+        widths = []
+
+        for noise in (0.005, 0.05):
+            datasets, params = titrations(20, noise, seed=4)
+            x, y, weights = self.hill.pads_datasets(datasets)
+            popt, pcov, success = self.hill.levenberg_marquardt_batch(
+                x,
+                y,
+                weights,
+                self.hill._initial_guesses(datasets)
+                )
+            replicas = self.hill.bootstrap_batch(
+                x,
+                y,
+                weights,
+                popt,
+                100,
+                random_state=np.random.RandomState(0)
+                )
+            intervals = self.hill.confidence_intervals(replicas)
+            widths.append(np.nanmedian(intervals[:,0,1] - intervals[:,0,0]))
+
+        self.assertGreater(widths[1], 2 * widths[0])
+
+    def test_confidence_intervals_failed_replicas(self):
+        replicas = np.full((2, 10, 3), np.nan)
+        replicas[1] = 1.
+        intervals = self.hill.confidence_intervals(replicas)
+
+        self.assertTrue(np.isnan(intervals[0]).all())
+        np.testing.assert_array_equal(intervals[1], 1.)
+
+    def test_prescreen_batch(self):
+        y = self.y[:6].copy()
+        weights = self.weights[:6].copy()
+        # all zero, constant and a tiny change over a constant
+        y[0] = 0.
+        y[1] = 0.3
+        y[2] = 0.3
+        y[2,-1] += 1e-4
+        # padded points do not count
+        weights[3,-2:] = 0
+        y[3,:-2] = 0.1
+        y[3,-2:] = 5.
+        status = self.hill.prescreen_batch(y, weights, 0.05)
+
+        self.assertEqual(
+            [fit_statuses[s] for s in status],
+            ['flat', 'flat', 'low amplitude', 'flat', 'okay', 'okay']
+            )
+
+    def test_prescreen_batch_all_flat(self):
+        status = self.hill.prescreen_batch(
+            np.zeros((3, 7)),
+            np.ones((3, 7))
+            )
+
+        self.assertTrue((status == fit_statuses.index('flat')).all())
+
+    def test_prescreen_keeps_fittable(self):
+        status = self.hill.prescreen_batch(self.y, self.weights)
+        popt, pcov, success = self.hill.levenberg_marquardt_batch(
+            self.x,
+            self.y,
+            self.weights,
+            self.p0
+            )
+
+        # residues that fit are not discarded
+        self.assertTrue((status[success] == fit_statuses.index('okay')).all())
+
+    def test_registry(self):
+        self.assertIs(fitting_functions.models['hill'], HillEquation)
+
+        for model in fitting_functions.models.values():
+            self.assertIsNone(model.validates_model())
+
+    def test_hill_jacobian(self):
+        hill = HillEquation()
+        # x = 0 is the first point of every titration
+        x = np.array([0., 0.1, 0.5, 1., 2.5, 10.])
+        step = 1e-6
+
+        for p in ((1., 1., 1.5), (0.3, 0.5, 0.2), (2., 1.7, 4.), (1., 3., 1.)):
+            jac = hill.jacobian(x, *p)
+            expected = np.empty_like(jac)
+
+            # central differences
+            for i in range(len(p)):
+                dp = np.zeros(len(p))
+                dp[i] = step
+                expected[:,i] = (
+                    hill.equation(x, *(p + dp))
+                    - hill.equation(x, *(p - dp))
+                    ) / (2 * step)
+
+            self.assertEqual(jac.shape, (x.size, 3))
+            self.assertFalse(np.isnan(jac).any(), msg=str(p))
+            np.testing.assert_allclose(
+                jac,
+                expected,
+                rtol=1e-6,
+                atol=1e-8,
+                err_msg=str(p)
+                )
+
+    def test_validates_model_without_jacobian(self):
+        self.assertIsNone(Linear.validates_model())
+
+        linear = Linear()
+        x = np.tile(np.arange(5.), (3, 1))
+        y = 2 * x - 1
+        popt, pcov, success = linear.levenberg_marquardt_batch(
+            x,
+            y,
+            np.ones_like(x),
+            np.tile(linear.reference_parameters, (3, 1))
+            )
+
+        self.assertTrue(success.all())
+        np.testing.assert_allclose(popt, [[2., -1.]] * 3, atol=1e-6)
+
+    def test_validates_model_rejects(self):
+        class Abstract(FittingBase):
+            param_names = ('a',)
+            reference_parameters = (1.,)
+
+            def equation(self, x, a):
+                return a * x
+
+        class NoParameters(Linear):
+            param_names = ()
+            reference_parameters = ()
+
+        class WrongReference(Linear):
+            reference_parameters = (1.,)
+
+        class WrongSignature(Linear):
+            def equation(self, x, *params):
+                return params[0] * x + params[1]
+
+        class WrongJacobian(Linear):
+            def jacobian(self, x, slope):
+                return x
+
+        class NotVectorized(Linear):
+            def equation(self, x, slope, intercept):
+                return float(np.mean(slope * x + intercept))
+
+        for model in (
+                Abstract,
+                NoParameters,
+                WrongReference,
+                WrongSignature,
+                WrongJacobian,
+                NotVectorized):
+            with self.assertRaises(TypeError, msg=model.__name__):
+                model.validates_model()
+
+    def test_benchmark_models(self):
+        timings = fitting_functions.benchmark_models(
+            n_residues=20,
+            repeats=1
+            )
+
+        self.assertEqual(sorted(timings), sorted(fitting_functions.models))
+        self.assertEqual(
+            sorted(timings['hill']),
+            ['equation', 'fit', 'fits_okay', 'jacobian']
+            )
+        self.assertGreater(timings['hill']['fits_okay'], 0)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,108 @@
+"""
+Copyright © 2017-2018 Farseer-NMR
+João M.C. Teixeira and Simon P. Skinner
+
+@ResearchGate https://goo.gl/z8dPJU
+@Twitter https://twitter.com/farseer_nmr
+
+This file is part of Farseer-NMR.
+
+Farseer-NMR is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Farseer-NMR is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Farseer-NMR. If not, see <http://www.gnu.org/licenses/>.
+"""
+import unittest
+import numpy as np
+
+import core.fslibs.missing_policies as mp
+
+def policy_loop(name, values, missing):
+    """
+    Applies a policy item by item as FarseerSeries.calc_cs_diffs()
+    did before the policies operated on whole series, the reference
+    of the tests.
+    """
+    values = values.copy()
+
+    if name == 'full':
+        for iitem in range(values.shape[0]):
+            values[iitem, missing[iitem]] = 1.
+
+    elif name == 'prev':
+        for iitem in range(1, values.shape[0]):
+            values[iitem, missing[iitem]] = \
+                values[iitem-1, missing[iitem]]
+
+    elif name == 'zero':
+        for iitem in range(1, values.shape[0]):
+            values[iitem, missing[iitem]] = 0
+
+    return values
+
+class Test_Case(unittest.TestCase):
+    def setUp(self):
+        rand = np.random.RandomState(0)
+        # (series, items, residues)
+        self.values = rand.normal(size=(4, 6, 15))
+        self.missing = rand.uniform(size=self.values.shape) < 0.3
+        # consecutive missing peaks, including the reference
+        self.missing[0,:4,0] = True
+        self.missing[1,1,1] = False
+        self.missing[1,2:,1] = True
+
+    def test_registered(self):
+        self.assertEqual(
+            sorted(mp.policies),
+            ['full', 'prev', 'zero']
+            )
+
+    def test_policies_as_loop(self):
+        for name in ('prev', 'zero', 'full'):
+            result = mp.apply_policy(name, self.values, self.missing)
+
+            for iseries in range(self.values.shape[0]):
+                np.testing.assert_array_equal(
+                    result[iseries],
+                    policy_loop(
+                        name,
+                        self.values[iseries],
+                        self.missing[iseries]
+                        ),
+                    err_msg=name
+                    )
+
+    def test_policies_keep_input(self):
+        values = self.values.copy()
+
+        for name in ('prev', 'zero', 'full'):
+            mp.apply_policy(name, self.values, self.missing)
+            np.testing.assert_array_equal(self.values, values)
+
+    def test_reference_unchanged(self):
+        for name in ('prev', 'zero'):
+            result = mp.apply_policy(name, self.values, self.missing)
+            np.testing.assert_array_equal(result[:,0], self.values[:,0])
+
+    def test_prev_fills_consecutive_missing(self):
+        result = mp.apply_policy('prev', self.values, self.missing)
+
+        np.testing.assert_array_equal(
+            result[1,2:,1],
+            np.full(4, self.values[1,1,1])
+            )
+
+    def test_unknown_policy(self):
+        result = mp.apply_policy('foo', self.values, self.missing)
+        self.assertIs(result, self.values)
+
+if __name__ == "__main__":
+    unittest.main()
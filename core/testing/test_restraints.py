@@ -0,0 +1,221 @@
+"""
+Copyright © 2017-2018 Farseer-NMR
+João M.C. Teixeira and Simon P. Skinner
+
+@ResearchGate https://goo.gl/z8dPJU
+@Twitter https://twitter.com/farseer_nmr
+
+This file is part of Farseer-NMR.
+
+Farseer-NMR is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+Farseer-NMR is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with Farseer-NMR. If not, see <http://www.gnu.org/licenses/>.
+"""
+import os
+import json
+import unittest
+import tempfile
+import shutil
+import numpy as np
+
+from core.fslibs import restraint_functions
+from core.fslibs.RestraintBase import RestraintBase
+from core.fslibs.FarseerSeries import FarseerSeries, SeriesBatch
+
+config_path = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    'default_config.json'
+    )
+
+columns = [
+    'ResNo',
+    '1-letter',
+    '3-letter',
+    'Peak Status',
+    'Position F1',
+    'Position F2',
+    'Height',
+    'Volume'
+    ]
+
+def series(n_items=4, residues='MGAKL', seed=0, **kwargs):
+    """
+    A FarseerSeries of <n_items> experiments of random peaks, created
+    as FarseerCube.gen_series() does.
+    """
+    rand = np.random.RandomState(seed)
+    three = {'M':'Met', 'G':'Gly', 'A':'Ala', 'K':'Lys', 'L':'Leu'}
+    arr = np.empty((n_items, len(residues), len(columns)), dtype=object)
+
+    for i in range(n_items):
+        for j, res in enumerate(residues):
+            arr[i, j] = [
+                j + 1,
+                res,
+                three[res],
+                'measured',
+                8. + rand.normal(0, 0.1),
+                120. + rand.normal(0, 1.),
+                rand.uniform(1e5, 1e6),
+                rand.uniform(1e6, 1e7)
+                ]
+
+    fs = FarseerSeries(
+        arr,
+        items=['L{}'.format(i) for i in range(n_items)],
+        major_axis=list(range(1, len(residues) + 1)),
+        minor_axis=columns
+        )
+    fs.create_attributes(series_dps=list(fs.items), **kwargs)
+
+    return fs
+
+def csp_willi(s, csp_alpha4res):
+    """
+    CSP of a single peak as FarseerSeries.csp_willi() calculated it
+    before CSPs were calculated for the whole series, the reference of
+    the tests. s[0] is the 1-letter residue code, s[1] and s[2] the
+    chemical shift differences of both dimensions.
+    """
+    return np.sqrt(0.5*(s[1]**2+(csp_alpha4res[s[0]]*s[2])**2))
+
+class DoubledHeight(RestraintBase):
+    """A restraint added only by the tests."""
+
+    @classmethod
+    def from_config(cls, fsuv):
+
+        if not(fsuv.get("Doubled_height_settings", {}).get("calcs")):
+            return []
+
+        return [cls('Doubled_height', ['Height'])]
+
+    def kernel(self, series, height):
+        return 2 * height
+
+class Test_Case(unittest.TestCase):
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.folder = tempfile.mkdtemp()
+        # series create their output folders in the working directory
+        os.chdir(self.folder)
+
+        with open(config_path, 'r') as fin:
+            self.fsuv = json.load(fin)
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        shutil.rmtree(self.folder)
+
+    def test_enabled_restraints(self):
+        restraints = restraint_functions.enabled_restraints(self.fsuv)
+
+        # the differences of both dimensions are needed for the CSPs
+        self.assertEqual(
+            [r.calccol for r in restraints],
+            ['H1_delta', 'N15_delta', 'CSP']
+            )
+
+        self.fsuv["csp_settings"]["calcs_CSP"] = False
+        self.fsuv["PosF2_settings"]["calcs_PosF2_delta"] = True
+        self.fsuv["Volume_ratio_settings"]["calcs_Volume_ratio"] = True
+        restraints = restraint_functions.enabled_restraints(self.fsuv)
+
+        self.assertEqual(
+            [(r.calccol, r.input_columns) for r in restraints],
+            [('N15_delta', ('Position F2',)), ('Vol_ratio', ('Volume',))]
+            )
+
+    def test_registered_restraint_runs(self):
+        self.fsuv["Doubled_height_settings"] = {"calcs": True}
+        restraint_functions.restraints['doubled_height'] = DoubledHeight
+
+        try:
+            restraints = restraint_functions.enabled_restraints(self.fsuv)
+
+        finally:
+            del restraint_functions.restraints['doubled_height']
+
+        self.assertEqual(
+            [r.calccol for r in restraints],
+            ['H1_delta', 'N15_delta', 'CSP', 'Doubled_height']
+            )
+
+        series_list = [series(seed=seed) for seed in range(3)]
+        SeriesBatch(series_list).calc_restraints(restraints)
+
+        for fs in series_list:
+            np.testing.assert_allclose(
+                fs.loc[:,:,'Doubled_height'].values.astype(float),
+                2 * fs.loc[:,:,'Height'].values.astype(float)
+                )
+
+    def test_column_block(self):
+        series_list = [series(seed=seed) for seed in range(3)]
+        cols = ['Height', 'Position F1']
+        block = SeriesBatch(series_list).column_block(cols)
+
+        self.assertEqual(block.shape, (3, 4, 5, 2))
+        self.assertEqual(block.dtype, float)
+
+        for fs, values in zip(series_list, block):
+            for i, col in enumerate(cols):
+                np.testing.assert_array_equal(
+                    values[...,i],
+                    fs.loc[:,:,col].values.T.astype(float)
+                    )
+
+    def test_csp_alpha(self):
+        fs = series(csp_alpha4res=0.14, csp_res_exceptions={'G':0.2})
+        alpha = SeriesBatch([fs]).csp_alpha()
+
+        np.testing.assert_array_equal(
+            alpha[0],
+            np.tile([0.14, 0.2, 0.14, 0.14, 0.14], (4, 1))
+            )
+
+    def test_csp_as_loop(self):
+        fs = series(residues='MGAKLGG')
+        # NaN in either dimension propagates to the CSP
+        fs.loc['L1',2,'Position F1'] = np.nan
+        fs.loc['L2',3,'Position F2'] = np.nan
+        fs.loc['L3',4,'Position F1'] = np.nan
+        fs.loc['L3',4,'Position F2'] = np.nan
+        fs.calc_cs_diffs('H1_delta', 'Position F1')
+        fs.calc_cs_diffs('N15_delta', 'Position F2')
+        fs.calc_csp('CSP', 'H1_delta', 'N15_delta')
+
+        expected = fs.loc[:,:,['1-letter','H1_delta','N15_delta']].apply(
+            lambda s: csp_willi(s, fs.csp_alpha4res),
+            axis=2
+            )
+
+        np.testing.assert_allclose(
+            fs.loc[:,:,'CSP'].values.astype(float),
+            expected.values.astype(float)
+            )
+        self.assertTrue(np.isnan(fs.loc['L1',2,'CSP']))
+        self.assertTrue(np.isnan(fs.loc['L2',3,'CSP']))
+        self.assertTrue(np.isnan(fs.loc['L3',4,'CSP']))
+        self.assertFalse(np.isnan(fs.loc['L3',5,'CSP']))
+
+    def test_from_config_required(self):
+
+        class NoConfig(RestraintBase):
+            def kernel(self, series, source):
+                return source
+
+        with self.assertRaises(TypeError):
+            NoConfig('foo', ['Height'])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -75,6 +75,10 @@ aal1tol3 = {
 # peaklists that require FASTA files to complete information on residue type
 peaklist_format_requires_fasta = ['nmrdraw', 'nmrview', 'user_pkl_1']
 
+# fixed vocabulary of the 'Peak Status' column, the position of each
+# status is its integer code in the Farseer-NMR Cube and Series
+peak_status_vocabulary = ['measured', 'missing', 'unassigned']
+
 def combine_dicts(dictionaries):
     tmp_dict = {}
     for dictionary in dictionaries: